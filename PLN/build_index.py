@@ -0,0 +1,46 @@
+import os
+import json
+import argparse
+from searcher import JobSearcher
+from index_factory import INDEX_TYPES
+
+
+# Construye (o reconstruye) el indice FAISS guardado para que JobSearcher no
+# tenga que crearlo en cada arranque.
+#   python PLN/build_index.py dataset/processed --index-type hnsw
+# Con --similar M tambien calcula el grafo de ofertas similares (M vecinos por
+# oferta) que usa JobSearcher.similar_to.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye y guarda el índice FAISS con su manifest")
+    parser.add_argument("processed_dir", type=str, help="Carpeta con los vectors_*.store / vectors_*.pkl")
+    parser.add_argument("--index-type", type=str, default="flat", choices=INDEX_TYPES)
+    parser.add_argument("--index-params", type=str, default=None,
+                        help='Parámetros en JSON, ej: \'{"nlist": 256, "nprobe": 16}\'')
+    parser.add_argument("--index-dir", type=str, default=None, help="Por defecto <processed_dir>/index")
+    parser.add_argument("--force", action="store_true", help="Reconstruir aunque el manifest coincida")
+    parser.add_argument("--similar", type=int, default=0, metavar="M",
+                        help="Construir también el grafo de ofertas similares con M vecinos por oferta")
+    args = parser.parse_args()
+
+    params = json.loads(args.index_params) if args.index_params else None
+
+    searcher = JobSearcher(
+        os.path.abspath(args.processed_dir),
+        index_type=args.index_type,
+        index_params=params,
+        index_dir=args.index_dir,
+        use_saved_index=not args.force,
+        mmap_index=False,
+        similar_neighbors=args.similar
+    )
+    if args.force:
+        searcher.save_index()
+        searcher.save_similar_graph()
+
+    stats = searcher.get_statistics()
+    print(f"\nÍndice: {stats['index_type']} ({stats['total_jobs']} ofertas)")
+    if stats['recall_vs_flat'] is not None:
+        print(f"Recall@10 vs flat: {stats['recall_vs_flat']:.4f}")
+    if stats['similar_graph'] is not None:
+        graph = stats['similar_graph']
+        print(f"Grafo de similares: {graph['neighbors']} vecinos por oferta ({graph['bytes'] / 1e6:.1f} MB)")
@@ -0,0 +1,111 @@
+import re
+from typing import List, Tuple
+import numpy as np
+
+
+# Division de textos largos en ventanas de tokens solapadas. El encoder trunca en
+# max_seq_length, asi que de una oferta o un CV largo solo se codificaba el
+# comienzo; con chunks cada ventana se codifica por separado (todas en un mismo
+# lote) y al buscar las similitudes de las ventanas se agregan por documento.
+# Las ventanas son fragmentos del texto original, cortados en limites de tokens,
+# asi que se codifican como cualquier otro texto.
+CHUNK_OVERLAP = 32
+# Tokens especiales que el encoder agrega a cada texto ([CLS] y [SEP])
+SPECIAL_TOKENS = 2
+
+# Score de una oferta a partir de las similitudes (ventana de consulta x ventana de oferta):
+#   'max'      -> la mayor
+#   'mean_top' -> promedio de las MEAN_TOP mayores (premia coincidir en varias partes)
+AGGREGATIONS = ('max', 'mean_top')
+MEAN_TOP = 3
+
+
+def window_size(model) -> int:
+    # Tokens de texto que caben en una ventana del encoder
+    max_len = getattr(model, 'max_seq_length', None) or 512
+    return max(8, max_len - SPECIAL_TOKENS)
+
+
+def _token_spans(texts: List[str], model) -> List[List[Tuple[int, int]]]:
+    # (inicio, fin) en caracteres de cada token. Sin tokenizer rapido (que da los
+    # offsets) se usan las palabras, como en JobOfferProcessor.token_lengths
+    tokenizer = getattr(model, 'tokenizer', None)
+    if tokenizer is not None and getattr(tokenizer, 'is_fast', False):
+        spans = []
+        for start in range(0, len(texts), 10000):
+            encoded = tokenizer(texts[start:start + 10000], add_special_tokens=False,
+                                return_offsets_mapping=True, truncation=False)
+            spans.extend(encoded['offset_mapping'])
+        return spans
+    return [[m.span() for m in re.finditer(r'\S+', text)] for text in texts]
+
+
+def split_texts(texts: List[str], model, overlap: int = CHUNK_OVERLAP,
+                skip_first: bool = False) -> Tuple[List[str], np.ndarray]:
+    # Devuelve (chunks, offsets): las ventanas del texto i son
+    # chunks[offsets[i]:offsets[i + 1]]. Un texto que cabe en una ventana da un
+    # solo chunk (el texto completo). skip_first omite la primera ventana de cada
+    # texto, que es la que ya representa su embedding truncado.
+    window = window_size(model)
+    overlap = min(overlap, window // 2)
+    stride = window - overlap
+    chunks = []
+    offsets = np.zeros(len(texts) + 1, dtype='int64')
+    for i, (text, spans) in enumerate(zip(texts, _token_spans(texts, model))):
+        n = len(spans)
+        if n <= window:
+            pieces = [text]
+        else:
+            # Cada ventana empieza stride tokens despues de la anterior; la ultima llega al final
+            pieces = [text[spans[s][0]:spans[min(s + window, n) - 1][1]]
+                      for s in range(0, n - overlap, stride)]
+        if skip_first:
+            pieces = pieces[1:]
+        chunks.extend(pieces)
+        offsets[i + 1] = len(chunks)
+    return chunks, offsets
+
+
+def expand_ranges(offsets: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Chunks de las filas dadas segun los offsets (formato CSR): devuelve
+    # (ids de los chunks, posicion en rows de la fila a la que pertenece cada uno)
+    rows = np.asarray(rows, dtype='int64')
+    starts = np.asarray(offsets[rows], dtype='int64')
+    counts = np.asarray(offsets[rows + 1], dtype='int64') - starts
+    owner = np.repeat(np.arange(len(rows)), counts)
+    first = np.cumsum(counts) - counts
+    ids = np.repeat(starts - first, counts) + np.arange(int(counts.sum()))
+    return ids, owner
+
+
+def select_rows(offsets: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Ids de los chunks de las filas dadas y los offsets que les corresponden en
+    # una tabla que solo tenga esas filas (en el orden de rows)
+    ids, owner = expand_ranges(offsets, rows)
+    counts = np.bincount(owner, minlength=len(rows))
+    return ids, np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+
+
+def aggregate(scores: np.ndarray, owners: np.ndarray, n_owners: int, how: str = 'max',
+              top: int = MEAN_TOP) -> np.ndarray:
+    # Score de cada documento (0..n_owners-1) a partir de las similitudes de sus
+    # pares (consulta, chunk); owners indica el documento de cada similitud
+    if how not in AGGREGATIONS:
+        raise ValueError(f"Agregación desconocida: {how}. Opciones: {', '.join(AGGREGATIONS)}")
+    result = np.full(n_owners, -np.inf, dtype='float32')
+    if not len(scores):
+        return result
+    if how == 'max':
+        np.maximum.at(result, owners, scores)
+        return result
+
+    # mean_top: se ordena por documento y, dentro de el, de mayor a menor similitud
+    order = np.lexsort((-scores, owners))
+    sorted_owners = owners[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_owners, sorted_owners, side='left')
+    best = order[rank < top]
+    sums = np.bincount(owners[best], weights=scores[best], minlength=n_owners)
+    counts = np.bincount(owners[best], minlength=n_owners)
+    present = counts > 0
+    result[present] = sums[present] / counts[present]
+    return result
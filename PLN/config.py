@@ -0,0 +1,51 @@
+import os
+import platform
+
+
+# Configuracion del encoder. Cada valor se puede sobreescribir con una variable
+# de entorno, p. ej. PLN_ENCODER_BACKEND=onnx_int8 streamlit run app.py
+
+PLN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modelo de embeddings (nombre en Hugging Face o ruta local)
+MODEL_NAME = os.environ.get('PLN_MODEL_NAME', 'paraphrase-multilingual-MiniLM-L12-v2')
+
+# Backend del encoder: 'torch' (fp32, el actual), 'onnx' u 'onnx_int8'
+# (los backends ONNX son opcionales: pip install -r requirements-onnx.txt)
+ENCODER_BACKEND = os.environ.get('PLN_ENCODER_BACKEND', 'torch')
+
+# Carpeta donde se guardan los modelos exportados a ONNX (y sus versiones cuantizadas)
+ONNX_DIR = os.environ.get('PLN_ONNX_DIR', os.path.join(PLN_DIR, 'models'))
+
+
+def _detect_quantization_config():
+    # Elige la configuracion int8 segun la CPU: 'arm64' en ARM, 'avx512_vnni' solo
+    # si /proc/cpuinfo anuncia esas instrucciones y 'avx2' en cualquier otro caso
+    machine = platform.machine().lower()
+    if machine.startswith(('arm', 'aarch64')):
+        return 'arm64'
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = set()
+            for line in f:
+                if line.startswith('flags'):
+                    flags = set(line.split(':', 1)[1].split())
+                    break
+    except OSError:
+        return 'avx2'
+    if 'avx512_vnni' in flags or 'avx512vnni' in flags:
+        return 'avx512_vnni'
+    if 'avx512f' in flags:
+        return 'avx512'
+    return 'avx2'
+
+
+# Configuracion de cuantizacion dinamica int8: 'arm64', 'avx2', 'avx512' o 'avx512_vnni'
+# (por defecto se detecta segun la CPU; un modelo avx512_vnni es lento o falla sin esas instrucciones)
+QUANTIZATION_CONFIG = os.environ.get('PLN_QUANTIZATION_CONFIG') or _detect_quantization_config()
+
+# Similitud coseno minima aceptada entre un backend y torch fp32 (por perfil)
+MIN_COSINE = float(os.environ.get('PLN_MIN_COSINE', '0.99'))
+
+# Cross-encoder multilingue para reordenar los candidatos de FAISS (RecommendationEngine(rerank=True))
+RERANKER_MODEL = os.environ.get('PLN_RERANKER_MODEL', 'cross-encoder/mmarco-mMiniLMv2-L12-H384-v1')
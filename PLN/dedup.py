@@ -0,0 +1,249 @@
+import json
+import time
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+# Deteccion de ofertas casi duplicadas (la misma oferta republicada con otra
+# fecha, otros espacios o una frase distinta) con MinHash + LSH por bandas sobre
+# shingles de palabras de cleaned_text. Cada oferta solo se compara con las que
+# caen en el mismo cubo de alguna banda, asi que el costo es ~lineal en el numero
+# de ofertas (en lugar de comparar todos los pares).
+#
+# Con NUM_PERM=128 y BANDS=16 (8 filas por banda) un par con Jaccard 0.8 es
+# candidato con probabilidad ~0.97 y uno con 0.5 con ~0.06; los candidatos se
+# confirman con la Jaccard estimada por la firma completa (y opcionalmente con
+# la similitud coseno de sus embeddings).
+NUM_PERM = 128
+BANDS = 16
+SHINGLE_SIZE = 3
+JACCARD_THRESHOLD = 0.8
+MAX_HASH = np.uint64(0xFFFFFFFF)
+
+# Ofertas por bloque al calcular firmas y pares por bloque al verificarlos (acotan la memoria)
+SIGNATURE_CHUNK = 2000
+PAIR_CHUNK = 100000
+# Cubos de hasta este tamaño generan todos sus pares; los mas grandes (cientos de
+# copias de una misma oferta) enlazan cada miembro con el primero del cubo
+SMALL_BUCKET = 8
+
+
+def _permutations(num_perm: int, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    # Funciones h(x) = (a*x + b) mod 2^32 con a impar (una por permutacion)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def _shingle_hashes(texts: List[str], shingle_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Hash de 32 bits de cada shingle de palabras, concatenados, y el inicio de
+    # cada texto en el arreglo. Un texto con menos palabras que shingle_size
+    # aporta un solo shingle con todas sus palabras.
+    tokens = [t.split() for t in texts]
+    lengths = np.array([len(t) for t in tokens], dtype=np.int64)
+    flat = np.array([w for t in tokens for w in t] or [""], dtype=object)
+    words = pd.util.hash_array(flat) & MAX_HASH
+
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    n_shingles = np.maximum(lengths - shingle_size + 1, 1)
+    offsets = np.concatenate([[0], np.cumsum(n_shingles)[:-1]])
+
+    # Posicion de la primera palabra de cada shingle en 'flat'
+    first = np.repeat(starts - offsets, n_shingles) + np.arange(n_shingles.sum())
+    shingles = np.zeros(len(first), dtype=np.uint64)
+    multiplier = np.uint64(0x9E3779B1)
+    for j in range(shingle_size):
+        # Los textos cortos solo combinan las palabras que tienen
+        position = first + j
+        valid = position < np.repeat(starts + lengths, n_shingles)
+        shingles[valid] = (shingles[valid] * multiplier + words[position[valid]]) & MAX_HASH
+    return shingles, offsets
+
+
+def minhash_signatures(texts: List[str], num_perm: int = NUM_PERM, shingle_size: int = SHINGLE_SIZE,
+                       seed: int = 1) -> np.ndarray:
+    # Firma MinHash (n x num_perm, uint32) de cada texto
+    a, b = _permutations(num_perm, seed)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for start in range(0, len(texts), SIGNATURE_CHUNK):
+        shingles, offsets = _shingle_hashes(texts[start:start + SIGNATURE_CHUNK], shingle_size)
+        for p in range(num_perm):
+            permuted = (a[p] * shingles + b[p]) & MAX_HASH
+            signatures[start:start + len(offsets), p] = np.minimum.reduceat(permuted, offsets)
+    return signatures
+
+
+def lsh_candidates(signatures: np.ndarray, bands: int = BANDS) -> np.ndarray:
+    # Pares candidatos (i, j) con i < j que coinciden en al menos una banda.
+    # En los cubos chicos se generan todos los pares, para que la verificacion
+    # (Jaccard y coseno) vea cada par real; en los grandes cada miembro se enlaza
+    # con el primero del cubo (el costo sigue lineal aunque haya cientos de copias)
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    pairs = []
+    for band in range(bands):
+        # Clave de 64 bits del cubo (una colision solo agrega un candidato, que luego se verifica)
+        keys = np.zeros(n, dtype=np.uint64)
+        for column in signatures[:, band * rows:(band + 1) * rows].T:
+            keys = keys * np.uint64(0x100000001B3) ^ column.astype(np.uint64)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+        sizes = np.diff(np.concatenate([starts, [n]]))
+        for size in range(2, SMALL_BUCKET + 1):
+            group = starts[sizes == size]
+            for a in range(size - 1):
+                for b in range(a + 1, size):
+                    pairs.append(np.stack([order[group + a], order[group + b]], axis=1))
+        big = sizes > SMALL_BUCKET
+        if big.any():
+            members = np.repeat(starts[big], sizes[big])
+            position = np.arange(len(members)) - np.repeat(np.cumsum(sizes[big]) - sizes[big], sizes[big])
+            rest = position > 0
+            pairs.append(np.stack([order[members[rest]], order[(members + position)[rest]]], axis=1))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.sort(np.vstack(pairs), axis=1)
+    return np.unique(pairs, axis=0) if len(pairs) else pairs
+
+
+def _clusters(n: int, pairs: np.ndarray) -> np.ndarray:
+    # Union-find sobre los pares confirmados: devuelve la raiz de cada oferta
+    # (la raiz es siempre la de menor indice, la que se conserva)
+    parent = np.arange(n)
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for i, j in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(n)], dtype=np.int64)
+
+
+def near_duplicate_groups(texts: List[str], embeddings: Optional[np.ndarray] = None,
+                          threshold: float = JACCARD_THRESHOLD, min_cosine: Optional[float] = None,
+                          num_perm: int = NUM_PERM, bands: int = BANDS,
+                          shingle_size: int = SHINGLE_SIZE) -> Tuple[np.ndarray, Dict]:
+    # Devuelve (roots, stats): roots[i] es la oferta que representa el grupo de i
+    # (la primera del grupo; roots[i] == i si i no es duplicada de una anterior).
+    # Con embeddings y min_cosine, un par solo cuenta si ademas sus embeddings
+    # tienen similitud coseno >= min_cosine.
+    start = time.time()
+    n = len(texts)
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) debe ser múltiplo de bands ({bands})")
+
+    signatures = minhash_signatures(texts, num_perm, shingle_size)
+    candidates = lsh_candidates(signatures, bands)
+
+    # Jaccard estimada: fraccion de permutaciones con el mismo minimo
+    jaccard = np.zeros(len(candidates))
+    for s in range(0, len(candidates), PAIR_CHUNK):
+        chunk = candidates[s:s + PAIR_CHUNK]
+        jaccard[s:s + len(chunk)] = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+    confirmed = candidates[jaccard >= threshold]
+
+    rejected_by_cosine = 0
+    if embeddings is not None and min_cosine is not None and len(confirmed):
+        # Solo se leen los embeddings de los pares confirmados (por tramos)
+        cosine = np.zeros(len(confirmed), dtype='float32')
+        for s in range(0, len(confirmed), PAIR_CHUNK):
+            chunk = confirmed[s:s + PAIR_CHUNK]
+            left = np.asarray(embeddings[chunk[:, 0]], dtype='float32')
+            right = np.asarray(embeddings[chunk[:, 1]], dtype='float32')
+            norms = np.maximum(np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1), 1e-12)
+            cosine[s:s + len(chunk)] = np.einsum('ij,ij->i', left, right) / norms
+        rejected_by_cosine = int((cosine < min_cosine).sum())
+        confirmed = confirmed[cosine >= min_cosine]
+
+    roots = _clusters(n, confirmed)
+    keep = roots == np.arange(n)
+    sizes = Counter(Counter(roots[~keep].tolist()).values())
+    cluster_sizes = np.bincount(roots)[np.unique(roots[~keep])] if (~keep).any() else np.zeros(0, dtype=int)
+
+    stats = {
+        'offers': n,
+        'kept': int(keep.sum()),
+        'duplicates': int((~keep).sum()),
+        'clusters': int(len(cluster_sizes)),
+        'largest_cluster': int(cluster_sizes.max()) if len(cluster_sizes) else 0,
+        'mean_cluster_size': round(float(cluster_sizes.mean()), 2) if len(cluster_sizes) else 0.0,
+        # tamaño del grupo (incluida la oferta conservada) -> numero de grupos
+        'cluster_size_histogram': {str(size + 1): count for size, count in sorted(sizes.items())},
+        'candidate_pairs': int(len(candidates)),
+        'confirmed_pairs': int(len(confirmed)),
+        'rejected_by_cosine': rejected_by_cosine,
+        'threshold': threshold,
+        'min_cosine': min_cosine,
+        'num_perm': num_perm,
+        'bands': bands,
+        'shingle_size': shingle_size,
+        'seconds': round(time.time() - start, 3),
+    }
+    return roots, stats
+
+
+def find_near_duplicates(texts: List[str], embeddings: Optional[np.ndarray] = None,
+                         **kwargs) -> Tuple[np.ndarray, Dict]:
+    # Devuelve (keep, stats): keep[i] es False si la oferta i es casi duplicada de
+    # una anterior (de cada grupo se conserva la primera, como drop_duplicates)
+    roots, stats = near_duplicate_groups(texts, embeddings, **kwargs)
+    return roots == np.arange(len(texts)), stats
+
+
+def largest_groups(roots: np.ndarray, limit: int = 10) -> List[List[int]]:
+    # Indices de los grupos mas grandes (para revisar a mano lo que se elimina)
+    groups = {}
+    for i, root in enumerate(roots):
+        if root != i:
+            groups.setdefault(int(root), [int(root)]).append(i)
+    return sorted(groups.values(), key=len, reverse=True)[:limit]
+
+
+def print_report(stats: Dict):
+    print(f"Casi duplicados (MinHash/LSH, Jaccard >= {stats['threshold']}):")
+    print(f"{stats['offers']} ofertas -> {stats['kept']} únicas ({stats['duplicates']} eliminadas "
+          f"en {stats['clusters']} grupos, el mayor de {stats['largest_cluster']}) en {stats['seconds']}s")
+    print(f"  Pares candidatos: {stats['candidate_pairs']} | confirmados: {stats['confirmed_pairs']}"
+          + (f" | descartados por coseno: {stats['rejected_by_cosine']}" if stats.get('min_cosine') else ""))
+
+
+if __name__ == "__main__":
+    # Analiza un store ya generado (sin modificarlo) y muestra los grupos de casi duplicados
+    parser = argparse.ArgumentParser(description="Detecta ofertas casi duplicadas en un store")
+    parser.add_argument("store", type=str, help="Ruta a vectors_*.store")
+    parser.add_argument("--threshold", type=float, default=JACCARD_THRESHOLD)
+    parser.add_argument("--min-cosine", type=float, default=None,
+                        help="Confirmar cada par con la similitud coseno de sus embeddings")
+    parser.add_argument("--examples", type=int, default=5, help="Grupos de ejemplo a mostrar")
+    parser.add_argument("--output", type=str, default=None, help="Guardar las estadísticas en JSON")
+    args = parser.parse_args()
+
+    from vector_store import VectorStore
+    store = VectorStore(args.store)
+    texts = list(store.columns['cleaned_text'])
+    roots, stats = near_duplicate_groups(texts, store.embeddings, threshold=args.threshold,
+                                         min_cosine=args.min_cosine)
+    print_report(stats)
+
+    titles = store.columns['title']
+    for group in largest_groups(roots, limit=args.examples):
+        print(f"\n  Grupo de {len(group)}:")
+        for i in group[:5]:
+            print(f"    [{i}] {titles[i][:80]}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2, ensure_ascii=False)
+        print(f"\nOK - Estadísticas guardadas en {args.output}")
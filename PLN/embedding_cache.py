@@ -0,0 +1,108 @@
+import os
+import json
+import hashlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+
+# Cache en disco de embeddings indexada por hash(cleaned_text, modelo):
+#   cache.json   -> dimension, modelo y numero de filas validas
+#   keys.bin     -> digests sha256 (32 bytes por fila)
+#   vectors.f32  -> embeddings float32 crudos (sin normalizar), fila a fila
+KEYS_FILE = 'keys.bin'
+VECTORS_FILE = 'vectors.f32'
+META_FILE = 'cache.json'
+KEY_SIZE = 32
+
+
+def content_key(cleaned_text: str, model_name: str) -> str:
+    # Clave de contenido de una oferta: cambia si cambia el texto o el modelo
+    digest = hashlib.sha256()
+    digest.update(model_name.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(cleaned_text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    # Cache append-only: solo se agregan filas, y cache.json se escribe al final
+    # de cada agregado, por lo que un proceso interrumpido no deja filas a medias.
+
+    def __init__(self, cache_dir: str, model_name: str):
+        # Cada modelo tiene su propio subdirectorio dentro de cache_dir
+        self.cache_dir = os.path.join(cache_dir, model_name.replace('/', '__'))
+        self.model_name = model_name
+        self.dim = None
+        self.count = 0
+        self._rows: Dict[bytes, int] = {}
+
+        meta_path = os.path.join(self.cache_dir, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            self.dim = meta['dim']
+            self.count = meta['count']
+            self._truncate_to_count()
+            keys = np.fromfile(os.path.join(self.cache_dir, KEYS_FILE), dtype=f'V{KEY_SIZE}', count=self.count)
+            self._rows = {k.tobytes(): i for i, k in enumerate(keys)}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, key: str) -> bool:
+        return bytes.fromhex(key) in self._rows
+
+    def _truncate_to_count(self):
+        # Descarta bytes de un agregado que no llego a confirmarse en cache.json
+        for name, size in ((KEYS_FILE, self.count * KEY_SIZE), (VECTORS_FILE, self.count * self.dim * 4)):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.getsize(path) > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+
+    def lookup(self, keys: List[str]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        # Devuelve (mascara de encontrados, embeddings de los encontrados en orden)
+        rows = [self._rows.get(bytes.fromhex(k), -1) for k in keys]
+        found = np.array([r >= 0 for r in rows], dtype=bool)
+        if not found.any():
+            return found, None
+        vectors = np.memmap(os.path.join(self.cache_dir, VECTORS_FILE), dtype='<f4', mode='r',
+                            shape=(self.count, self.dim))
+        return found, np.array(vectors[[r for r in rows if r >= 0]])
+
+    def add(self, keys: List[str], embeddings: np.ndarray):
+        # Agrega nuevas filas (las claves ya presentes se ignoran)
+        embeddings = np.ascontiguousarray(embeddings, dtype='<f4')
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"Dimensión {embeddings.shape[1]} distinta a la de la cache ({self.dim})")
+
+        new_rows = []
+        new_keys = []
+        seen = set()
+        for i, key in enumerate(keys):
+            raw = bytes.fromhex(key)
+            if raw not in self._rows and raw not in seen:
+                seen.add(raw)
+                new_rows.append(i)
+                new_keys.append(raw)
+        if not new_rows:
+            return
+
+        # Si la cache esta vacia se sobreescriben restos de una corrida interrumpida
+        mode = 'ab' if self.count else 'wb'
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, VECTORS_FILE), mode) as f:
+            f.write(embeddings[new_rows].tobytes())
+        with open(os.path.join(self.cache_dir, KEYS_FILE), mode) as f:
+            f.write(b''.join(new_keys))
+
+        for raw in new_keys:
+            self._rows[raw] = self.count
+            self.count += 1
+
+        tmp_meta = os.path.join(self.cache_dir, META_FILE + '.tmp')
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({'model_name': self.model_name, 'dim': self.dim, 'count': self.count}, f)
+        os.replace(tmp_meta, os.path.join(self.cache_dir, META_FILE))
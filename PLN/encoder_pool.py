@@ -0,0 +1,97 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import numpy as np
+
+
+# Pool de procesos para codificar en CPU: cada worker carga su propia copia del
+# modelo y usa pocos hilos de torch, de modo que N workers x T hilos ocupan la
+# maquina completa (un solo encode en un proceso deja la mayoria de nucleos libres).
+
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int, backend: str):
+    # Se ejecuta una vez por worker: limita hilos y carga el modelo
+    global _worker_model
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    if backend == 'torch':
+        # Solo el backend torch necesita torch; los ONNX leen OMP_NUM_THREADS
+        import torch
+        torch.set_num_threads(threads)
+    from model_registry import get_model
+    _worker_model = get_model(model_name, backend, device='cpu')
+
+
+def _encode_chunk(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=batch_size, show_progress_bar=False),
+                      dtype='float32')
+
+
+def _warmup_worker(text: str) -> int:
+    # Un encode corto; la pausa evita que un solo worker se lleve todas las tareas
+    _worker_model.encode([text], show_progress_bar=False)
+    time.sleep(0.05)
+    return os.getpid()
+
+
+class EncoderPool:
+    # Reparte los textos en sub-bloques entre los workers y devuelve los
+    # embeddings en el mismo orden de entrada
+
+    def __init__(self, model_name: str, workers: Optional[int] = None,
+                 threads_per_worker: int = 2, mp_context: str = 'spawn', backend: str = 'torch'):
+        cpus = os.cpu_count() or 1
+        self.model_name = model_name
+        self.backend = backend
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.workers = workers or max(1, cpus // self.threads_per_worker)
+        print(f"Iniciando pool de encoding: {self.workers} workers x {self.threads_per_worker} hilos...")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(mp_context),
+            initializer=_init_worker,
+            initargs=(model_name, self.threads_per_worker, backend)
+        )
+        self.texts_encoded = 0
+        self.seconds = 0.0
+
+    def encode(self, texts: List[str], batch_size: int = 32, chunk_size: Optional[int] = None) -> np.ndarray:
+        # Codifica la lista completa usando todos los workers
+        if not texts:
+            return np.zeros((0, 0), dtype='float32')
+        chunk_size = chunk_size or max(batch_size, -(-len(texts) // (self.workers * 4)))
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+
+        start = time.time()
+        parts = list(self._executor.map(_encode_chunk, chunks, [batch_size] * len(chunks)))
+        self.seconds += time.time() - start
+        self.texts_encoded += len(texts)
+        return np.vstack(parts)
+
+    def warmup(self, text: str = 'warmup', rounds: int = 20) -> int:
+        # Arranca los workers y carga el modelo en cada uno antes de medir tiempos;
+        # devuelve cuantos workers distintos respondieron
+        seen = set()
+        for _ in range(rounds):
+            seen.update(self._executor.map(_warmup_worker, [text] * self.workers))
+            if len(seen) >= self.workers:
+                break
+        return len(seen)
+
+    def throughput(self) -> float:
+        # Textos por segundo acumulados del pool
+        return self.texts_encoded / self.seconds if self.seconds else 0.0
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
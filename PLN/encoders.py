@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List, Optional
+import numpy as np
+from config import MODEL_NAME, ENCODER_BACKEND, ONNX_DIR, QUANTIZATION_CONFIG, MIN_COSINE
+
+
+# Backends del encoder de embeddings:
+#   torch     -> SentenceTransformer en PyTorch fp32 (el comportamiento original)
+#   onnx      -> el mismo modelo exportado a ONNX Runtime
+#   onnx_int8 -> el export ONNX con cuantizacion dinamica int8 de los pesos
+# Los exports se generan la primera vez y quedan en ONNX_DIR.
+# sentence_transformers (y torch) se importan solo al cargar un encoder.
+BACKENDS = ('torch', 'onnx', 'onnx_int8')
+
+
+def encoder_id(model_name: str, backend: str) -> str:
+    # Identificador del encoder (modelo + backend) para caches y stores;
+    # con torch coincide con el nombre del modelo, como antes
+    return model_name if backend == 'torch' else f"{model_name}@{backend}"
+
+
+def quantized_file_name(quantization_config: str) -> str:
+    # Ruta (relativa al modelo) que usa sentence-transformers para el export int8
+    return f"onnx/model_qint8_{quantization_config}.onnx"
+
+
+def _local_model_dir(model_name: str, onnx_dir: str) -> str:
+    return os.path.join(onnx_dir, model_name.replace('/', '__'))
+
+
+def load_encoder(model_name: str = MODEL_NAME, backend: Optional[str] = None,
+                 onnx_dir: Optional[str] = None, quantization_config: Optional[str] = None,
+                 device: Optional[str] = None) -> "SentenceTransformer":
+    # Carga el encoder con el backend pedido (por defecto el de config.py)
+    # Para compartir la instancia entre procesadores usar model_registry.get_model
+    backend = backend or ENCODER_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de encoder desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+    from sentence_transformers import SentenceTransformer
+    kwargs = {'device': device} if device else {}
+    if backend == 'torch':
+        return SentenceTransformer(model_name, **kwargs)
+
+    local_dir = _local_model_dir(model_name, onnx_dir or ONNX_DIR)
+    if not os.path.exists(os.path.join(local_dir, 'onnx', 'model.onnx')):
+        print(f"Exportando {model_name} a ONNX en {local_dir}...")
+        SentenceTransformer(model_name, backend='onnx').save_pretrained(local_dir)
+    if backend == 'onnx':
+        return SentenceTransformer(local_dir, backend='onnx', **kwargs)
+
+    quantization_config = quantization_config or QUANTIZATION_CONFIG
+    file_name = quantized_file_name(quantization_config)
+    if not os.path.exists(os.path.join(local_dir, file_name)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        print(f"Cuantizando a int8 ({quantization_config})...")
+        onnx_model = SentenceTransformer(local_dir, backend='onnx')
+        export_dynamic_quantized_onnx_model(onnx_model, quantization_config, local_dir)
+    return SentenceTransformer(local_dir, backend='onnx', model_kwargs={'file_name': file_name}, **kwargs)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype='float32')
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def compare_encoders(reference: "SentenceTransformer", candidate: "SentenceTransformer", texts: List[str],
+                     min_cosine: float = MIN_COSINE, batch_size: int = 32) -> Dict:
+    # Codifica los mismos textos con ambos encoders y mide la similitud coseno
+    # fila a fila (y la diferencia de tiempos)
+    start = time.time()
+    expected = reference.encode(texts, batch_size=batch_size, show_progress_bar=False)
+    reference_seconds = time.time() - start
+
+    start = time.time()
+    obtained = candidate.encode(texts, batch_size=batch_size, show_progress_bar=False)
+    candidate_seconds = time.time() - start
+
+    cosines = np.sum(_normalize(expected) * _normalize(obtained), axis=1)
+    worst = int(np.argmin(cosines))
+    return {
+        'texts': len(texts),
+        'min_cosine': float(cosines[worst]),
+        'mean_cosine': float(cosines.mean()),
+        'worst_text': worst,
+        'threshold': min_cosine,
+        'ok': bool(cosines[worst] >= min_cosine),
+        'reference_seconds': reference_seconds,
+        'candidate_seconds': candidate_seconds,
+        'speedup': reference_seconds / candidate_seconds if candidate_seconds else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    # Verifica que un backend se mantenga dentro de la tolerancia frente a torch fp32
+    # sobre los perfiles de evaluacion
+    default_profiles = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                    'evaluation', 'data', 'test_profiles.json')
+    parser = argparse.ArgumentParser(description="Compara un backend del encoder con PyTorch fp32")
+    parser.add_argument("--backend", type=str, default=ENCODER_BACKEND, choices=BACKENDS)
+    parser.add_argument("--model", type=str, default=MODEL_NAME)
+    parser.add_argument("--profiles", type=str, default=default_profiles, help="JSON con perfiles ('texto')")
+    parser.add_argument("--min-cosine", type=float, default=MIN_COSINE)
+    args = parser.parse_args()
+
+    from profile_processor import ProfileProcessor
+    processor = ProfileProcessor(args.model, backend='torch')
+    with open(args.profiles, 'r', encoding='utf-8') as f:
+        texts = [processor.clean_text(p['texto']) for p in json.load(f)]
+    texts = [t for t in texts if t]
+
+    candidate = load_encoder(args.model, args.backend)
+    report = compare_encoders(processor.model, candidate, texts, min_cosine=args.min_cosine)
+
+    print(f"\nBackend {args.backend} vs torch fp32 ({report['texts']} perfiles)")
+    print(f"  Coseno mínimo: {report['min_cosine']:.5f} | medio: {report['mean_cosine']:.5f} "
+          f"(umbral {report['threshold']})")
+    print(f"  Tiempo: {report['reference_seconds']:.3f}s -> {report['candidate_seconds']:.3f}s "
+          f"({report['speedup']:.2f}x)")
+    if report['ok']:
+        print("OK - El backend está dentro de la tolerancia")
+    else:
+        print(f"X - Fuera de tolerancia (perfil #{report['worst_text']})")
+        sys.exit(1)
@@ -0,0 +1,129 @@
+import gc
+import time
+import threading
+import weakref
+from typing import Callable, Dict, List, Optional
+from searcher import JobSearcher
+
+
+class HotSwapSearcher:
+    # Envuelve un JobSearcher y lo reemplaza por una generacion nueva cuando cambian
+    # los datos en disco. Cada atributo/metodo se resuelve sobre la generacion actual
+    # en el momento de pedirlo, asi que una busqueda en curso termina sobre la
+    # generacion con la que empezo; el cambio es una sola asignacion.
+    # Como maximo conviven dos generaciones: no se construye una nueva mientras la
+    # anterior a la actual siga referenciada por busquedas en curso.
+
+    def __init__(self, searcher: JobSearcher, drain_timeout: float = 30.0):
+        # Cada generacion lleva su numero, para que quien la use sepa a cual pertenece
+        searcher.generation = 1
+        self._current = searcher
+        self.drain_timeout = drain_timeout
+        self.last_reload: Optional[Dict] = None
+        self._retired: Optional[weakref.ref] = None
+        self._reload_lock = threading.Lock()
+        self._callbacks: List[Callable[[JobSearcher, JobSearcher], None]] = []
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    @property
+    def current(self) -> JobSearcher:
+        return self._current
+
+    @property
+    def generation(self) -> int:
+        return self._current.generation
+
+    def __getattr__(self, name):
+        # Solo se llama para atributos que no son del envoltorio: van a la generacion actual
+        return getattr(self._current, name)
+
+    def on_swap(self, callback: Callable[[JobSearcher, JobSearcher], None]):
+        # callback(anterior, nueva) se ejecuta justo despues de cada cambio
+        self._callbacks.append(callback)
+
+    def has_changes(self) -> bool:
+        return self._current.read_disk_signature() != self._current.disk_signature
+
+    def _wait_for_retired(self) -> bool:
+        # Espera a que la generacion retirada en el cambio anterior se libere
+        deadline = time.time() + self.drain_timeout
+        while self._retired is not None and self._retired() is not None:
+            if time.time() > deadline:
+                return False
+            gc.collect()
+            time.sleep(0.05)
+        self._retired = None
+        return True
+
+    def reload_now(self) -> bool:
+        # Construye la nueva generacion fuera del camino de las peticiones y la activa
+        with self._reload_lock:
+            if not self._wait_for_retired():
+                print("X - Recarga pospuesta: la generación anterior sigue en uso")
+                return False
+
+            start = time.time()
+            try:
+                new = self._current.reload()
+            except Exception as e:
+                # Datos a medio escribir o corruptos: se sigue sirviendo la generacion actual
+                print(f"X - No se pudo recargar el índice: {e}")
+                return False
+
+            old = self._current
+            new.generation = old.generation + 1
+            self._current = new
+            self._retired = weakref.ref(old)
+            self.last_reload = {
+                'generation': self.generation,
+                'seconds': round(time.time() - start, 3),
+                'total_jobs': new.total_jobs,
+                'previous_total_jobs': old.total_jobs,
+                'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+            for callback in self._callbacks:
+                callback(old, new)
+            del old
+            print(f"OK - Generación {self.generation} activa ({self.last_reload['total_jobs']} ofertas, "
+                  f"{self.last_reload['seconds']}s)")
+            return True
+
+    def start_watching(self, interval: float = 30.0):
+        # Revisa el directorio cada 'interval' segundos en un hilo aparte. Un cambio
+        # se aplica cuando la huella es igual en dos revisiones seguidas, para no
+        # recargar mientras process_embeddings sigue escribiendo.
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def watch():
+            pending = None
+            while not self._stop.wait(interval):
+                try:
+                    signature = self._current.read_disk_signature()
+                except OSError:
+                    continue
+                if signature == self._current.disk_signature:
+                    pending = None
+                elif signature != pending:
+                    pending = signature
+                else:
+                    pending = None
+                    self.reload_now()
+
+        self._watcher = threading.Thread(target=watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def reload_statistics(self) -> Dict:
+        return {
+            'generation': self.generation,
+            'watching': self._watcher is not None,
+            'last_reload': self.last_reload,
+        }
@@ -0,0 +1,361 @@
+import os
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+
+
+# faiss se importa dentro de cada funcion que lo usa: las herramientas que solo
+# leen metadata no pagan el costo de cargarlo
+
+# Tipos de indice soportados por JobSearcher
+# sq_fp16 / sq_int8 guardan los vectores cuantizados (2 y 1 byte por dimension)
+# y reordenan los mejores candidatos con los vectores float32 exactos
+INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw', 'sq_fp16', 'sq_int8')
+
+# Parametros por defecto de cada tipo (se pueden sobreescribir con index_params)
+DEFAULT_PARAMS = {
+    'flat': {},
+    'ivf_flat': {'nlist': None, 'nprobe': None},
+    'ivf_pq': {'nlist': None, 'nprobe': None, 'pq_m': 16, 'pq_nbits': 8},
+    'hnsw': {'hnsw_m': 32, 'ef_construction': 80, 'ef_search': 64},
+    # rescore: candidatos pedidos al indice por cada resultado (0 = sin reordenar)
+    'sq_fp16': {'rescore': 4},
+    'sq_int8': {'rescore': 4},
+}
+
+MAX_TRAINING_POINTS = 100000
+
+# 2: los indices van envueltos en IndexIDMap (ids = indices globales)
+MANIFEST_VERSION = 2
+
+
+def resolve_params(index_type: str, index_params: Optional[Dict] = None) -> Dict:
+    # Combina los parametros por defecto con los indicados por el usuario
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Tipo de índice desconocido: {index_type}. Opciones: {', '.join(INDEX_TYPES)}")
+    params = dict(DEFAULT_PARAMS[index_type])
+    for key, value in (index_params or {}).items():
+        if key not in params:
+            raise ValueError(f"Parámetro '{key}' no válido para el índice {index_type}")
+        params[key] = value
+    return params
+
+
+def _default_nlist(n: int) -> int:
+    # ~4*sqrt(n) listas, con al menos 39 puntos de entrenamiento por lista
+    return max(1, min(int(4 * np.sqrt(n)), n // 39))
+
+
+def training_sample(blocks: List[np.ndarray], max_points: int = MAX_TRAINING_POINTS,
+                    seed: int = 0) -> np.ndarray:
+    # Muestra aleatoria de filas repartida entre los bloques (sin apilar todo el corpus)
+    total = sum(len(b) for b in blocks)
+    if total <= max_points:
+        return np.ascontiguousarray(np.vstack(blocks), dtype='float32')
+
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(total, size=max_points, replace=False))
+    sample = []
+    start = 0
+    for block in blocks:
+        local = rows[(rows >= start) & (rows < start + len(block))] - start
+        if len(local):
+            sample.append(block[local])
+        start += len(block)
+    return np.ascontiguousarray(np.vstack(sample), dtype='float32')
+
+
+def build_index(blocks: List[np.ndarray], dim: int, index_type: str = 'flat',
+                index_params: Optional[Dict] = None, ids: Optional[np.ndarray] = None) -> "faiss.Index":
+    # Crea, entrena (si hace falta) y llena el indice con los bloques normalizados
+    # El indice va envuelto en IndexIDMap: cada vector se guarda con su indice
+    # global (por defecto su posicion en los bloques, o los ids dados), de modo que
+    # quitar vectores no desplaza los ids de los demas
+    import faiss
+    params = resolve_params(index_type, index_params)
+    n = sum(len(b) for b in blocks)
+
+    if index_type == 'flat':
+        index = faiss.IndexFlatIP(dim)
+
+    elif index_type in ('ivf_flat', 'ivf_pq'):
+        nlist = params['nlist'] or _default_nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == 'ivf_flat':
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            pq_m = params['pq_m']
+            if dim % pq_m != 0:
+                raise ValueError(f"pq_m={pq_m} debe dividir la dimensión {dim}")
+            # PQ necesita ~39 * 2^nbits puntos para entrenar cada subcuantizador
+            pq_nbits = params['pq_nbits']
+            while pq_nbits > 4 and 39 * 2 ** pq_nbits > n:
+                pq_nbits -= 1
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_nbits, faiss.METRIC_INNER_PRODUCT)
+
+        index.train(training_sample(blocks))
+        index.nprobe = params['nprobe'] or max(1, nlist // 8)
+
+    elif index_type in ('sq_fp16', 'sq_int8'):
+        qtype = faiss.ScalarQuantizer.QT_fp16 if index_type == 'sq_fp16' else faiss.ScalarQuantizer.QT_8bit
+        index = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+        # int8 aprende el rango de cada dimension; fp16 no necesita entrenamiento
+        if not index.is_trained:
+            index.train(training_sample(blocks))
+
+    else:  # hnsw
+        index = faiss.IndexHNSWFlat(dim, params['hnsw_m'], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params['ef_construction']
+        index.hnsw.efSearch = params['ef_search']
+
+    index = faiss.IndexIDMap(index)
+    start = 0
+    for block in blocks:
+        if len(block):
+            block_ids = np.arange(start, start + len(block)) if ids is None else ids[start:start + len(block)]
+            index.add_with_ids(np.ascontiguousarray(block, dtype='float32'),
+                               np.ascontiguousarray(block_ids, dtype='int64'))
+        start += len(block)
+
+    return index
+
+
+def base_index(index: "faiss.Index") -> "faiss.Index":
+    # Indice real dentro del IndexIDMap (donde viven nprobe, efSearch, etc.)
+    import faiss
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def search_parameters(index: "faiss.Index", nprobe: Optional[int] = None,
+                      ef_search: Optional[int] = None, selector=None):
+    # Parametros de busqueda por consulta (no modifican el indice compartido);
+    # selector (faiss.IDSelector) restringe la busqueda a un subconjunto de ids
+    import faiss
+    index = base_index(index)
+    if isinstance(index, faiss.IndexIVF) and (nprobe is not None or selector is not None):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=int(nprobe or index.nprobe))
+    if isinstance(index, faiss.IndexHNSW) and (ef_search is not None or selector is not None):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(ef_search or index.hnsw.efSearch))
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def index_settings(index: "faiss.Index") -> Dict:
+    # Knobs actuales del indice (para estadisticas)
+    import faiss
+    index = base_index(index)
+    settings = {}
+    if isinstance(index, faiss.IndexIVF):
+        settings['nlist'] = int(index.nlist)
+        settings['nprobe'] = int(index.nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        settings['ef_search'] = int(index.hnsw.efSearch)
+    if isinstance(index, (faiss.IndexFlat, faiss.IndexScalarQuantizer)):
+        settings['bytes_per_vector'] = int(index.code_size)
+    return settings
+
+
+def exact_top_k(queries: np.ndarray, blocks: List[np.ndarray], k: int) -> np.ndarray:
+    # Top-k exacto por producto interno, recorriendo los bloques sin apilarlos
+    best_scores = np.full((len(queries), 0), -np.inf, dtype='float32')
+    best_ids = np.zeros((len(queries), 0), dtype='int64')
+    start = 0
+    for block in blocks:
+        if len(block):
+            scores = queries @ np.asarray(block).T
+            ids = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            best_scores = np.hstack([best_scores, scores])
+            best_ids = np.hstack([best_ids, ids])
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_ids = np.take_along_axis(best_ids, top, axis=1)
+        start += len(block)
+    return best_ids
+
+
+def exact_search_subset(queries: np.ndarray, blocks: List[np.ndarray], ids: np.ndarray, k: int,
+                        chunk_rows: int = 65536):
+    # Top-k exacto restringido a los ids dados (ordenados), leyendo sus filas por tramos
+    best_scores = np.full((len(queries), 0), -np.inf, dtype='float32')
+    best_ids = np.zeros((len(queries), 0), dtype='int64')
+    for start in range(0, len(ids), chunk_rows):
+        chunk = ids[start:start + chunk_rows]
+        scores = queries @ gather_rows(blocks, chunk).T
+        best_scores = np.hstack([best_scores, scores])
+        best_ids = np.hstack([best_ids, np.broadcast_to(chunk, scores.shape)])
+        if best_scores.shape[1] > k:
+            top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(best_scores, top, axis=1)
+            best_ids = np.take_along_axis(best_ids, top, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind='stable')[:, :k]
+    scores = np.take_along_axis(best_scores, order, axis=1).astype('float32')
+    found = np.take_along_axis(best_ids, order, axis=1)
+    # Completar con -1 si el subconjunto tiene menos de k ofertas
+    if found.shape[1] < k:
+        pad = k - found.shape[1]
+        scores = np.hstack([scores, np.full((len(queries), pad), -np.inf, dtype='float32')])
+        found = np.hstack([found, np.full((len(queries), pad), -1, dtype='int64')])
+    return scores, found
+
+
+def gather_rows(blocks: List[np.ndarray], ids: np.ndarray) -> np.ndarray:
+    # Filas de la matriz logica formada por los bloques (sin apilarlos); con
+    # bloques mmap solo se leen del disco las filas pedidas
+    ids = np.asarray(ids, dtype='int64')
+    ends = np.cumsum([len(b) for b in blocks])
+    owner = np.searchsorted(ends, ids, side='right')
+    rows = np.empty((len(ids), blocks[0].shape[1]), dtype='float32')
+    for b in np.unique(owner):
+        mask = owner == b
+        start = ends[b] - len(blocks[b])
+        rows[mask] = blocks[b][ids[mask] - start]
+    return rows
+
+
+def search_with_rescore(index: "faiss.Index", queries: np.ndarray, k: int, blocks: List[np.ndarray],
+                        rescore: int = 0, params=None):
+    # Busca k * rescore candidatos en el indice cuantizado y los reordena con el
+    # producto interno exacto contra los vectores float32 de los bloques
+    if rescore <= 1:
+        return index.search(queries, k, params=params)
+    n_candidates = min(index.ntotal, k * rescore)
+    _, candidates = index.search(queries, n_candidates, params=params)
+
+    valid = candidates >= 0
+    vectors = gather_rows(blocks, np.where(valid, candidates, 0).ravel())
+    vectors = vectors.reshape(len(queries), n_candidates, -1)
+    scores = np.einsum('qd,qcd->qc', queries, vectors)
+    scores[~valid] = -np.inf
+
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    scores = np.take_along_axis(scores, order, axis=1)
+    ids = np.take_along_axis(candidates, order, axis=1)
+    ids[np.isneginf(scores)] = -1
+    return scores.astype('float32'), ids
+
+
+def recall_vs_flat(index: "faiss.Index", blocks: List[np.ndarray], k: int = 10,
+                   n_queries: int = 200, nprobe: Optional[int] = None,
+                   ef_search: Optional[int] = None, seed: int = 0, rescore: int = 0) -> float:
+    # Recall@k del indice aproximado frente a la busqueda exacta (IndexFlatIP),
+    # usando como consultas una muestra de los propios vectores del corpus
+    n = sum(len(b) for b in blocks)
+    if n == 0:
+        return 1.0
+    k = min(k, n)
+    queries = training_sample(blocks, max_points=min(n_queries, n), seed=seed)
+
+    expected = exact_top_k(queries, blocks, k)
+    _, found = search_with_rescore(index, queries, k, blocks, rescore,
+                                   params=search_parameters(index, nprobe, ef_search))
+
+    hits = sum(len(set(e) & set(f)) for e, f in zip(expected, found))
+    return hits / float(len(queries) * k)
+
+
+def index_paths(index_dir: str, index_type: str):
+    # Rutas del indice guardado y de su manifest
+    return (os.path.join(index_dir, f"{index_type}.faiss"),
+            os.path.join(index_dir, f"{index_type}.manifest.json"))
+
+
+def build_manifest(sources: List[Dict], dim: int, index_type: str, params: Dict,
+                   recall: Optional[float] = None) -> Dict:
+    # Describe con que datos y configuracion se construyo el indice
+    import faiss
+    return {
+        'manifest_version': MANIFEST_VERSION,
+        'index_type': index_type,
+        'index_params': params,
+        'dim': int(dim),
+        'normalized': True,
+        'metric': 'inner_product',
+        'total': int(sum(s.get('count', 0) for s in sources)),
+        'sources': sources,
+        'recall_vs_flat': recall,
+        'faiss_version': faiss.__version__,
+        'built_at': datetime.now().isoformat(),
+    }
+
+
+def read_manifest(manifest_path: str) -> Optional[Dict]:
+    # Lee el manifest (None si no existe o esta corrupto)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def manifest_matches(manifest: Optional[Dict], sources: List[Dict], dim: int,
+                     index_type: str, params: Dict) -> bool:
+    # True si el indice guardado corresponde exactamente a las fuentes actuales
+    if not manifest or manifest.get('manifest_version') != MANIFEST_VERSION:
+        return False
+    if (manifest.get('index_type') != index_type or manifest.get('index_params') != params
+            or manifest.get('dim') != dim or not manifest.get('normalized')):
+        return False
+    saved = [(s['name'], s['sha256']) for s in manifest.get('sources', [])]
+    return saved == [(s['name'], s['sha256']) for s in sources]
+
+
+def appended_from(manifest: Optional[Dict], sources: List[Dict], dim: int, index_type: str,
+                  params: Dict, store_segments: Dict[str, List[Dict]]) -> Optional[int]:
+    # Si las fuentes actuales son las del manifest mas filas agregadas al final
+    # (en la ultima fuente y/o fuentes nuevas detras), devuelve el numero de filas
+    # ya indexadas; si hay cualquier otro cambio devuelve None (reconstruir).
+    if not manifest or manifest.get('manifest_version') != MANIFEST_VERSION:
+        return None
+    if (manifest.get('index_type') != index_type or manifest.get('index_params') != params
+            or manifest.get('dim') != dim or not manifest.get('normalized')):
+        return None
+
+    saved = manifest.get('sources', [])
+    if not saved or len(sources) < len(saved):
+        return None
+    for i, old in enumerate(saved):
+        current = sources[i]
+        if current['name'] != old['name']:
+            return None
+        if current['sha256'] == old['sha256']:
+            continue
+        # Solo la ultima fuente indexada puede crecer sin desplazar los indices globales
+        if i != len(saved) - 1:
+            return None
+        segments = store_segments.get(current['name'], [])
+        if not any(seg['count'] == old.get('count') and seg['digest'] == old['sha256'] for seg in segments):
+            return None
+    return int(manifest['total'])
+
+
+def save_index(index: "faiss.Index", index_path: str, manifest_path: str, manifest: Dict):
+    # Escribe indice y manifest (el manifest al final: sin manifest no se usa el indice)
+    import faiss
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    tmp_index = index_path + '.tmp'
+    faiss.write_index(index, tmp_index)
+    os.replace(tmp_index, index_path)
+    tmp_manifest = manifest_path + '.tmp'
+    with open(tmp_manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_manifest, manifest_path)
+
+
+def load_index(index_path: str, mmap: bool = True) -> "faiss.Index":
+    # Lee un indice guardado; con mmap los datos quedan en el page cache compartido
+    import faiss
+    if mmap:
+        flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(index_path, flag)
+        except RuntimeError:
+            pass
+    return faiss.read_index(index_path)
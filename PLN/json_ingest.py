@@ -0,0 +1,136 @@
+import os
+import json
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+import pandas as pd
+
+
+# Ingesta de los avisos_*.json: cada archivo se parsea de forma incremental
+# (sin cargar el arreglo completo en memoria) y se convierte a DataFrame por
+# bloques; los archivos se reparten entre procesos, que dejan sus bloques en
+# disco para que el proceso principal los lea de a uno.
+READ_CHUNK_BYTES = 1 << 20
+DEFAULT_CHUNK_ROWS = 5000
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array(path: str, read_chunk_bytes: int = READ_CHUNK_BYTES) -> Iterator:
+    # Genera uno a uno los elementos de un arreglo JSON leyendo el archivo por bloques.
+    # Si el archivo no contiene un arreglo no genera nada (igual que antes: se ignoraba).
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buffer = ''
+        while not buffer:
+            chunk = f.read(read_chunk_bytes)
+            if not chunk:
+                return
+            buffer = chunk.lstrip(_WHITESPACE)
+        if not buffer.startswith('['):
+            return
+        pos = 1
+        eof = False
+
+        while True:
+            # Saltar espacios y separadores
+            while True:
+                while pos < len(buffer) and buffer[pos] in _WHITESPACE + ',':
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                buffer, pos = f.read(read_chunk_bytes), 0
+                eof = not buffer
+
+            if pos >= len(buffer):
+                raise ValueError(f"Arreglo JSON sin cerrar en {path}")
+            if buffer[pos] == ']':
+                return
+
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # Un valor que termina justo al final del bloque podria estar cortado
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+
+            if not complete:
+                more = f.read(read_chunk_bytes)
+                eof = not more
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+
+            yield value
+            pos = end
+
+
+def _file_tag(full_path: str) -> Tuple[str, str]:
+    filename = os.path.basename(full_path)
+    return filename, filename.replace("avisos_", "").replace(".json", "")
+
+
+def iter_category_chunks(full_path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    # DataFrames de a lo sumo chunk_rows ofertas de un avisos_<categoria>.json,
+    # ya etiquetados con su categoria
+    _, file_tag = _file_tag(full_path)
+    chunk = []
+    for offer in iter_json_array(full_path):
+        if not isinstance(offer, dict):
+            continue
+        chunk.append(offer)
+        if len(chunk) >= chunk_rows:
+            yield pd.DataFrame(chunk).assign(category=file_tag)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk).assign(category=file_tag)
+
+
+def _spill_category_file(full_path: str, chunk_rows: int, spill_dir: str) -> Tuple[str, List[str], Optional[str]]:
+    # En el proceso worker: escribe cada bloque en spill_dir y devuelve (archivo,
+    # rutas de los bloques, error). Al padre solo viajan las rutas.
+    filename, _ = _file_tag(full_path)
+    chunk_paths = []
+    try:
+        for i, df in enumerate(iter_category_chunks(full_path, chunk_rows)):
+            chunk_path = os.path.join(spill_dir, f"{filename}.{i:05d}.pkl")
+            df.to_pickle(chunk_path)
+            chunk_paths.append(chunk_path)
+        return filename, chunk_paths, None
+    except Exception as e:
+        for chunk_path in chunk_paths:
+            os.remove(chunk_path)
+        return filename, [], str(e)
+
+
+def iter_category_frames(paths: List[str], workers: Optional[int] = None,
+                         chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[Tuple[str, Optional[pd.DataFrame], Optional[str]]]:
+    # Entrega los bloques de cada archivo, en el orden de 'paths', como
+    # (archivo, DataFrame, None); cada archivo termina con (archivo, None, error),
+    # error None si se leyo completo (si no, sus bloques deben descartarse).
+    # Con varios procesos los workers escriben sus bloques en disco y el padre los
+    # lee de a uno: ni el archivo completo ni sus copias pasan por IPC.
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            filename, _ = _file_tag(path)
+            try:
+                for df in iter_category_chunks(path, chunk_rows):
+                    yield filename, df, None
+            except Exception as e:
+                yield filename, None, str(e)
+                continue
+            yield filename, None, None
+        return
+
+    with tempfile.TemporaryDirectory(prefix="json_ingest_") as spill_dir:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_spill_category_file, paths, [chunk_rows] * len(paths),
+                                   [spill_dir] * len(paths))
+            for filename, chunk_paths, error in results:
+                for chunk_path in chunk_paths:
+                    df = pd.read_pickle(chunk_path)
+                    os.remove(chunk_path)
+                    yield filename, df, None
+                yield filename, None, error
@@ -0,0 +1,297 @@
+import os
+import json
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from chunking import expand_ranges
+
+
+# Indice invertido BM25 sobre cleaned_text (busqueda lexica). Los embeddings densos
+# desdibujan terminos exactos como "sap", "niif" o "kubernetes"; este indice los
+# recupera y RecommendationEngine(hybrid=...) fusiona ambas listas.
+# Formato CSR: las filas que contienen el termino t son
+# docs[term_offsets[t]:term_offsets[t + 1]] (en orden) y tf sus frecuencias.
+# process_embeddings lo guarda dentro de cada store:
+#   bm25.json             -> filas, terminos, postings y digest del store indexado
+#   bm25_terms.txt        -> vocabulario ordenado (un termino por linea)
+#   bm25_term_offsets.i64 -> int64 (terminos + 1)
+#   bm25_docs.i32         -> fila local de cada posting
+#   bm25_tf.u16           -> frecuencia del termino en la fila
+#   bm25_doclen.i32       -> tokens de cada fila
+# El buscador combina los de todas sus fuentes (idf y largo medio sobre todo lo cargado).
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+META_FILE = 'bm25.json'
+TERMS_FILE = 'bm25_terms.txt'
+TERM_OFFSETS_FILE = 'bm25_term_offsets.i64'
+DOCS_FILE = 'bm25_docs.i32'
+TF_FILE = 'bm25_tf.u16'
+DOCLEN_FILE = 'bm25_doclen.i32'
+
+# Postings de los terminos de mayor cota que se puntuan primero para fijar el
+# umbral inicial de MaxScore (el k-esimo score parcial)
+PROBE_POSTINGS = 4096
+
+
+def tokenize(text: str) -> List[str]:
+    # cleaned_text ya viene en minusculas y sin signos: basta separar por espacios
+    return text.split() if isinstance(text, str) else []
+
+
+def lexical_texts(table) -> List[str]:
+    # Texto a indexar de cada fila de una tabla: cleaned_text (o description en
+    # los .pkl antiguos que no lo tengan)
+    column = table.columns.get('cleaned_text') or table.columns.get('description')
+    return column[:] if column is not None else [""] * len(table)
+
+
+def _accumulate(docs: np.ndarray, weights: np.ndarray, n_docs: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Suma los pesos por fila: devuelve (filas, scores) de las filas presentes
+    # (todo peso es > 0: idf y frecuencias siempre son positivos)
+    if len(docs) * 8 > n_docs:
+        dense = np.bincount(docs, weights=weights, minlength=n_docs)
+        rows = np.flatnonzero(dense)
+        return rows, dense[rows].astype('float32')
+    rows, inverse = np.unique(docs, return_inverse=True)
+    return rows.astype('int64'), np.bincount(inverse, weights=weights).astype('float32')
+
+
+def _kth_largest(scores: np.ndarray, k: int) -> float:
+    if len(scores) < k:
+        return 0.0
+    return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
+
+class LexicalIndex:
+    # Indice BM25 en memoria (o mmap) con busqueda top-k por MaxScore
+
+    def __init__(self, terms: List[str], term_offsets: np.ndarray, docs: np.ndarray, tf: np.ndarray,
+                 doclen: np.ndarray, k1: float = BM25_K1, b: float = BM25_B):
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.term_offsets = np.asarray(term_offsets, dtype='int64')
+        self.docs = docs
+        self.tf = tf
+        self.doclen = np.asarray(doclen, dtype='int32')
+        self.k1 = k1
+        self.b = b
+        self._prepare()
+
+    def _prepare(self):
+        # idf, peso BM25 de cada posting (sin idf) y cota superior de cada termino
+        n = len(self.doclen)
+        df = np.diff(self.term_offsets)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype('float32')
+        self.avgdl = float(self.doclen.mean()) if n else 0.0
+        norm = self.k1 * (1 - self.b + self.b * self.doclen / max(self.avgdl, 1e-9))
+        tf = self.tf.astype('float32')
+        self.weights = (tf * (self.k1 + 1) / (tf + norm[self.docs])).astype('float32')
+
+        max_weight = np.zeros(len(self.terms), dtype='float32')
+        present = df > 0
+        if present.any():
+            max_weight[present] = np.maximum.reduceat(self.weights, self.term_offsets[:-1][present])
+        self.upper_bounds = self.idf * max_weight
+
+    @classmethod
+    def from_texts(cls, texts: List[str], **kwargs) -> 'LexicalIndex':
+        # Construye el indice de una lista de textos (uno por fila)
+        tokens = [tokenize(t) for t in texts]
+        n = len(tokens)
+        doclen = np.array([len(t) for t in tokens], dtype='int32')
+        flat = [w for t in tokens for w in t]
+        if not flat:
+            return cls([], np.zeros(1, dtype='int64'), np.zeros(0, dtype='int32'),
+                       np.zeros(0, dtype='uint16'), doclen, **kwargs)
+
+        codes, uniques = pd.factorize(pd.Series(flat, dtype=object))
+        order = np.argsort(np.asarray(uniques, dtype=object))
+        rank = np.empty(len(order), dtype='int64')
+        rank[order] = np.arange(len(order))
+        terms = [uniques[i] for i in order]
+
+        # Un posting por (termino, fila) distinto; np.unique deja todo ordenado por termino y fila
+        keys = rank[codes] * n + np.repeat(np.arange(n, dtype='int64'), doclen)
+        keys, tf = np.unique(keys, return_counts=True)
+        term_of = keys // n
+        term_offsets = np.concatenate([[0], np.cumsum(np.bincount(term_of, minlength=len(terms)))])
+        return cls(terms, term_offsets, (keys % n).astype('int32'),
+                   np.minimum(tf, np.iinfo('uint16').max).astype('uint16'), doclen, **kwargs)
+
+    @classmethod
+    def merge(cls, parts: List['LexicalIndex']) -> 'LexicalIndex':
+        # Une indices de tablas consecutivas: las filas de cada parte van despues
+        # de las de la anterior (como los indices globales del buscador)
+        if len(parts) == 1:
+            return parts[0]
+        terms = sorted(set().union(*(part.terms for part in parts)))
+        vocab = {term: i for i, term in enumerate(terms)}
+        term_ids, docs, tf, doclen, base = [], [], [], [], 0
+        for part in parts:
+            mapping = np.array([vocab[t] for t in part.terms], dtype='int64')
+            term_ids.append(np.repeat(mapping, np.diff(part.term_offsets)))
+            docs.append(np.asarray(part.docs, dtype='int64') + base)
+            tf.append(part.tf)
+            doclen.append(part.doclen)
+            base += len(part.doclen)
+        term_ids = np.concatenate(term_ids)
+        # Orden estable: dentro de un termino las filas quedan en orden creciente
+        order = np.argsort(term_ids, kind='stable')
+        term_offsets = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(terms)))])
+        return cls(terms, term_offsets, np.concatenate(docs)[order].astype('int32'),
+                   np.concatenate(tf)[order], np.concatenate(doclen), parts[0].k1, parts[0].b)
+
+    def extend(self, texts: List[str]) -> 'LexicalIndex':
+        # Indice con filas nuevas al final (altas en ejecucion)
+        return LexicalIndex.merge([self, LexicalIndex.from_texts(texts, k1=self.k1, b=self.b)])
+
+    def subset(self, rows: np.ndarray) -> 'LexicalIndex':
+        # Indice con solo las filas dadas (ordenadas), renumeradas desde 0. El idf
+        # pasa a ser el de ese subconjunto (como cada shard de un motor distribuido)
+        rows = np.asarray(rows, dtype='int64')
+        new_row = np.full(len(self.doclen), -1, dtype='int64')
+        new_row[rows] = np.arange(len(rows))
+        mapped = new_row[self.docs]
+        keep = mapped >= 0
+        term_of = np.repeat(np.arange(len(self.terms)), np.diff(self.term_offsets))[keep]
+        term_offsets = np.concatenate([[0], np.cumsum(np.bincount(term_of, minlength=len(self.terms)))])
+        return LexicalIndex(self.terms, term_offsets, mapped[keep].astype('int32'), self.tf[keep],
+                            self.doclen[rows], self.k1, self.b)
+
+    def __len__(self) -> int:
+        return len(self.doclen)
+
+    def _query_terms(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        # Terminos de la consulta presentes en el indice y cuantas veces aparece cada uno
+        counts = {}
+        for word in tokenize(text):
+            term = self.vocab.get(word)
+            if term is not None:
+                counts[term] = counts.get(term, 0) + 1
+        terms = np.fromiter(counts.keys(), dtype='int64', count=len(counts))
+        qtf = np.fromiter(counts.values(), dtype='float32', count=len(counts))
+        present = self.term_offsets[terms + 1] > self.term_offsets[terms]
+        return terms[present], qtf[present]
+
+    def _postings(self, terms: np.ndarray, coef: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Filas y aportes (idf * qtf * peso) de todos los postings de esos terminos
+        ids, owner = expand_ranges(self.term_offsets, terms)
+        return self.docs[ids].astype('int64'), self.weights[ids] * coef[owner]
+
+    def search(self, text: str, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        # Top-k exacto por BM25: devuelve (scores, filas) de mayor a menor.
+        # allowed: mascara booleana de las filas que se pueden devolver.
+        # MaxScore: los terminos cuya suma de cotas no alcanza el umbral (el k-esimo
+        # score ya asegurado) no proponen candidatas; solo se buscan (searchsorted)
+        # en las candidatas de los demas. Las palabras frecuentes ("de", "en"),
+        # de listas largas e idf bajo, casi nunca se recorren enteras.
+        empty = (np.zeros(0, dtype='float32'), np.zeros(0, dtype='int64'))
+        terms, qtf = self._query_terms(text)
+        if not len(terms) or k <= 0:
+            return empty
+        n = len(self.doclen)
+        coef = self.idf[terms] * qtf
+        bounds = self.upper_bounds[terms] * qtf
+        lengths = self.term_offsets[terms + 1] - self.term_offsets[terms]
+
+        # 1. Umbral inicial: scores parciales con los terminos de mayor cota
+        order = np.argsort(-bounds, kind='stable')
+        n_probe = max(1, int(np.searchsorted(np.cumsum(lengths[order]), PROBE_POSTINGS, side='right')))
+        probe = order[:n_probe]
+        rows, partial = _accumulate(*self._postings(terms[probe], coef[probe]), n)
+        if allowed is not None:
+            partial = partial[allowed[rows]]
+        threshold = _kth_largest(partial, k)
+
+        # 2. Terminos no esenciales: los de menor cota cuya suma no llega al umbral
+        ascending = np.argsort(bounds, kind='stable')
+        n_optional = int(np.searchsorted(np.cumsum(bounds[ascending]), threshold, side='left'))
+        optional, essential = ascending[:n_optional], ascending[n_optional:]
+
+        # 3. Candidatas: filas de los terminos esenciales, con su score parcial
+        rows, scores = _accumulate(*self._postings(terms[essential], coef[essential]), n)
+        if allowed is not None:
+            keep = allowed[rows]
+            rows, scores = rows[keep], scores[keep]
+        threshold = max(threshold, _kth_largest(scores, k))
+
+        # 4. Los no esenciales (de mayor a menor cota) completan el score de las
+        # candidatas que todavia pueden superar el umbral
+        remaining = float(bounds[optional].sum())
+        for i in optional[::-1]:
+            keep = scores + remaining >= threshold
+            rows, scores = rows[keep], scores[keep]
+            start, end = self.term_offsets[terms[i]], self.term_offsets[terms[i] + 1]
+            postings = self.docs[start:end]
+            position = np.minimum(np.searchsorted(postings, rows), len(postings) - 1)
+            hit = postings[position] == rows
+            scores[hit] += coef[i] * self.weights[start + position[hit]]
+            remaining -= float(bounds[i])
+            threshold = max(threshold, _kth_largest(scores, k))
+
+        top = np.lexsort((rows, -scores))[:k]
+        return scores[top], rows[top]
+
+    def statistics(self) -> Dict:
+        return {
+            'documents': len(self.doclen),
+            'terms': int((np.diff(self.term_offsets) > 0).sum()),
+            'postings': int(len(self.docs)),
+            'avg_doc_length': round(self.avgdl, 2),
+            'k1': self.k1,
+            'b': self.b,
+        }
+
+    def save(self, store_path: str, digest: Optional[str] = None):
+        # Escribe el indice dentro del store; bm25.json va al final (cada archivo
+        # se reemplaza de forma atomica), asi que un lector nunca ve uno a medias
+        arrays = [(TERM_OFFSETS_FILE, self.term_offsets.astype('<i8')), (DOCS_FILE, self.docs.astype('<i4')),
+                  (TF_FILE, self.tf.astype('<u2')), (DOCLEN_FILE, self.doclen.astype('<i4'))]
+        for name, array in arrays:
+            array.tofile(os.path.join(store_path, name + '.tmp'))
+        with open(os.path.join(store_path, TERMS_FILE + '.tmp'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.terms))
+        for name in [TERMS_FILE] + [name for name, _ in arrays]:
+            os.replace(os.path.join(store_path, name + '.tmp'), os.path.join(store_path, name))
+
+        meta = {'count': len(self.doclen), 'terms': len(self.terms), 'postings': int(len(self.docs)),
+                'digest': digest}
+        tmp_meta = os.path.join(store_path, META_FILE + '.tmp')
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_meta, os.path.join(store_path, META_FILE))
+
+    @classmethod
+    def load(cls, store_path: str, digest: Optional[str] = None, **kwargs) -> Optional['LexicalIndex']:
+        # Abre el indice guardado en un store (postings con mmap). Devuelve None si
+        # no existe o no corresponde al contenido actual del store (digest)
+        try:
+            with open(os.path.join(store_path, META_FILE), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if digest is not None and meta.get('digest') != digest:
+            return None
+        with open(os.path.join(store_path, TERMS_FILE), 'r', encoding='utf-8') as f:
+            terms = f.read().split('\n') if meta['terms'] else []
+        if len(terms) != meta['terms']:
+            return None
+
+        def array(name, dtype, count):
+            if count == 0:
+                return np.zeros(0, dtype=dtype)
+            return np.memmap(os.path.join(store_path, name), dtype=dtype, mode='r', shape=(count,))
+
+        return cls(terms, array(TERM_OFFSETS_FILE, '<i8', meta['terms'] + 1) if meta['terms'] else np.zeros(1),
+                   array(DOCS_FILE, '<i4', meta['postings']), array(TF_FILE, '<u2', meta['postings']),
+                   array(DOCLEN_FILE, '<i4', meta['count']), **kwargs)
+
+
+def write_lexical_index(store_path: str) -> LexicalIndex:
+    # Construye y guarda el indice BM25 de un store a partir de su cleaned_text
+    from vector_store import VectorStore
+    store = VectorStore(store_path)
+    index = LexicalIndex.from_texts(lexical_texts(store))
+    index.save(store_path, store.header.get('digest'))
+    return index
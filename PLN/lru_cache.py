@@ -0,0 +1,90 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import numpy as np
+
+
+def estimate_size(value: Any) -> int:
+    # Estimacion aproximada (en bytes) de la memoria usada por un valor cacheado
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    # Cache LRU limitada por memoria (max_bytes), segura entre hilos,
+    # con contadores de aciertos/fallos para medir su efecto
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        # Devuelve el valor (y lo marca como reciente) o None si no esta
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any):
+        # Inserta o reemplaza un valor y expulsa los menos recientes si no cabe
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._data:
+                self.current_bytes -= self._data.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._data[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, old_size) = self._data.popitem(last=False)
+                self.current_bytes -= old_size
+                self.evictions += 1
+
+    def map_values(self, fn):
+        # Reemplaza cada valor por fn(valor) sin cambiar el orden LRU (None lo quita)
+        with self._lock:
+            for key in list(self._data):
+                value, size = self._data[key]
+                self.current_bytes -= size
+                value = fn(value)
+                if value is None:
+                    del self._data[key]
+                    continue
+                size = estimate_size(value)
+                self._data[key] = (value, size)
+                self.current_bytes += size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,147 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from vector_store import StoreMetadata, source_category
+
+
+# Filtros de busqueda sobre la metadata, resueltos antes de consultar el indice:
+#   {'category': 'programador' | [...], 'source': ..., '_source_file': ...,
+#    'scraped_at': ('2025-11-01', '2025-12-31')}   (cualquiera de los extremos puede ser None)
+# Cada valor de un campo categorico tiene un bitset precalculado (1 bit por oferta,
+# en el orden de los indices globales); un filtro se resuelve con OR/AND de bitsets
+# y el resultado se entrega tal cual a faiss.IDSelectorBitmap.
+CATEGORICAL_FIELDS = ('category', 'source', '_source_file')
+DATE_FIELD = 'scraped_at'
+FILTER_FIELDS = CATEGORICAL_FIELDS + (DATE_FIELD,)
+
+MAX_CACHED_SELECTIONS = 64
+
+
+def filter_key(filters: Optional[Dict]) -> Optional[Tuple]:
+    # Representacion hashable de unos filtros (para caches y agrupar peticiones)
+    if not filters:
+        return None
+    key = []
+    for field in sorted(filters):
+        value = filters[field]
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Filtro desconocido: {field}. Opciones: {', '.join(FILTER_FIELDS)}")
+        if field == DATE_FIELD:
+            if isinstance(value, str) or len(value) != 2:
+                raise ValueError(f"'{DATE_FIELD}' debe ser un par (desde, hasta)")
+            start, end = value
+            _date_bound(start, end=False), _date_bound(end, end=True)  # valida el formato
+            key.append((field, start or None, end or None))
+        else:
+            values = [value] if isinstance(value, str) else list(value)
+            key.append((field, tuple(sorted(set(values)))))
+    return tuple(key)
+
+
+def _parse_dates(values: List[str]) -> np.ndarray:
+    # Fechas ISO -> datetime64[s]; vacias o invalidas -> NaT (nunca pasan un filtro de fechas)
+    parsed = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[s]')
+    for i, value in enumerate(values):
+        if value:
+            try:
+                parsed[i] = np.datetime64(value, 's')
+            except ValueError:
+                pass
+    return parsed
+
+
+def _date_bound(value: Optional[str], end: bool) -> Optional[np.datetime64]:
+    # '2025-12-01' como limite superior incluye todo ese dia
+    if not value:
+        return None
+    bound = np.datetime64(value, 's')
+    if end and len(value) <= 10:
+        bound = bound + np.timedelta64(1, 'D') - np.timedelta64(1, 's')
+    return bound
+
+
+class MetadataFilter:
+    # Bitsets por valor de cada campo categorico y fechas por oferta
+
+    def __init__(self, metadata: StoreMetadata):
+        self.size = len(metadata)
+        self._bitsets: Dict[str, Dict[str, np.ndarray]] = {}
+        self._dates: Optional[np.ndarray] = None
+        self._metadata = metadata
+        self._selections: "OrderedDict[Tuple, Tuple[np.ndarray, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        for field in CATEGORICAL_FIELDS:
+            self._bitsets[field] = self._build_bitsets(self._field_values(field))
+
+    def _field_values(self, field: str) -> List[str]:
+        # Valores del campo en orden global; la categoria sale del nombre de la
+        # fuente cuando la tabla no tiene esa columna (vectors_<categoria>)
+        values = []
+        for store in self._metadata.stores:
+            if field == '_source_file':
+                values.extend([store.name] * len(store))
+            elif field in store.columns:
+                values.extend(store.columns[field][:])
+            elif field == 'category':
+                values.extend([source_category(store.name)] * len(store))
+            else:
+                values.extend([""] * len(store))
+        return values
+
+    def _build_bitsets(self, values: List[str]) -> Dict[str, np.ndarray]:
+        uniques, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+        return {str(value): np.packbits(codes == code, bitorder='little')
+                for code, value in enumerate(uniques)}
+
+    def values(self, field: str) -> List[str]:
+        # Valores disponibles de un campo categorico (para armar la interfaz)
+        return sorted(v for v in self._bitsets[field] if v)
+
+    def counts(self, field: str) -> Dict[str, int]:
+        return {v: int(np.unpackbits(b, count=self.size, bitorder='little').sum())
+                for v, b in self._bitsets[field].items() if v}
+
+    def _date_mask(self, start: Optional[str], end: Optional[str]) -> np.ndarray:
+        if self._dates is None:
+            self._dates = _parse_dates(self._field_values(DATE_FIELD))
+        mask = ~np.isnat(self._dates)
+        start, end = _date_bound(start, end=False), _date_bound(end, end=True)
+        if start is not None:
+            mask &= self._dates >= start
+        if end is not None:
+            mask &= self._dates <= end
+        return np.packbits(mask, bitorder='little')
+
+    def select(self, filters: Dict) -> Tuple[np.ndarray, int]:
+        # Devuelve (bitmap empaquetado little-endian, numero de ofertas seleccionadas)
+        key = filter_key(filters)
+        with self._lock:
+            if key in self._selections:
+                self._selections.move_to_end(key)
+                return self._selections[key]
+
+        bitmap = np.full((self.size + 7) // 8, 0xFF, dtype=np.uint8)
+        for item in key:
+            field = item[0]
+            if field == DATE_FIELD:
+                bitmap &= self._date_mask(item[1], item[2])
+            else:
+                allowed = np.zeros_like(bitmap)
+                for value in item[1]:
+                    bits = self._bitsets[field].get(value)
+                    if bits is not None:
+                        allowed |= bits
+                bitmap &= allowed
+
+        # Bits de relleno del ultimo byte en cero
+        if self.size % 8:
+            bitmap[-1] &= (1 << (self.size % 8)) - 1
+        selected = int(np.unpackbits(bitmap, bitorder='little').sum())
+
+        with self._lock:
+            self._selections[key] = (bitmap, selected)
+            if len(self._selections) > MAX_CACHED_SELECTIONS:
+                self._selections.popitem(last=False)
+        return bitmap, selected
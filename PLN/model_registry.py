@@ -0,0 +1,43 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+from config import MODEL_NAME, ENCODER_BACKEND
+from encoders import load_encoder
+
+
+# Registro de modelos del proceso: cada (modelo, backend, dispositivo) se carga
+# una sola vez y la misma instancia se comparte entre ProfileProcessor,
+# JobOfferProcessor y cualquier hilo que la pida.
+_models: Dict[Tuple, object] = {}
+_loading_locks: Dict[Tuple, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def get_model(model_name: str = MODEL_NAME, backend: Optional[str] = None, device: Optional[str] = None):
+    # Devuelve el encoder compartido, cargandolo la primera vez
+    key = (model_name, backend or ENCODER_BACKEND, device)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    # Un lock por modelo: dos hilos que piden el mismo modelo lo cargan una vez,
+    # y modelos distintos pueden cargarse en paralelo
+    with _registry_lock:
+        lock = _loading_locks.setdefault(key, threading.Lock())
+    with lock:
+        model = _models.get(key)
+        if model is None:
+            model = load_encoder(key[0], key[1], device=key[2])
+            _models[key] = model
+    return model
+
+
+def loaded_models() -> List[Tuple]:
+    # Claves (modelo, backend, dispositivo) de los modelos ya cargados
+    return list(_models)
+
+
+def release(model_name: Optional[str] = None):
+    # Libera los modelos de un nombre (o todos) para que se recarguen al pedirlos
+    with _registry_lock:
+        for key in [k for k in _models if model_name is None or k[0] == model_name]:
+            del _models[key]
@@ -1,22 +1,40 @@
 import os
 import re
+import time
 import json
 import pickle
 import argparse
 import warnings
+from contextlib import nullcontext
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
+from vector_store import write_vector_store, append_to_vector_store, store_path_for, fits_column, VectorStore
+from embedding_cache import EmbeddingCache, content_key
+from json_ingest import iter_category_frames, DEFAULT_CHUNK_ROWS
+from encoder_pool import EncoderPool
+from encoders import encoder_id, BACKENDS
+from config import MODEL_NAME, ENCODER_BACKEND
+from model_registry import get_model
+from dedup import find_near_duplicates, print_report, JACCARD_THRESHOLD
+from chunking import split_texts, select_rows, window_size, CHUNK_OVERLAP
+from lexical_index import write_lexical_index
 
 os.environ['HF_HUB_DISABLE_SYMLINKS_WARNING'] = '1'
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 warnings.filterwarnings("ignore")
 
+DEFAULT_ENCODE_CHUNK = 2048
+CALIBRATION_TEXTS = 256
+
 class JobOfferProcessor:
-    def __init__(self, model_name: str = 'paraphrase-multilingual-MiniLM-L12-v2'):
+    def __init__(self, model_name: str = MODEL_NAME, backend: str = None):
         print(f"Inicializando procesador...")
-        self.model = SentenceTransformer(model_name)
+        self.backend = backend or ENCODER_BACKEND
+        self.model_name = model_name
+        # Modelo + backend: separa la cache y el store de embeddings de cada backend
+        self.encoder_id = encoder_id(model_name, self.backend)
+        self.model = get_model(model_name, self.backend)
         print("OK - Modelo IA cargado.")
 
     def clean_text(self, text: str) -> str:
@@ -27,37 +45,39 @@ class JobOfferProcessor:
         text = re.sub(r'[^a-zA-Z0-9áéíóúñÁÉÍÓÚÑ\s]', ' ', text)
         return re.sub(r'\s+', ' ', text).strip()
 
-    def load_and_tag_from_folder(self, folder_path: str) -> pd.DataFrame:
+    def load_and_tag_from_folder(self, folder_path: str, workers: int = None,
+                                 chunk_rows: int = DEFAULT_CHUNK_ROWS) -> pd.DataFrame:
         """
-        1. Lee los archivos JSON.
+        1. Lee los archivos JSON (en paralelo y de forma incremental).
         2. Extrae la categoría del nombre del archivo.
         3. Etiqueta cada oferta con esa categoría.
         """
         if not os.path.exists(folder_path):
             raise FileNotFoundError(f"No existe: {folder_path}")
             
-        all_records = []
-        files = [f for f in os.listdir(folder_path) if f.endswith('.json')]
+        files = sorted(f for f in os.listdir(folder_path) if f.endswith('.json'))
         
         print(f"Procesando {len(files)} archivos para extracción de categorías...")
 
-        for filename in tqdm(files):
-            file_tag = filename.replace("avisos_", "").replace(".json", "")
-            
-            full_path = os.path.join(folder_path, filename)
-            try:
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                    if isinstance(data, list):
-                        for offer in data:
-                            offer['category'] = file_tag
-                        
-                        all_records.extend(data)
-            except Exception as e:
-                print(f"X - Error en {filename}: {e}")
-
-        return pd.DataFrame(all_records)
+        # Los bloques de cada archivo se acumulan hasta que termina de leerse (un
+        # archivo con error se descarta entero) y se concatenan una sola vez
+        frames, pending = [], {}
+        paths = [os.path.join(folder_path, f) for f in files]
+        with tqdm(total=len(paths)) as progress:
+            for filename, df, error in iter_category_frames(paths, workers, chunk_rows):
+                if df is not None:
+                    pending.setdefault(filename, []).append(df)
+                    continue
+                chunks = pending.pop(filename, [])
+                if error:
+                    print(f"X - Error en {filename}: {error}")
+                else:
+                    frames.extend(chunks)
+                progress.update(1)
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
 
     def filter_and_deduplicate(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -81,14 +101,186 @@ class JobOfferProcessor:
         
         return df
 
-    def run_pipeline(self, input_folder: str, output_path: str):
+    def remove_near_duplicates(self, df: pd.DataFrame, embeddings: np.ndarray = None,
+                               threshold: float = JACCARD_THRESHOLD, min_cosine: float = None,
+                               report_path: str = None):
+        """
+        Elimina ofertas casi duplicadas (republicadas con otra fecha, otros espacios
+        o una frase distinta) con MinHash/LSH sobre cleaned_text. De cada grupo se
+        conserva la primera. Devuelve (df, keep) con keep como mascara booleana
+        para recortar lo que vaya alineado al df (embeddings, claves...).
+        """
+        keep, stats = find_near_duplicates(df['cleaned_text'].tolist(), embeddings,
+                                           threshold=threshold, min_cosine=min_cosine)
+        print()
+        print_report(stats)
+        if report_path:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(stats, f, indent=2, ensure_ascii=False)
+        return df[keep].reset_index(drop=True), keep
+
+    def token_lengths(self, texts: list) -> np.ndarray:
+        """
+        Longitud en tokens de cada texto (truncada al maximo del modelo).
+        Si el modelo no expone tokenizer se aproxima con el numero de palabras.
+        """
+        max_len = getattr(self.model, 'max_seq_length', None) or 512
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        if tokenizer is None:
+            return np.array([min(len(t.split()), max_len) for t in texts], dtype=np.int64)
+
+        lengths = []
+        for start in range(0, len(texts), 10000):
+            encoded = tokenizer(texts[start:start + 10000], add_special_tokens=True,
+                                truncation=True, max_length=max_len)
+            lengths.extend(len(ids) for ids in encoded['input_ids'])
+        return np.array(lengths, dtype=np.int64)
+
+    def encode_with_cache(self, texts: list, keys: list, cache: EmbeddingCache,
+                          chunk_size: int = DEFAULT_ENCODE_CHUNK, batch_size: int = 32,
+                          pool: EncoderPool = None) -> np.ndarray:
+        """
+        Codifica solo los textos cuya clave no esta en la cache y reutiliza el resto.
+        Los pendientes se ordenan por longitud en tokens (menos relleno por lote) y se
+        codifican por bloques; cada bloque terminado se guarda en la cache, asi que una
+        corrida interrumpida continua desde el ultimo bloque completo.
+        Con pool, los bloques se reparten entre procesos y se informa el speed-up
+        frente a una muestra codificada en este proceso.
+        """
+        found, cached = cache.lookup(keys)
+        missing = np.flatnonzero(~found)
+        print(f"Embeddings reutilizados de la cache: {int(found.sum())} | a codificar: {len(missing)}")
+
+        dim = cache.dim or self.model.get_sentence_embedding_dimension()
+        embeddings = np.zeros((len(texts), dim), dtype='float32')
+        if cached is not None:
+            embeddings[found] = cached
+
+        if not len(missing):
+            return embeddings
+
+        # Mas largos primero: si falta memoria, falla en el primer bloque y no al final
+        lengths = self.token_lengths([texts[i] for i in missing])
+        by_length = np.argsort(-lengths, kind='stable')
+        order = missing[by_length]
+        lengths = lengths[by_length]
+
+        single_tps = None
+        if pool is not None and len(order) > CALIBRATION_TEXTS:
+            # Muestra repartida entre todas las longitudes, codificada en este proceso
+            # para comparar el throughput del pool con el de un solo proceso
+            sample = np.unique(np.linspace(0, len(order) - 1, CALIBRATION_TEXTS).astype(np.int64))
+            rows = order[sample]
+            calibration_start = time.time()
+            sample_embeddings = self.model.encode([texts[i] for i in rows], batch_size=batch_size,
+                                                  show_progress_bar=False)
+            single_tps = len(rows) / max(time.time() - calibration_start, 1e-9)
+            cache.add([keys[i] for i in rows], sample_embeddings)
+            embeddings[rows] = sample_embeddings
+            keep = np.ones(len(order), dtype=bool)
+            keep[sample] = False
+            order, lengths = order[keep], lengths[keep]
+            print(f"  Referencia en un proceso: {single_tps:.1f} textos/s ({len(rows)} textos)")
+
+        if pool is not None:
+            # La carga del modelo en cada worker no cuenta en el throughput del pool
+            pool.warmup()
+
+        n_chunks = (len(order) + chunk_size - 1) // chunk_size
+
+        total_start = time.time()
+        for c, start in enumerate(range(0, len(order), chunk_size), 1):
+            rows = order[start:start + chunk_size]
+            chunk_start = time.time()
+            chunk_texts = [texts[i] for i in rows]
+            if pool is not None:
+                chunk_embeddings = pool.encode(chunk_texts, batch_size=batch_size)
+            else:
+                chunk_embeddings = self.model.encode(chunk_texts, batch_size=batch_size,
+                                                     show_progress_bar=False)
+            # Checkpoint: el bloque queda en disco antes de seguir con el siguiente
+            cache.add([keys[i] for i in rows], chunk_embeddings)
+            embeddings[rows] = chunk_embeddings
+
+            elapsed = max(time.time() - chunk_start, 1e-9)
+            print(f"  Bloque {c}/{n_chunks}: {len(rows)} textos en {elapsed:.1f}s "
+                  f"({len(rows) / elapsed:.1f} textos/s, ~{int(lengths[start:start + chunk_size].mean())} tokens)")
+
+        total_elapsed = max(time.time() - total_start, 1e-9)
+        total_tps = len(order) / total_elapsed
+        print(f"OK - {len(order)} textos codificados en {total_elapsed:.1f}s ({total_tps:.1f} textos/s)")
+        if single_tps:
+            print(f"   Speed-up del pool ({pool.workers} workers x {pool.threads_per_worker} hilos): "
+                  f"{total_tps / single_tps:.2f}x")
+        return embeddings
+
+    def encode_chunk_windows(self, texts: list, cache: EmbeddingCache, overlap: int = CHUNK_OVERLAP,
+                             chunk_size: int = DEFAULT_ENCODE_CHUNK, pool: EncoderPool = None):
+        """
+        Ventanas extra (de la segunda en adelante) de los textos que no caben en el
+        encoder, codificadas todas juntas y con la misma cache que las ofertas.
+        La primera ventana no se repite: es la que ya representa el embedding de
+        la oferta. Devuelve (embeddings, offsets) en el formato del store.
+        """
+        chunks, offsets = split_texts(texts, self.model, overlap, skip_first=True)
+        long_texts = int((np.diff(offsets) > 0).sum())
+        print(f"\nChunks: {long_texts} ofertas superan la ventana de {window_size(self.model)} tokens "
+              f"-> {len(chunks)} ventanas extra")
+        if not chunks:
+            dim = cache.dim or self.model.get_sentence_embedding_dimension()
+            return np.zeros((0, dim), dtype='float32'), offsets
+        keys = [content_key(c, self.model_name) for c in chunks]
+        return self.encode_with_cache(chunks, keys, cache, chunk_size=chunk_size, pool=pool), offsets
+
+    def _existing_hashes(self, store_path: str, df: pd.DataFrame, chunk_params: dict = None):
+        """
+        Hashes de contenido del store existente, o None si no se puede agregar a el
+        (otras columnas, otro modelo, otros chunks o valores que no caben en el tipo
+        guardado de alguna columna).
+        """
+        if not os.path.exists(store_path):
+            return None
+        try:
+            store = VectorStore(store_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        if store.header['columns'] != list(df.columns) or store.model_name != self.encoder_id:
+            return None
+        column_dtypes = store.header.get('column_dtypes', {})
+        if not all(fits_column(column_dtypes.get(col, 'str'), df[col].tolist()) for col in df.columns):
+            return None
+        # Con o sin chunks (y con que ventana) debe coincidir con lo que se va a agregar
+        stored_chunks = store.header.get('chunks')
+        if stored_chunks is not None:
+            stored_chunks = {key: value for key, value in stored_chunks.items() if key != 'count'}
+        if stored_chunks != chunk_params:
+            return None
+        return list(store.columns['_content_hash'])
+
+    def run_pipeline(self, input_folder: str, output_path: str, write_pickle: bool = False,
+                     cache_dir: str = None, incremental: bool = True, ingest_workers: int = None,
+                     encode_chunk_size: int = DEFAULT_ENCODE_CHUNK, encode_workers: int = 0,
+                     threads_per_worker: int = 2, near_dedup: bool = False,
+                     near_dup_threshold: float = JACCARD_THRESHOLD, confirm_cosine: float = None,
+                     chunked: bool = False, chunk_overlap: int = CHUNK_OVERLAP, lexical: bool = True):
+        """
+        Genera el store (embeddings float32 + metadata columnar) en output_path.
+        Solo codifica ofertas nuevas o modificadas (cache por hash de contenido) y,
+        si el store ya existe y solo hay ofertas nuevas, las agrega al final.
+        Con write_pickle=True tambien escribe el .pkl antiguo.
+        Con near_dedup se eliminan ademas los casi duplicados antes de codificar;
+        con confirm_cosine se eliminan despues, exigiendo esa similitud coseno.
+        Con chunked se guardan ademas las ventanas extra de las ofertas largas
+        (solapadas en chunk_overlap tokens) para buscar sobre el texto completo.
+        Con lexical se guarda tambien el indice invertido BM25 de cleaned_text.
+        """
         folder_abs = os.path.abspath(input_folder)
         output_abs = os.path.abspath(output_path)
         
         print(f"\n--- INICIO DEL PROCESO ---")
         
         # 1. Carga y Etiquetado
-        df = self.load_and_tag_from_folder(folder_abs)
+        df = self.load_and_tag_from_folder(folder_abs, workers=ingest_workers)
         if df.empty:
             print("No hay datos.")
             return
@@ -105,31 +297,113 @@ class JobOfferProcessor:
         print("\nGenerando texto limpio para la IA...")
         combined = df['title'].fillna('') + " " + df['category'].fillna('') + ". " + df['description'].fillna('')
         df['cleaned_text'] = combined.apply(self.clean_text)
-        df = df[df['cleaned_text'] != ""]
+        df = df[df['cleaned_text'] != ""].reset_index(drop=True)
+
+        store_abs = store_path_for(output_abs)
+        os.makedirs(os.path.dirname(store_abs), exist_ok=True)
+        report_path = os.path.splitext(store_abs)[0] + "_near_duplicates.json"
+
+        # 3b. Casi duplicados (sin confirmacion por coseno no hace falta codificarlos)
+        if near_dedup and confirm_cosine is None:
+            df, _ = self.remove_near_duplicates(df, threshold=near_dup_threshold, report_path=report_path)
+
+        # 4. Vectorización (solo ofertas nuevas o modificadas)
+        cache = EmbeddingCache(cache_dir or os.path.join(os.path.dirname(store_abs), "embedding_cache"),
+                               self.encoder_id)
+
+        texts = df['cleaned_text'].tolist()
+        keys = [content_key(t, self.model_name) for t in texts]
+        df['_content_hash'] = keys
 
-        # 4. Vectorización
         print(f"Creando Embeddings para {len(df)} ofertas...")
-        embeddings = self.model.encode(df['cleaned_text'].tolist(), show_progress_bar=True)
+        chunks = None
+        pool_context = (EncoderPool(self.model_name, workers=encode_workers, threads_per_worker=threads_per_worker,
+                                    backend=self.backend) if encode_workers > 1 else nullcontext())
+        with pool_context as pool:
+            embeddings = self.encode_with_cache(texts, keys, cache, chunk_size=encode_chunk_size, pool=pool)
+
+            if near_dedup and confirm_cosine is not None:
+                df, keep = self.remove_near_duplicates(df, embeddings, threshold=near_dup_threshold,
+                                                       min_cosine=confirm_cosine, report_path=report_path)
+                embeddings = embeddings[keep]
+                keys = df['_content_hash'].tolist()
+
+            # 4b. Ventanas extra de las ofertas largas (el encoder trunca en max_seq_length)
+            if chunked:
+                chunks = self.encode_chunk_windows(df['cleaned_text'].tolist(), cache, chunk_overlap,
+                                                   chunk_size=encode_chunk_size, pool=pool)
+        chunk_params = {'window': window_size(self.model), 'overlap': chunk_overlap} if chunked else None
         
-        # 5. Guardado
-        payload = {
-            "metadata": df.to_dict(orient='records'),
-            "embeddings": embeddings
-        }
+        # 5. Guardado (store con mmap: matriz float32 cruda + metadata columnar)
+        existing = self._existing_hashes(store_abs, df, chunk_params) if incremental else None
+        if existing is not None and set(existing) <= set(keys):
+            # Todas las ofertas guardadas siguen vigentes: solo se agregan las nuevas
+            existing = set(existing)
+            new_rows = [i for i, key in enumerate(keys) if key not in existing]
+            df_new = df.iloc[new_rows]
+            columns = {col: df_new[col].tolist() for col in df_new.columns}
+            new_chunks = None
+            if chunks is not None:
+                ids, new_offsets = select_rows(chunks[1], np.array(new_rows, dtype='int64'))
+                new_chunks = (chunks[0][ids], new_offsets)
+            header = append_to_vector_store(store_abs, columns, embeddings[new_rows], chunks=new_chunks)
+            print(f"\nOK - {len(new_rows)} ofertas agregadas a {store_abs} ({header['count']} en total)")
+        else:
+            columns = {col: df[col].tolist() for col in df.columns}
+            write_vector_store(store_abs, columns, embeddings, model_name=self.encoder_id,
+                               chunks=chunks, chunk_params=chunk_params)
+            print(f"\nOK - GUARDADO EXITOSO: {store_abs}")
         
-        os.makedirs(os.path.dirname(output_abs), exist_ok=True)
-        with open(output_abs, "wb") as f:
-            pickle.dump(payload, f)
+        # 6. Indice BM25 de cleaned_text (se rehace sobre el store completo; cuesta poco frente al encoding)
+        if lexical:
+            start = time.time()
+            stats = write_lexical_index(store_abs).statistics()
+            print(f"OK - Índice BM25: {stats['terms']} términos, {stats['postings']} postings "
+                  f"({time.time() - start:.1f}s)")
         
-        print(f"\nOK - GUARDADO EXITOSO: {output_abs}")
+        if write_pickle:
+            pkl_abs = os.path.splitext(store_abs)[0] + ".pkl"
+            payload = {
+                "metadata": df.to_dict(orient='records'),
+                "embeddings": embeddings
+            }
+            with open(pkl_abs, "wb") as f:
+                pickle.dump(payload, f)
+            print(f"OK - GUARDADO EXITOSO: {pkl_abs}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("input_folder", type=str, help="Carpeta con los JSON")
     parser.add_argument("--output", type=str, default=None)
+    parser.add_argument("--pkl", action="store_true", help="Escribir tambien el .pkl antiguo")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Cache de embeddings (por defecto junto al store)")
+    parser.add_argument("--full", action="store_true", help="Reescribir el store completo en lugar de agregar")
+    parser.add_argument("--ingest-workers", type=int, default=None, help="Procesos para leer los JSON")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_ENCODE_CHUNK,
+                        help="Textos por bloque de codificación (cada bloque se guarda al terminar)")
+    parser.add_argument("--encode-workers", type=int, default=0, help="Procesos de encoding (0/1 = un proceso)")
+    parser.add_argument("--threads-per-worker", type=int, default=2, help="Hilos de torch por proceso")
+    parser.add_argument("--backend", type=str, default=ENCODER_BACKEND, choices=BACKENDS,
+                        help="Backend del encoder (torch, onnx, onnx_int8)")
+    parser.add_argument("--near-dedup", action="store_true",
+                        help="Eliminar también las ofertas casi duplicadas (MinHash + LSH)")
+    parser.add_argument("--near-dup-threshold", type=float, default=JACCARD_THRESHOLD,
+                        help="Jaccard mínima (sobre shingles de cleaned_text) para considerar duplicadas dos ofertas")
+    parser.add_argument("--confirm-cosine", type=float, default=None,
+                        help="Con --near-dedup, confirmar cada par con la similitud coseno de sus embeddings (p. ej. 0.95)")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Guardar también las ventanas de las ofertas más largas que el encoder")
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP, help="Tokens compartidos entre ventanas")
+    parser.add_argument("--no-bm25", action="store_true", help="No generar el índice BM25 (búsqueda híbrida)")
     
     args = parser.parse_args()
     
-    final_out = args.output if args.output else os.path.join(args.input_folder, "processed", "vectors_dataset_final.pkl")
+    final_out = args.output if args.output else os.path.join(args.input_folder, "processed", "vectors_dataset_final.store")
     
-    JobOfferProcessor().run_pipeline(args.input_folder, final_out)
\ No newline at end of file
+    JobOfferProcessor(backend=args.backend).run_pipeline(
+        args.input_folder, final_out, write_pickle=args.pkl, cache_dir=args.cache_dir,
+        incremental=not args.full, ingest_workers=args.ingest_workers, encode_chunk_size=args.chunk_size,
+        encode_workers=args.encode_workers, threads_per_worker=args.threads_per_worker,
+        near_dedup=args.near_dedup, near_dup_threshold=args.near_dup_threshold,
+        confirm_cosine=args.confirm_cosine, chunked=args.chunked, chunk_overlap=args.chunk_overlap,
+        lexical=not args.no_bm25)
\ No newline at end of file
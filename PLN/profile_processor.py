@@ -1,16 +1,23 @@
 import re
-from typing import Union, List
+from typing import Union, List, Tuple
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from config import MODEL_NAME, ENCODER_BACKEND
+from model_registry import get_model
+from encoders import encoder_id
+from chunking import split_texts, CHUNK_OVERLAP
 
 
 class ProfileProcessor:
     # Procesador de perfiles de usuario que genera embeddings
     
-    def __init__(self, model_name: str = 'paraphrase-multilingual-MiniLM-L12-v2'):
+    def __init__(self, model_name: str = MODEL_NAME, backend: str = None):
         # Inicializa el procesador con el modelo de embeddings
-        print(f"Cargando modelo: {model_name}...")
-        self.model = SentenceTransformer(model_name)
+        # backend: 'torch', 'onnx' u 'onnx_int8' (por defecto el de config.py)
+        self.backend = backend or ENCODER_BACKEND
+        print(f"Cargando modelo: {model_name} ({self.backend})...")
+        self.model_name = model_name
+        self.encoder_id = encoder_id(model_name, self.backend)
+        self.model = get_model(model_name, self.backend)
         print("OK - Modelo cargado exitosamente")
     
     def clean_text(self, text: str) -> str:
@@ -32,8 +39,9 @@ class ProfileProcessor:
         
         return normalized
     
-    def process_profile(self, profile_text: str) -> np.ndarray:
+    def process_profile(self, profile_text: str, chunked: bool = False) -> np.ndarray:
         # Procesa un perfil de usuario y genera su embedding
+        # chunked: devuelve una fila por ventana (m x d) en lugar de truncar los CV largos
         if not profile_text or not isinstance(profile_text, str):
             raise ValueError("El texto del perfil no puede estar vacío")
         
@@ -44,27 +52,55 @@ class ProfileProcessor:
             raise ValueError("El texto del perfil no contiene contenido válido después de limpieza")
         
         # Generar embedding
-        embedding = self.model.encode(cleaned, show_progress_bar=False)
-        
-        return embedding
+        if chunked:
+            return self.encode_chunks(cleaned)
+        return self.encode_cleaned(cleaned)
+    
+    def encode_cleaned(self, cleaned: str) -> np.ndarray:
+        # Genera el embedding de un texto ya limpio (sin volver a limpiarlo)
+        return self.model.encode(cleaned, show_progress_bar=False)
+    
+    def encode_chunks(self, cleaned: str, overlap: int = CHUNK_OVERLAP) -> np.ndarray:
+        # Embeddings (m x d) de las ventanas solapadas de un texto ya limpio; un
+        # texto que cabe en el encoder da una sola fila, igual a encode_cleaned
+        embeddings, _ = self.encode_chunks_batch([cleaned], overlap=overlap)
+        return embeddings
     
-    def process_profiles_batch(self, profiles: List[str]) -> np.ndarray:
+    def encode_chunks_batch(self, cleaned_profiles: List[str], batch_size: int = 64,
+                            overlap: int = CHUNK_OVERLAP) -> Tuple[np.ndarray, np.ndarray]:
+        # Ventanas de varios textos ya limpios codificadas en un solo lote; devuelve
+        # (embeddings, offsets): las filas del texto i son offsets[i]:offsets[i + 1]
+        chunks, offsets = split_texts(cleaned_profiles, self.model, overlap)
+        embeddings = self.model.encode(chunks, batch_size=batch_size, show_progress_bar=False)
+        return np.asarray(embeddings, dtype='float32').reshape(len(chunks), -1), offsets
+    
+    def process_profiles_batch(self, profiles: List[str], batch_size: int = 64,
+                               show_progress_bar: bool = False, pool=None) -> np.ndarray:
         # Procesa multiples perfiles en lote (mas eficiente)
+        # Devuelve una fila por perfil, en el mismo orden de la entrada
+        # pool: EncoderPool opcional para repartir lotes grandes entre procesos
         if not profiles:
             raise ValueError("La lista de perfiles no puede estar vacía")
         
         # Limpiar todos los textos
         cleaned_profiles = [self.clean_text(p) for p in profiles]
         
-        # Validar que haya contenido válido
-        valid_profiles = [p for p in cleaned_profiles if p]
-        if not valid_profiles:
-            raise ValueError("Ningún perfil contiene contenido válido después de limpieza")
-        
-        # Generar embeddings en lote
-        embeddings = self.model.encode(valid_profiles, show_progress_bar=True)
+        # Validar que todos tengan contenido (si no, las filas no corresponderian a los perfiles)
+        empty = [i for i, p in enumerate(cleaned_profiles) if not p]
+        if empty:
+            raise ValueError(f"Los perfiles {empty} no contienen contenido válido después de limpieza")
         
-        return embeddings
+        return self.encode_cleaned_batch(cleaned_profiles, batch_size=batch_size,
+                                         show_progress_bar=show_progress_bar, pool=pool)
+    
+    def encode_cleaned_batch(self, cleaned_profiles: List[str], batch_size: int = 64,
+                             show_progress_bar: bool = False, pool=None) -> np.ndarray:
+        # Genera embeddings en lote de textos ya limpios
+        # (el modelo agrupa por longitud y rellena cada lote)
+        if pool is not None:
+            return pool.encode(cleaned_profiles, batch_size=batch_size)
+        return self.model.encode(cleaned_profiles, batch_size=batch_size,
+                                 show_progress_bar=show_progress_bar)
 
 
 # Ejemplo de uso
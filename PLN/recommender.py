@@ -1,38 +1,139 @@
 import time
 from typing import List, Dict, Optional
+import numpy as np
 from profile_processor import ProfileProcessor
 from searcher import JobSearcher
+from sharded_searcher import ShardedSearcher
+from hot_reload import HotSwapSearcher
+from vector_store import source_category
+from lru_cache import LRUCache
+from metadata_filters import filter_key
+from reranker import CrossEncoderReranker, RERANK_TOP_N, profile_hash
+
+
+# Campos de metadata que usa _formatear_oferta (el resto no se lee del store)
+RESULT_FIELDS = ['title', 'description', 'source', 'scraped_at', 'category']
+
+# Campos de una oferta agregada con add_offers (los mismos de los JSON scrapeados)
+OFFER_FIELDS = ['source', 'scraped_at', 'title', 'description', 'category']
+
+# Busqueda hibrida (hybrid=...): los top HYBRID_CANDIDATES de FAISS y de BM25 se fusionan
+#   'rrf'      -> suma de 1 / (RRF_K + posicion) en cada lista
+#   'weighted' -> hybrid_weight * coseno + (1 - hybrid_weight) * BM25, cada uno
+#                 normalizado min-max entre los candidatos (BM25 = 0 si no esta en su lista)
+FUSION_METHODS = ('rrf', 'weighted')
+RRF_K = 60
+HYBRID_CANDIDATES = 50
+HYBRID_WEIGHT = 0.5
 
 
 class RecommendationEngine:
     # Motor de recomendacion que combina procesamiento de perfil y busqueda FAISS
     
-    def __init__(self, processed_data_dir: Optional[str] = None):
+    def __init__(self, processed_data_dir: Optional[str] = None, index_type: str = 'flat',
+                 index_params: Optional[Dict] = None, cache_max_mb: float = 64,
+                 encoder_backend: Optional[str] = None, auto_reload: bool = False,
+                 reload_interval: float = 30.0, shard_by: Optional[str] = None, n_shards: int = 4,
+                 shard_mode: str = 'thread', chunked: bool = False, chunk_aggregation: str = 'max',
+                 rerank: bool = False, rerank_top_n: int = RERANK_TOP_N,
+                 reranker: Optional[CrossEncoderReranker] = None, hybrid: Optional[str] = None,
+                 hybrid_weight: float = HYBRID_WEIGHT, hybrid_candidates: int = HYBRID_CANDIDATES,
+                 similar_neighbors: int = 0):
         # Inicializa el motor de recomendacion
+        # cache_max_mb: memoria maxima de la cache LRU de perfiles (0 la desactiva)
+        # encoder_backend: 'torch', 'onnx' u 'onnx_int8' (por defecto el de config.py)
+        # auto_reload: vigila el directorio de datos y activa un indice nuevo cuando
+        # cambia, sin reiniciar (reload() lo hace a pedido)
+        # shard_by: 'source' o 'hash' reparte la busqueda en shards (ShardedSearcher),
+        # en hilos o en un proceso por shard (shard_mode='process')
+        # chunked: los perfiles largos (CV de varias paginas) se codifican por ventanas
+        # y, si los stores tienen chunks, tambien las ofertas largas; el score de cada
+        # oferta agrega todas las ventanas con chunk_aggregation ('max' o 'mean_top')
+        # rerank: los rerank_top_n primeros candidatos de FAISS se reordenan con un
+        # cross-encoder (config.RERANKER_MODEL, o el CrossEncoderReranker dado) y se
+        # devuelven los k mejores con su 'rerank_score'
+        # hybrid: 'rrf' o 'weighted' suma la busqueda lexica BM25 (indice invertido
+        # de cleaned_text) y fusiona sus candidatos con los de FAISS ('hybrid_score')
+        # similar_neighbors: vecinos por oferta del grafo de similares (similares());
+        # con 0 se usa el guardado por build_index.py --similar, si esta vigente
         print("Inicializando Motor de Recomendación...")
         print("-" * 60)
         
         # Cargar componentes
-        self.processor = ProfileProcessor()
-        self.searcher = JobSearcher(processed_data_dir)
+        self.processor = ProfileProcessor(backend=encoder_backend)
+        if hybrid is not None and hybrid not in FUSION_METHODS:
+            raise ValueError(f"Fusión desconocida: {hybrid}. Opciones: {', '.join(FUSION_METHODS)}")
+        self.chunked = chunked
+        self.hybrid = hybrid
+        self.hybrid_weight = hybrid_weight
+        self.hybrid_candidates = hybrid_candidates
+        self.reranker = reranker or (CrossEncoderReranker() if rerank else None)
+        self.rerank_top_n = rerank_top_n
+        if shard_by:
+            searcher = ShardedSearcher(processed_data_dir, index_type=index_type, index_params=index_params,
+                                       shard_by=shard_by, n_shards=n_shards, mode=shard_mode,
+                                       chunked=chunked, chunk_aggregation=chunk_aggregation,
+                                       lexical=hybrid is not None)
+        else:
+            searcher = JobSearcher(processed_data_dir, index_type=index_type, index_params=index_params,
+                                   chunked=chunked, chunk_aggregation=chunk_aggregation,
+                                   lexical=hybrid is not None, similar_neighbors=similar_neighbors)
+        self.searcher = HotSwapSearcher(searcher)
+        self.searcher.on_swap(self._on_index_swap)
+        if auto_reload:
+            self.searcher.start_watching(reload_interval)
+        
+        # Cache (modelo, texto limpio) -> embedding + mayor top-k calculado
+        self.cache = LRUCache(int(cache_max_mb * 1024 * 1024)) if cache_max_mb > 0 else None
+        self.encoder_seconds_saved = 0.0
+        self._offer_processor = None
         
         print("-" * 60)
         print("OK - Motor de Recomendacion listo\n")
     
-    def recomendar(self, perfil_texto: str, k: int = 10, verbose: bool = False) -> List[Dict]:
+    def recomendar(self, perfil_texto: str, k: int = 10, verbose: bool = False,
+                   nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                   filters: Optional[Dict] = None) -> List[Dict]:
         # Recomienda las k ofertas mas relevantes para el perfil dado
+        # nprobe/ef_search solo aplican a indices IVF/HNSW
+        # filters: restringe por category, source, _source_file y rango de scraped_at
         start_time = time.time()
         
         # Validar entrada
         if not perfil_texto or not isinstance(perfil_texto, str):
             raise ValueError("El perfil_texto debe ser un string no vacío")
         
-        # 1. Procesar perfil de usuario
+        # 1. Procesar perfil de usuario (o reutilizarlo desde la cache)
         if verbose:
             print("Procesando perfil...")
         
         embedding_time = time.time()
-        perfil_embedding = self.processor.process_profile(perfil_texto)
+        cleaned = self.processor.clean_text(perfil_texto)
+        if not cleaned:
+            raise ValueError("El texto del perfil no contiene contenido válido después de limpieza")
+        
+        entry = self._cache_lookup(cleaned)
+        # Una sola generacion del indice para toda la consulta (puede recargarse en paralelo)
+        searcher = self.searcher.current
+        search_key = (searcher.generation, searcher.revision, nprobe, ef_search, filter_key(filters),
+                      self._ranking_key())
+        cached = entry['results'].get(search_key) if entry else None
+        if cached is not None and cached[0] >= k:
+            # El top-k guardado cubre este k: se sirve recortando, sin encoder ni FAISS
+            ofertas_formateadas = [dict(o) for o in cached[1][:k]]
+            if verbose:
+                print(f"OK - {len(ofertas_formateadas)} ofertas servidas desde la cache "
+                      f"({time.time() - start_time:.3f}s)\n")
+            return ofertas_formateadas
+        
+        if entry is None:
+            if self.chunked:
+                perfil_embedding = self.processor.encode_chunks(cleaned)
+            else:
+                perfil_embedding = self.processor.encode_cleaned(cleaned)
+            entry = {'embedding': perfil_embedding, 'encode_seconds': time.time() - embedding_time,
+                     'results': {}}
+        perfil_embedding = entry['embedding']
         embedding_elapsed = time.time() - embedding_time
         
         # 2. Buscar ofertas similares
@@ -40,24 +141,37 @@ class RecommendationEngine:
             print("Buscando ofertas similares...")
         
         search_time = time.time()
-        resultados = self.searcher.search(perfil_embedding, k=k)
+        n_candidates = self._candidates(k)
+        resultados = searcher.search(perfil_embedding, k=self._retrieved(n_candidates), nprobe=nprobe,
+                                     ef_search=ef_search, fields=RESULT_FIELDS, filters=filters)
         search_elapsed = time.time() - search_time
         
-        # 3. Formatear resultados según especificación
-        ofertas_formateadas = []
-        for job in resultados:
-            oferta = {
-                'id': job['_global_index'],
-                'title': job['title'],
-                'description': job['description'],
-                'description_preview': job['description'][:200] + '...' if len(job['description']) > 200 else job['description'],
-                'score': round(job['similarity_score'], 4),
-                'source': job.get('source', 'unknown'),
-                'scraped_at': job.get('scraped_at', 'unknown'),
-                '_source_file': job.get('_source_file', 'unknown'),
-                'category': job.get('category', 'unknown')
-            }
-            ofertas_formateadas.append(oferta)
+        # 2b. Busqueda lexica BM25 y fusion con los candidatos de FAISS
+        lexical_elapsed = None
+        if self.hybrid:
+            lexical_time = time.time()
+            lexicos = searcher.search_lexical(cleaned, k=self._retrieved(n_candidates), fields=RESULT_FIELDS,
+                                              filters=filters, query_embedding=perfil_embedding)
+            resultados = self._fuse(resultados, lexicos, n_candidates)
+            lexical_elapsed = time.time() - lexical_time
+        
+        # 3. Reordenar los candidatos con el cross-encoder
+        rerank_stats = None
+        if self.reranker is not None:
+            if verbose:
+                print(f"Reordenando {len(resultados)} candidatos...")
+            [resultados], rerank_stats = self.reranker.rerank([cleaned], [resultados], k,
+                                                              keys=[profile_hash(cleaned)])
+        
+        # 4. Formatear resultados según especificación
+        ofertas_formateadas = [self._formatear_oferta(job) for job in resultados]
+        
+        # Guardar el mayor top-k calculado para este perfil y parametros (los de
+        # otra generacion o revision del indice ya no se sirven y se descartan)
+        entry['results'] = {key: value for key, value in entry['results'].items() if key[:2] == search_key[:2]}
+        entry['results'][search_key] = (k, ofertas_formateadas)
+        self._cache_store(cleaned, entry)
+        ofertas_formateadas = [dict(o) for o in ofertas_formateadas]
         
         total_time = time.time() - start_time
         
@@ -65,14 +179,273 @@ class RecommendationEngine:
             print(f"\nTiempos de ejecucion:")
             print(f"   - Embedding del perfil: {embedding_elapsed:.3f}s")
             print(f"   - Busqueda FAISS: {search_elapsed:.3f}s")
+            if lexical_elapsed is not None:
+                print(f"   - Busqueda BM25 + fusion ({self.hybrid}): {lexical_elapsed:.3f}s")
+            if rerank_stats is not None:
+                self._print_rerank_time(rerank_stats)
             print(f"   - Total: {total_time:.3f}s")
             print(f"OK - Encontradas {len(ofertas_formateadas)} ofertas relevantes\n")
         
         return ofertas_formateadas
     
+    def recomendar_batch(self, perfiles: List[str], k: int = 10, verbose: bool = False,
+                         nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                         filters: Optional[Dict] = None) -> List[List[Dict]]:
+        # Recomienda las k ofertas mas relevantes para cada perfil de la lista
+        # Un solo encode en lote y una sola busqueda FAISS con la matriz n x d
+        start_time = time.time()
+        
+        # Validar entrada
+        if not perfiles or not all(isinstance(p, str) and p for p in perfiles):
+            raise ValueError("perfiles debe ser una lista de strings no vacíos")
+        
+        # 1. Procesar todos los perfiles en lote
+        if verbose:
+            print(f"Procesando {len(perfiles)} perfiles...")
+        
+        embedding_time = time.time()
+        perfiles_embeddings, query_offsets = self._embed_batch(perfiles)
+        embedding_elapsed = time.time() - embedding_time
+        
+        # 2. Buscar ofertas similares para todos los perfiles
+        if verbose:
+            print("Buscando ofertas similares...")
+        
+        search_time = time.time()
+        searcher = self.searcher.current
+        n_candidates = self._candidates(k)
+        resultados = searcher.search_batch(perfiles_embeddings, k=self._retrieved(n_candidates),
+                                           nprobe=nprobe, ef_search=ef_search, fields=RESULT_FIELDS,
+                                           filters=filters, query_offsets=query_offsets)
+        search_elapsed = time.time() - search_time
+        
+        cleaned = None
+        if self.hybrid or self.reranker is not None:
+            cleaned = [self.processor.clean_text(p) for p in perfiles]
+        
+        # 2b. Busqueda lexica BM25 de todos los perfiles y fusion con FAISS
+        lexical_elapsed = None
+        if self.hybrid:
+            lexical_time = time.time()
+            lexicos = searcher.search_lexical_batch(cleaned, k=self._retrieved(n_candidates), fields=RESULT_FIELDS,
+                                                    filters=filters, query_embeddings=perfiles_embeddings,
+                                                    query_offsets=query_offsets)
+            resultados = [self._fuse(densos, lexs, n_candidates) for densos, lexs in zip(resultados, lexicos)]
+            lexical_elapsed = time.time() - lexical_time
+        
+        # 3. Reordenar los candidatos de todos los perfiles (predict compartido por lote)
+        rerank_stats = None
+        if self.reranker is not None:
+            resultados, rerank_stats = self.reranker.rerank(cleaned, resultados, k,
+                                                            keys=[profile_hash(c) for c in cleaned])
+        
+        # 4. Formatear resultados de cada perfil
+        recomendaciones = [[self._formatear_oferta(job) for job in jobs] for jobs in resultados]
+        
+        total_time = time.time() - start_time
+        
+        if verbose:
+            print(f"\nTiempos de ejecucion ({len(perfiles)} perfiles):")
+            print(f"   - Embedding de perfiles: {embedding_elapsed:.3f}s")
+            print(f"   - Busqueda FAISS: {search_elapsed:.3f}s")
+            if lexical_elapsed is not None:
+                print(f"   - Busqueda BM25 + fusion ({self.hybrid}): {lexical_elapsed:.3f}s")
+            if rerank_stats is not None:
+                self._print_rerank_time(rerank_stats)
+            print(f"   - Total: {total_time:.3f}s ({total_time / len(perfiles):.3f}s por perfil)\n")
+        
+        return recomendaciones
+    
+    def _candidates(self, k: int) -> int:
+        # Candidatos a pedir a FAISS: con reranker, los top-N que reordena el cross-encoder
+        return max(k, self.rerank_top_n) if self.reranker is not None else k
+    
+    def _retrieved(self, n_candidates: int) -> int:
+        # Resultados a pedir a cada buscador: con fusion, al menos hybrid_candidates
+        return max(n_candidates, self.hybrid_candidates) if self.hybrid else n_candidates
+    
+    def _ranking_key(self):
+        # Parte de la clave de la cache de resultados que depende de la fusion y el reordenamiento
+        hybrid = (self.hybrid, self.hybrid_weight, self.hybrid_candidates) if self.hybrid else None
+        rerank = (self.reranker.model_name, self.rerank_top_n) if self.reranker is not None else None
+        return hybrid, rerank
+    
+    def _fuse(self, densos: List[Dict], lexicos: List[Dict], n: int) -> List[Dict]:
+        # Fusiona los candidatos de FAISS y BM25 de un perfil; devuelve los n
+        # primeros por 'hybrid_score'. Las ofertas que vienen solo de BM25 traen su
+        # similitud exacta (search_lexical con el embedding del perfil)
+        jobs = {}
+        for job in densos:
+            jobs[job['_global_index']] = dict(job)
+        for job in lexicos:
+            jobs.setdefault(job['_global_index'], dict(job))['bm25_score'] = job['bm25_score']
+        if not jobs:
+            # Un filtro sin coincidencias (o todas las ofertas eliminadas)
+            return []
+        
+        if self.hybrid == 'rrf':
+            fused = dict.fromkeys(jobs, 0.0)
+            for lista in (densos, lexicos):
+                for rank, job in enumerate(lista, 1):
+                    fused[job['_global_index']] += 1.0 / (RRF_K + rank)
+        else:
+            def normalize(values):
+                if not values:
+                    return {}
+                low, high = min(values.values()), max(values.values())
+                return {i: (v - low) / (high - low) if high > low else 1.0 for i, v in values.items()}
+            dense = normalize({i: job['similarity_score'] for i, job in jobs.items()})
+            lexical = normalize({job['_global_index']: job['bm25_score'] for job in lexicos}) if lexicos else {}
+            fused = {i: self.hybrid_weight * dense[i] + (1 - self.hybrid_weight) * lexical.get(i, 0.0)
+                     for i in jobs}
+        
+        for i, job in jobs.items():
+            job['hybrid_score'] = fused[i]
+        return sorted(jobs.values(), key=lambda job: -job['hybrid_score'])[:n]
+    
+    def _print_rerank_time(self, stats: Dict):
+        print(f"   - Rerank (cross-encoder): {stats['seconds']:.3f}s ({stats['pairs_scored']} pares, "
+              f"{stats['cached_scores']} desde cache, {stats['early_exits']} cortes anticipados)")
+    
+    def _embed_batch(self, perfiles: List[str]):
+        # Embeddings de varios perfiles: los que estan en cache no se vuelven a codificar
+        # Devuelve (matriz, query_offsets); con chunked cada perfil aporta una fila
+        # por ventana y query_offsets indica las filas de cada uno
+        if self.cache is None and not self.chunked:
+            return self.processor.process_profiles_batch(perfiles), None
+        
+        cleaned = [self.processor.clean_text(p) for p in perfiles]
+        empty = [i for i, c in enumerate(cleaned) if not c]
+        if empty:
+            raise ValueError(f"Los perfiles {empty} no contienen contenido válido después de limpieza")
+        
+        entries = [self._cache_lookup(c) for c in cleaned]
+        missing = [i for i, e in enumerate(entries) if e is None]
+        if missing:
+            start = time.time()
+            if self.chunked:
+                vectors, offsets = self.processor.encode_chunks_batch([cleaned[i] for i in missing])
+                nuevos = [vectors[offsets[j]:offsets[j + 1]] for j in range(len(missing))]
+            else:
+                nuevos = self.processor.encode_cleaned_batch([cleaned[i] for i in missing])
+            per_profile = (time.time() - start) / len(missing)
+            for i, embedding in zip(missing, nuevos):
+                entries[i] = {'embedding': embedding, 'encode_seconds': per_profile, 'results': {}}
+                self._cache_store(cleaned[i], entries[i])
+        
+        if not self.chunked:
+            return np.vstack([e['embedding'] for e in entries]), None
+        rows = [np.atleast_2d(e['embedding']) for e in entries]
+        return np.vstack(rows), np.cumsum([0] + [len(r) for r in rows])
+    
+    def similares(self, offer_id: int, k: int = 5) -> List[Dict]:
+        # Ofertas parecidas a una oferta ("mas como esta"), con el formato de recomendar
+        jobs = self.searcher.current.similar_to(offer_id, k=k, fields=RESULT_FIELDS)
+        return [self._formatear_oferta(job) for job in jobs]
+    
+    def add_offers(self, ofertas: List[Dict]) -> List[int]:
+        # Agrega ofertas (title, description, category, source, scraped_at) al indice
+        # en ejecucion y devuelve sus offer_id. El texto se limpia y codifica igual
+        # que en process_embeddings para que sean comparables con las del store
+        from process_embeddings import JobOfferProcessor
+        from embedding_cache import content_key
+        if not ofertas:
+            return []
+        if self._offer_processor is None:
+            # Comparte el modelo ya cargado (model_registry)
+            self._offer_processor = JobOfferProcessor(self.processor.model_name, self.processor.backend)
+        processor = self._offer_processor
+        
+        records = []
+        for i, oferta in enumerate(ofertas):
+            record = {field: oferta.get(field) or '' for field in OFFER_FIELDS}
+            if not record['title'] and not record['description']:
+                raise ValueError(f"La oferta {i} no tiene título ni descripción")
+            record['cleaned_text'] = processor.clean_text(
+                f"{record['title']} {record['category']}. {record['description']}")
+            record['_content_hash'] = content_key(record['cleaned_text'], processor.model_name)
+            records.append(record)
+        
+        embeddings = processor.model.encode([r['cleaned_text'] for r in records], batch_size=64,
+                                            show_progress_bar=False)
+        ids = self.searcher.add_offers(records, embeddings)
+        self._on_index_change()
+        return ids
+    
+    def remove_offers(self, offer_ids: List[int]) -> int:
+        # Quita ofertas por offer_id; devuelve cuantas se quitaron
+        removed = self.searcher.remove_offers(offer_ids)
+        if removed:
+            self._on_index_change()
+        return removed
+    
+    def reload(self) -> bool:
+        # Recarga indice y metadata ahora mismo (True si se activo una generacion nueva)
+        return self.searcher.reload_now()
+    
+    def _on_index_swap(self, old: JobSearcher, new: JobSearcher):
+        # Los top-k guardados son de la generacion anterior: se descartan
+        self._on_index_change()
+    
+    def _on_index_change(self):
+        # Los top-k guardados ya no corresponden al indice; los embeddings de los
+        # perfiles no dependen de el y se conservan
+        if self.cache is not None:
+            self.cache.map_values(lambda entry: dict(entry, results={}))
+    
+    def _cache_lookup(self, cleaned: str) -> Optional[Dict]:
+        # Busca un perfil limpio en la cache y acumula el tiempo de encoder ahorrado
+        if self.cache is None:
+            return None
+        entry = self.cache.get((self.processor.encoder_id, cleaned))
+        if entry is not None:
+            self.encoder_seconds_saved += entry['encode_seconds']
+        return entry
+    
+    def _cache_store(self, cleaned: str, entry: Dict):
+        if self.cache is not None:
+            self.cache.put((self.processor.encoder_id, cleaned), entry)
+    
+    def get_cache_statistics(self) -> Dict:
+        # Aciertos/fallos de la cache de perfiles y tiempo de encoder ahorrado
+        if self.cache is None:
+            return {'enabled': False}
+        stats = self.cache.stats()
+        stats['enabled'] = True
+        stats['encoder_seconds_saved'] = round(self.encoder_seconds_saved, 4)
+        return stats
+    
+    def _formatear_oferta(self, job: Dict) -> Dict:
+        # Convierte un resultado del buscador al formato de salida del motor
+        return {
+            'id': job['_global_index'],
+            'offer_id': job['_offer_id'],
+            'title': job['title'],
+            'description': job['description'],
+            'description_preview': job['description'][:200] + '...' if len(job['description']) > 200 else job['description'],
+            'score': round(job['similarity_score'], 4),
+            **{field: round(job[field], 4) for field in ('bm25_score', 'hybrid_score', 'rerank_score')
+               if field in job},
+            'source': job.get('source', 'unknown'),
+            'scraped_at': job.get('scraped_at', 'unknown'),
+            '_source_file': job.get('_source_file', 'unknown'),
+            'category': job.get('category', 'unknown')
+        }
+    
     def get_statistics(self) -> Dict:
         # Retorna estadisticas del sistema de recomendacion
-        return self.searcher.get_statistics()
+        stats = self.searcher.get_statistics()
+        stats['profile_cache'] = self.get_cache_statistics()
+        stats['reload'] = self.searcher.reload_statistics()
+        stats['encoder'] = {'model_name': self.processor.model_name, 'backend': self.processor.backend,
+                            'chunked': self.chunked}
+        if self.hybrid:
+            stats['hybrid'] = {'fusion': self.hybrid, 'dense_weight': self.hybrid_weight,
+                               'candidates': self.hybrid_candidates}
+        if self.reranker is not None:
+            stats['reranker'] = self.reranker.get_statistics()
+            stats['reranker']['top_n'] = self.rerank_top_n
+        return stats
 
 
 def recomendar(perfil_texto: str, k: int = 10) -> List[Dict]:
@@ -95,7 +468,7 @@ if __name__ == "__main__":
     print(f"Dimensión de embeddings: {stats['embedding_dimension']}")
     print(f"\nDistribución por fuente:")
     for source, count in stats['sources'].items():
-        categoria = source.replace('vectors_', '').replace('.pkl', '')
+        categoria = source_category(source)
         print(f"  - {categoria}: {count} ofertas")
     
     # Ejemplo de perfil de usuario
@@ -130,9 +503,9 @@ if __name__ == "__main__":
     for i, oferta in enumerate(ofertas, 1):
         print(f"\n{i}. {oferta['title']}")
         print(f"   Score de similitud: {oferta['score']:.4f}")
-        print(f"   Categoria: {oferta['_source_file'].replace('vectors_', '').replace('.pkl', '')}")
+        print(f"   Categoria: {source_category(oferta['_source_file'])}")
         print(f"   Preview: {oferta['description_preview']}")
-        print(f"   ID: {oferta['id']}")
+        print(f"   ID: {oferta['id']} (offer_id {oferta['offer_id']})")
     
     print("\n" + "="*70)
     print("OK - Sistema de recomendacion funcionando correctamente")
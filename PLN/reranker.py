@@ -0,0 +1,135 @@
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import RERANKER_MODEL
+from lru_cache import LRUCache
+
+
+# Segunda etapa opcional del motor: los top-N candidatos del bi-encoder (FAISS) se
+# reordenan con un cross-encoder, que lee perfil y oferta juntos. Para acotar la
+# latencia:
+#   - solo se puntuan N candidatos, en lotes de batch_size pares (con varios
+#     perfiles, un solo predict por ronda para los lotes de todos)
+#   - los candidatos se recorren en el orden del bi-encoder y un perfil deja de
+#     puntuarse cuando el mejor score de su ultimo lote queda a mas de
+#     early_exit_margin del k-esimo: su top-k ya esta separado de lo que queda
+#   - los scores se guardan en una cache LRU por (hash del perfil, offer_id)
+RERANK_TOP_N = 50
+RERANK_BATCH = 16
+# Los scores del cross-encoder van de 0 a 1 (sigmoide)
+EARLY_EXIT_MARGIN = 0.05
+MAX_LENGTH = 256
+
+
+def profile_hash(cleaned_text: str) -> str:
+    # Clave de un perfil (texto limpio) en la cache de scores
+    return hashlib.sha256(cleaned_text.encode('utf-8')).hexdigest()
+
+
+def offer_text(job: Dict) -> str:
+    # Texto de la oferta que lee el cross-encoder (lo que no entra en max_length se trunca)
+    return f"{job.get('title', '')}. {job.get('description', '')}"
+
+
+class CrossEncoderReranker:
+    # Reordena candidatos con un cross-encoder local de sentence-transformers
+
+    def __init__(self, model_name: str = RERANKER_MODEL, batch_size: int = RERANK_BATCH,
+                 max_length: int = MAX_LENGTH, early_exit_margin: Optional[float] = EARLY_EXIT_MARGIN,
+                 cache_max_mb: float = 8, device: Optional[str] = None):
+        # early_exit_margin=None puntua siempre los N candidatos
+        # cache_max_mb: memoria maxima de la cache de scores (0 la desactiva)
+        from sentence_transformers import CrossEncoder
+        print(f"Cargando cross-encoder: {model_name}...")
+        kwargs = {'device': device} if device else {}
+        self.model = CrossEncoder(model_name, max_length=max_length, **kwargs)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.early_exit_margin = early_exit_margin
+        self.cache = LRUCache(int(cache_max_mb * 1024 * 1024)) if cache_max_mb > 0 else None
+        self._stats_lock = threading.Lock()
+        self.totals = {'queries': 0, 'candidates': 0, 'pairs_scored': 0, 'cached_scores': 0,
+                       'early_exits': 0, 'seconds': 0.0}
+        print("OK - Cross-encoder cargado")
+
+    def rerank(self, queries: List[str], candidates: List[List[Dict]], k: int,
+               keys: Optional[List[str]] = None) -> Tuple[List[List[Dict]], Dict]:
+        # Devuelve el top-k de cada consulta segun el cross-encoder ('rerank_score'
+        # en cada oferta) y las estadisticas de la llamada. candidates[q] viene
+        # ordenado por el bi-encoder; keys son los hashes de los perfiles para la
+        # cache (por defecto profile_hash de cada consulta)
+        start = time.time()
+        keys = keys or [profile_hash(q) for q in queries]
+        scores = [np.full(len(jobs), np.nan) for jobs in candidates]
+        cached = 0
+        if self.cache is not None:
+            for key, jobs, row in zip(keys, candidates, scores):
+                for i, job in enumerate(jobs):
+                    score = self.cache.get((key, job['_offer_id']))
+                    if score is not None:
+                        row[i] = score
+                        cached += 1
+
+        walked = [0] * len(queries)
+        active = [q for q in range(len(queries)) if candidates[q] and k > 0]
+        pairs_scored, early_exits = 0, 0
+        while active:
+            # Siguiente lote de cada consulta activa; todos los pares en un solo predict
+            pairs, targets = [], []
+            for q in active:
+                for i in range(walked[q], min(walked[q] + self.batch_size, len(candidates[q]))):
+                    if np.isnan(scores[q][i]):
+                        pairs.append((queries[q], offer_text(candidates[q][i])))
+                        targets.append((q, i))
+            if pairs:
+                predicted = np.asarray(self.model.predict(pairs, batch_size=self.batch_size,
+                                                          show_progress_bar=False), dtype='float64').ravel()
+                pairs_scored += len(pairs)
+                for (q, i), score in zip(targets, predicted):
+                    scores[q][i] = score
+                    if self.cache is not None:
+                        self.cache.put((keys[q], candidates[q][i]['_offer_id']), float(score))
+
+            still_active = []
+            for q in active:
+                previous, walked[q] = walked[q], min(walked[q] + self.batch_size, len(candidates[q]))
+                if walked[q] >= len(candidates[q]):
+                    continue
+                if self.early_exit_margin is not None and previous >= k:
+                    kth = np.sort(scores[q][:previous])[::-1][k - 1]
+                    if scores[q][previous:walked[q]].max() < kth - self.early_exit_margin:
+                        early_exits += 1
+                        continue
+                still_active.append(q)
+            active = still_active
+
+        results = []
+        for jobs, row, n in zip(candidates, scores, walked):
+            # Los candidatos sin puntuar (early exit) no entran: ya hay k con score
+            order = np.argsort(-row[:n], kind='stable')[:k]
+            results.append([dict(jobs[i], rerank_score=float(row[i])) for i in order])
+
+        stats = {
+            'queries': len(queries),
+            'candidates': sum(len(jobs) for jobs in candidates),
+            'pairs_scored': pairs_scored,
+            'cached_scores': cached,
+            'early_exits': early_exits,
+            'seconds': time.time() - start,
+        }
+        with self._stats_lock:
+            for key, value in stats.items():
+                self.totals[key] += value
+        return results, stats
+
+    def get_statistics(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self.totals)
+        stats['seconds'] = round(stats['seconds'], 4)
+        stats['model_name'] = self.model_name
+        stats['batch_size'] = self.batch_size
+        stats['early_exit_margin'] = self.early_exit_margin
+        stats['score_cache'] = self.cache.stats() if self.cache is not None else {'enabled': False}
+        return stats
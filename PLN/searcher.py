@@ -1,132 +1,965 @@
 import pickle
 import os
-import glob
-from typing import List, Dict, Tuple
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Optional
 import numpy as np
-import faiss
+from vector_store import (VectorStore, ColumnTable, StoreMetadata, discover_sources, source_fingerprint,
+                          read_header, offer_id, offer_shard)
+from index_factory import (build_index, search_parameters, index_settings, recall_vs_flat, resolve_params,
+                           gather_rows, search_with_rescore, exact_search_subset, base_index,
+                           index_paths, build_manifest, read_manifest, manifest_matches, appended_from,
+                           save_index, load_index)
+from metadata_filters import MetadataFilter
+from chunking import expand_ranges, select_rows, aggregate, AGGREGATIONS
+from lexical_index import LexicalIndex, lexical_texts
+from similar_graph import SimilarGraph
+
+
+# Con filtros que dejan a lo sumo estas ofertas se recorre el subconjunto de forma
+# exacta en lugar de consultar el indice con un IDSelector
+EXACT_FILTER_ROWS = 4096
+
+# Ofertas agregadas en ejecucion (add_offers): forman una tabla mas, al final
+RUNTIME_SOURCE = 'runtime'
+
+# Las ofertas quitadas quedan marcadas (tombstone) y se excluyen de las busquedas;
+# cuando superan esta fraccion del indice se quitan de el fisicamente (compact)
+COMPACT_RATIO = 0.1
+
+# Ventanas extra de las ofertas largas (chunked=True): van en un indice aparte que
+# solo propone candidatos, porque el score de cada oferta se recalcula de forma
+# exacta con sus ventanas float32 del store; por eso basta con 1 byte por dimension
+CHUNK_INDEX_TYPE = 'sq_int8'
+CHUNK_INDEX_NAME = 'chunks'
+# Ofertas candidatas por consulta (por cada resultado pedido) antes de agregar
+CHUNK_CANDIDATES = 4
+
+
+class ReadWriteLock:
+    # Varias busquedas a la vez, o una sola modificacion del indice sin busquedas
+    # en curso (faiss no admite agregar/quitar vectores mientras se busca)
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+
+    @contextmanager
+    def reading(self):
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def writing(self):
+        # La escritura se anuncia antes de esperar: las busquedas nuevas esperan detras
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._writer = True
+            while self._readers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def default_data_dir() -> str:
+    # dataset/clean en la raiz del proyecto
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(os.path.dirname(current_dir), 'dataset', 'clean')
 
 
 class JobSearcher:
     # Motor de busqueda de ofertas laborales usando FAISS
     
-    def __init__(self, processed_data_dir: str = None):
+    def __init__(self, processed_data_dir: str = None, index_type: str = 'flat',
+                 index_params: Optional[Dict] = None, index_dir: Optional[str] = None,
+                 use_saved_index: bool = True, mmap_index: bool = True, with_index: bool = True,
+                 sources: Optional[List[str]] = None, shard: Optional[Tuple[int, int]] = None,
+                 chunked: bool = False, chunk_aggregation: str = 'max', chunk_index_type: str = CHUNK_INDEX_TYPE,
+                 lexical: bool = False, similar_neighbors: int = 0):
         # Inicializa el buscador y carga todos los embeddings
+        # index_type: 'flat' (exacto), 'ivf_flat', 'ivf_pq' o 'hnsw' (aproximados),
+        # 'sq_fp16' o 'sq_int8' (vectores cuantizados + reordenamiento exacto)
+        # use_saved_index: reutiliza el indice guardado en index_dir si su manifest
+        # coincide con las fuentes actuales (si no, lo reconstruye y lo guarda)
+        # with_index=False: solo carga metadata y embeddings (sin importar faiss)
+        # sources: nombres de las fuentes a cargar (por defecto todas las vectors_*)
+        # shard=(i, n): solo las ofertas del tramo i de n del rango de offer_id
+        # (los indices globales de sus resultados son locales al shard; ver global_rows)
+        # chunked: carga tambien las ventanas extra de las ofertas largas (stores
+        # generados con process_embeddings --chunked) y el score de cada oferta
+        # agrega las similitudes de todas sus ventanas ('max' o 'mean_top')
+        # lexical: carga tambien el indice BM25 de cada store (search_lexical); los
+        # que no lo tengan se indexan al cargar desde su cleaned_text
+        # similar_neighbors: vecinos por oferta del grafo de similares (similar_to);
+        # si el guardado en index_dir no corresponde a los datos se construye. Con 0
+        # solo se usa el guardado (build_index.py --similar), si esta vigente
         if processed_data_dir is None:
-            # Obtener ruta relativa desde este archivo
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            processed_data_dir = os.path.join(
-                os.path.dirname(current_dir),
-                'dataset',
-                'clean'
-            )
+            processed_data_dir = default_data_dir()
+        
+        # Argumentos para construir una nueva generacion con la misma configuracion (reload)
+        self._init_args = dict(processed_data_dir=processed_data_dir, index_type=index_type,
+                               index_params=index_params, index_dir=index_dir,
+                               use_saved_index=use_saved_index, mmap_index=mmap_index, with_index=with_index,
+                               sources=sources, shard=shard, chunked=chunked,
+                               chunk_aggregation=chunk_aggregation, chunk_index_type=chunk_index_type,
+                               lexical=lexical, similar_neighbors=similar_neighbors)
+        if chunk_aggregation not in AGGREGATIONS:
+            raise ValueError(f"Agregación desconocida: {chunk_aggregation}. Opciones: {', '.join(AGGREGATIONS)}")
         
         self.processed_data_dir = processed_data_dir
+        self.index_dir = index_dir or os.path.join(processed_data_dir, 'index')
+        self.use_saved_index = use_saved_index
+        self.mmap_index = mmap_index
+        self.index_type = index_type
+        self.index_params = resolve_params(index_type, index_params)
+        self.source_names = sources
+        self.shard = tuple(shard) if shard is not None else None
+        self.global_rows = None
+        self.recall_vs_flat = None
         self.index = None
-        self.job_metadata = []
+        self.job_metadata = StoreMetadata([])
         self.embedding_dim = None
+        self._embedding_blocks = []
+        self._source_counts = {}
+        self._sources = []
+        self.source_fingerprints = []
+        self._filter = None
+        self._filter_lock = threading.Lock()
+        # Altas/bajas en ejecucion (solo en esta generacion; una recarga parte de disco)
+        self._lock = ReadWriteLock()
+        self.revision = 0
+        self._index_readonly = False
+        self._offer_ids = None
+        self._offer_order = None
+        self._removed = None
+        self._removed_count = 0
+        self._live_bits = None
+        self._tombstones = np.zeros(0, dtype='int64')
+        # Ventanas extra: los chunks de la oferta i son _chunk_offsets[i]:_chunk_offsets[i + 1]
+        self.chunked = chunked
+        self.chunk_aggregation = chunk_aggregation
+        self.chunk_index_type = chunk_index_type
+        self.chunk_index = None
+        self._chunk_blocks = []
+        self._chunk_offsets = None
+        # Indice BM25 de todas las fuentes (filas = indices globales)
+        self.lexical = lexical
+        self.lexical_index = None
+        # Vecinos precalculados de cada oferta (None: similar_to busca en el indice)
+        self.similar_neighbors = similar_neighbors
+        self.similar_graph = None
+        
+        # Segundos de cada etapa del arranque (get_statistics, evaluation/benchmark.py)
+        self.startup_seconds = {}
         
         print(f"Cargando datos desde: {self.processed_data_dir}")
-        self._load_all_data()
-        self._build_index()
-        print(f"OK - Indice FAISS creado con {len(self.job_metadata)} ofertas")
+        self._timed('load_data', self._load_all_data)
+        if with_index:
+            self._timed('index', self._load_or_build_index)
+            if self.chunked:
+                self._timed('chunk_index', self._load_or_build_chunk_index)
+            if self.shard is None:
+                self._timed('similar_graph', self._load_or_build_similar_graph)
+        self.disk_signature = self.read_disk_signature()
+    
+    def _timed(self, stage: str, step):
+        start = time.perf_counter()
+        step()
+        self.startup_seconds[stage] = round(time.perf_counter() - start, 4)
+    
+    def read_disk_signature(self) -> Tuple:
+        # Huella barata de lo que hay en disco (fuentes + manifest del indice) para
+        # detectar datos nuevos sin releerlos: digest del header de cada .store,
+        # tamaño y fecha de cada .pkl y fecha del manifest
+        signature = []
+        for kind, path in self._discover_sources():
+            name = os.path.basename(os.path.normpath(path))
+            try:
+                if kind == 'store':
+                    header = read_header(path)
+                    signature.append((name, header.get('digest'), header.get('count')))
+                else:
+                    stat = os.stat(path)
+                    signature.append((name, stat.st_size, stat.st_mtime_ns))
+            except (OSError, ValueError):
+                signature.append((name, None, None))
+        _, manifest_path = index_paths(self.index_dir, self.index_type)
+        manifest_mtime = os.stat(manifest_path).st_mtime_ns if os.path.exists(manifest_path) else None
+        return tuple(signature), manifest_mtime
+    
+    def reload(self) -> 'JobSearcher':
+        # Construye una generacion nueva con la misma configuracion (esta no se modifica)
+        return JobSearcher(**self._init_args)
+    
+    def _discover_sources(self) -> List[Tuple[str, str]]:
+        sources = discover_sources(self.processed_data_dir)
+        if self.source_names is not None:
+            sources = [(kind, path) for kind, path in sources
+                       if os.path.basename(os.path.normpath(path)) in self.source_names]
+        return sources
     
     def _load_all_data(self):
-        # Carga todos los archivos .pkl y combina metadata y embeddings
-        pkl_files = glob.glob(os.path.join(self.processed_data_dir, "vectors_*.pkl"))
+        # Carga todas las fuentes (.store con mmap o .pkl antiguos) y combina metadata y embeddings
+        sources = self._discover_sources()
         
-        if not pkl_files:
+        if not sources:
             raise FileNotFoundError(
-                f"No se encontraron archivos .pkl en {self.processed_data_dir}. "
+                f"No se encontraron archivos .store ni .pkl en {self.processed_data_dir}. "
                 f"Ejecuta process_embeddings.py primero."
             )
         
-        print(f"Encontrados {len(pkl_files)} archivos de embeddings")
+        print(f"Encontrados {len(sources)} archivos de embeddings")
+        self._sources = sources
+        
+        if all(kind == 'store' for kind, _ in sources):
+            self._load_stores([path for _, path in sources])
+        else:
+            self._load_pickles(sources)
+        self.embedding_dim = self._embedding_blocks[0].shape[1]
+        if self.chunked:
+            self._load_chunks()
+        if self.lexical:
+            self._load_lexical()
+        if self.shard is not None:
+            self._keep_shard_rows()
         
-        all_embeddings = []
+        print(f"OK - Cargadas {len(self.job_metadata)} ofertas")
+        print(f"  Dimensión de embeddings: {self.embedding_dim}")
+    
+    def _load_stores(self, store_paths: List[str]):
+        # Abre los stores con mmap: no se copian embeddings ni se crean dicts por oferta
+        stores = []
+        for store_path in store_paths:
+            store = VectorStore(store_path)
+            print(f"  Abriendo {store.name} ({len(store)} ofertas)...")
+            stores.append(store)
+            self._embedding_blocks.append(self._store_embeddings(store))
+            self._source_counts[store.name] = len(store)
         
-        for pkl_file in sorted(pkl_files):
-            filename = os.path.basename(pkl_file)
+        self.job_metadata = StoreMetadata(stores)
+    
+    @staticmethod
+    def _store_embeddings(store: VectorStore) -> np.ndarray:
+        # El mmap del store tal cual; solo se copia a memoria si hay que normalizarlo
+        if store.normalized:
+            return store.embeddings
+        import faiss
+        embeddings = np.array(store.embeddings, dtype='float32')
+        faiss.normalize_L2(embeddings)
+        return embeddings
+    
+    def _load_pickles(self, sources: List[Tuple[str, str]]):
+        # Formato antiguo: deserializa cada .pkl completo y pasa su metadata a
+        # columnas (un buffer por campo en lugar de un dict por oferta). Los
+        # embeddings del .pkl quedan como unica copia en memoria (se normalizan
+        # en su lugar); los .store de la misma carpeta se siguen abriendo con mmap.
+        # Para no tener la matriz en memoria: python vector_store.py <carpeta>
+        import faiss
+        tables = []
+        for kind, path in sources:
+            filename = os.path.basename(os.path.normpath(path))
             print(f"  Cargando {filename}...")
+            if kind == 'store':
+                table = VectorStore(path)
+                embeddings = self._store_embeddings(table)
+            else:
+                with open(path, 'rb') as f:
+                    data = pickle.load(f)
+                table = ColumnTable.from_records(filename, data['metadata'])
+                embeddings = np.ascontiguousarray(data['embeddings'], dtype='float32')
+                del data
+                faiss.normalize_L2(embeddings)
             
-            with open(pkl_file, 'rb') as f:
-                data = pickle.load(f)
-            
-            metadata = data['metadata']
-            embeddings = data['embeddings']
-            
-            # Agregar índice global a cada oferta
-            start_idx = len(self.job_metadata)
-            for i, job in enumerate(metadata):
-                job['_global_index'] = start_idx + i
-                job['_source_file'] = filename
-            
-            self.job_metadata.extend(metadata)
-            all_embeddings.append(embeddings)
+            tables.append(table)
+            self._embedding_blocks.append(embeddings)
+            self._source_counts[filename] = len(table)
         
-        # Combinar todos los embeddings en un solo array
-        self.all_embeddings = np.vstack(all_embeddings).astype('float32')
-        self.embedding_dim = self.all_embeddings.shape[1]
+        self.job_metadata = StoreMetadata(tables)
+    
+    def _load_chunks(self):
+        # Ventanas extra de cada fuente (mmap); las fuentes sin chunks (.pkl o
+        # stores generados sin --chunked) no aportan ninguna
+        blocks, offsets, total = [], [np.zeros(1, dtype='int64')], 0
+        for table in self.job_metadata.stores:
+            table_offsets = getattr(table, 'chunk_offsets', None)
+            if table_offsets is None:
+                block = np.zeros((0, self.embedding_dim), dtype='float32')
+                table_offsets = np.zeros(len(table) + 1, dtype='int64')
+            else:
+                block = table.chunk_embeddings
+                if not table.normalized:
+                    import faiss
+                    block = np.array(block, dtype='float32')
+                    faiss.normalize_L2(block)
+            blocks.append(block)
+            offsets.append(np.asarray(table_offsets[1:], dtype='int64') + total)
+            total += len(block)
+        self._chunk_blocks = blocks
+        self._chunk_offsets = np.concatenate(offsets)
+        print(f"  Chunks: {total} ventanas extra de {int((np.diff(self._chunk_offsets) > 0).sum())} ofertas largas")
+    
+    def _load_lexical(self):
+        # Indice BM25 de cada fuente (el que guarda process_embeddings si sigue
+        # vigente, o construido ahora) combinados en uno solo
+        parts = []
+        for table in self.job_metadata.stores:
+            header = getattr(table, 'header', None)
+            part = LexicalIndex.load(table.path, header.get('digest')) if header is not None else None
+            if part is None:
+                print(f"  Indexando {table.name} para BM25 (sin índice guardado)...")
+                part = LexicalIndex.from_texts(lexical_texts(table))
+            parts.append(part)
+        self.lexical_index = LexicalIndex.merge(parts) if parts else LexicalIndex.from_texts([])
+        stats = self.lexical_index.statistics()
+        print(f"  BM25: {stats['terms']} términos, {stats['postings']} postings")
+    
+    def _keep_shard_rows(self):
+        # Particion por rango de hash: quedan solo las ofertas cuyo offer_id cae en
+        # el tramo de este shard. La metadata son vistas sobre las mismas tablas;
+        # los embeddings del shard se copian a memoria.
+        shard, n_shards = self.shard
+        offer_ids = self.job_metadata.offer_ids()
+        keep = offer_shard(offer_ids, n_shards) == shard
+        tables, blocks, start = [], [], 0
+        for table, block in zip(self.job_metadata.stores, self._embedding_blocks):
+            rows = np.flatnonzero(keep[start:start + len(table)])
+            tables.append(table.subset(rows))
+            blocks.append(np.ascontiguousarray(block[rows], dtype='float32'))
+            self._source_counts[table.name] = len(rows)
+            start += len(table)
         
-        print(f"OK - Cargadas {len(self.job_metadata)} ofertas")
-        print(f"  Dimensión de embeddings: {self.embedding_dim}")
+        # Indice global (sin particionar) de cada fila del shard
+        self.global_rows = np.flatnonzero(keep)
+        self.job_metadata = StoreMetadata(tables)
+        self._embedding_blocks = blocks
+        self._offer_ids = offer_ids[keep]
+        self._offer_order = np.argsort(self._offer_ids, kind='stable')
+        if self._chunk_offsets is not None:
+            ids, self._chunk_offsets = select_rows(self._chunk_offsets, self.global_rows)
+            self._chunk_blocks = [gather_rows(self._chunk_blocks, ids)]
+        if self.lexical_index is not None:
+            self.lexical_index = self.lexical_index.subset(self.global_rows)
+        print(f"  Shard {shard + 1}/{n_shards}: {len(self.global_rows)} ofertas")
     
-    def _build_index(self):
-        # Construye el indice FAISS para busqueda rapida (IndexFlatIP)
-        # Normalizar embeddings para usar producto interno como similitud coseno
-        faiss.normalize_L2(self.all_embeddings)
+    def get_embeddings(self, indices) -> np.ndarray:
+        # Embeddings normalizados de las ofertas indicadas (por indice global)
+        return gather_rows(self._embedding_blocks, np.atleast_1d(indices))
+    
+    def _load_or_build_index(self):
+        # Usa el indice guardado si el manifest coincide; si no, lo reconstruye
+        index_path, manifest_path = index_paths(self.index_dir, self.index_type)
+        previous = read_manifest(manifest_path) if self.use_saved_index else None
         
-        # Crear índice (Inner Product = cosine similarity cuando vectores normalizados)
-        self.index = faiss.IndexFlatIP(self.embedding_dim)
+        previous_sources = {s['name']: s for s in (previous or {}).get('sources', [])}
+        self.source_fingerprints = [
+            source_fingerprint(kind, path, previous_sources.get(os.path.basename(os.path.normpath(path))))
+            for kind, path in self._sources
+        ]
+        for fingerprint in self.source_fingerprints:
+            fingerprint.setdefault('count', self._source_counts[fingerprint['name']])
         
-        # Agregar vectores al índice
-        self.index.add(self.all_embeddings)
+        if (os.path.exists(index_path) and manifest_matches(
+                previous, self.source_fingerprints, self.embedding_dim, self.index_type, self.index_params)):
+            self.index = load_index(index_path, mmap=self.mmap_index)
+            self._index_readonly = self.mmap_index
+            self.recall_vs_flat = previous.get('recall_vs_flat')
+            print(f"OK - Indice FAISS cargado desde {index_path} ({self.index.ntotal} ofertas)")
+            return
+        
+        # En un shard por hash las filas agregadas a una fuente no quedan al final
+        if self.shard is None and os.path.exists(index_path) and self._extend_saved_index(previous, index_path):
+            return
+        
+        self._build_index()
+        print(f"OK - Indice FAISS creado con {len(self.job_metadata)} ofertas")
+        if self.use_saved_index:
+            self.save_index()
     
-    def search(self, query_embedding: np.ndarray, k: int = 10) -> List[Dict]:
-        # Busca las k ofertas mas similares al embedding de consulta
-        if self.index is None:
-            raise RuntimeError("Índice no inicializado. Llama a _build_index() primero.")
+    def _extend_saved_index(self, previous: Optional[Dict], index_path: str) -> bool:
+        # Si solo se agregaron ofertas al final, agrega esas filas al indice guardado
+        store_segments = {
+            os.path.basename(os.path.normpath(path)): read_header(path).get('segments', [])
+            for kind, path in self._sources if kind == 'store'
+        }
+        indexed = appended_from(previous, self.source_fingerprints, self.embedding_dim,
+                                self.index_type, self.index_params, store_segments)
+        if indexed is None:
+            return False
+        
+        self.index = load_index(index_path, mmap=False)
+        if self.index.ntotal != indexed:
+            return False
+        
+        start = 0
+        for block in self._embedding_blocks:
+            end = start + len(block)
+            if end > indexed:
+                first = max(start, indexed)
+                self.index.add_with_ids(np.ascontiguousarray(block[first - start:]),
+                                        np.arange(first, end, dtype='int64'))
+            start = end
+        
+        self.recall_vs_flat = previous.get('recall_vs_flat')
+        print(f"OK - Indice FAISS actualizado: {indexed} -> {self.index.ntotal} ofertas")
+        self.save_index()
+        return True
+    
+    def _load_or_build_chunk_index(self):
+        # Indice de las ventanas extra (ids = posicion global del chunk), guardado
+        # junto al principal con su propio manifest
+        n_chunks = int(self._chunk_offsets[-1])
+        if not n_chunks:
+            return
+        params = resolve_params(self.chunk_index_type)
+        index_path, manifest_path = index_paths(self.index_dir, f"{CHUNK_INDEX_NAME}_{self.chunk_index_type}")
+        previous = read_manifest(manifest_path) if self.use_saved_index else None
+        if (os.path.exists(index_path) and previous and previous.get('total') == n_chunks and manifest_matches(
+                previous, self.source_fingerprints, self.embedding_dim, self.chunk_index_type, params)):
+            self.chunk_index = load_index(index_path, mmap=self.mmap_index)
+            print(f"OK - Indice de chunks cargado desde {index_path} ({n_chunks} ventanas)")
+            return
         
-        # Asegurar que el query es float32 y 2D
+        self.chunk_index = build_index(self._chunk_blocks, self.embedding_dim, self.chunk_index_type, params)
+        print(f"OK - Indice de chunks creado con {n_chunks} ventanas ({self.chunk_index_type})")
+        if self.use_saved_index:
+            manifest = build_manifest(self.source_fingerprints, self.embedding_dim, self.chunk_index_type, params)
+            manifest['total'] = n_chunks
+            try:
+                save_index(self.chunk_index, index_path, manifest_path, manifest)
+            except OSError as e:
+                print(f"X - No se pudo guardar el indice de chunks en {index_path}: {e}")
+    
+    def _load_or_build_similar_graph(self):
+        # Grafo de similares guardado junto al indice (mismo criterio de vigencia)
+        if self.use_saved_index:
+            self.similar_graph = SimilarGraph.load(self.index_dir, self.source_fingerprints, self.embedding_dim,
+                                                   len(self.job_metadata), self.similar_neighbors)
+            if self.similar_graph is not None:
+                print(f"OK - Grafo de similares cargado ({self.similar_graph.neighbors} vecinos por oferta)")
+                return
+        if self.similar_neighbors > 0:
+            self.build_similar_graph(self.similar_neighbors)
+            if self.use_saved_index:
+                self.save_similar_graph()
+    
+    def build_similar_graph(self, neighbors: int, batch_size: Optional[int] = None):
+        # Calcula los vecinos de todas las ofertas con auto-busquedas en lote sobre el indice
+        if self._offer_ids is None:
+            self._offer_ids = self.job_metadata.offer_ids()
+            self._offer_order = np.argsort(self._offer_ids, kind='stable')
+        kwargs = {'batch_size': batch_size} if batch_size else {}
+        self.similar_graph = SimilarGraph.build(self.index, self._embedding_blocks, self._offer_ids, neighbors,
+                                                rescore=self.index_params.get('rescore', 0), **kwargs)
+    
+    def save_similar_graph(self):
+        if self.similar_graph is None:
+            return
+        try:
+            self.similar_graph.save(self.index_dir, self.source_fingerprints, self.embedding_dim,
+                                    built_with=self.index_type)
+            print(f"OK - Grafo de similares guardado en {self.index_dir}")
+        except OSError as e:
+            print(f"X - No se pudo guardar el grafo de similares en {self.index_dir}: {e}")
+    
+    def save_index(self):
+        # Guarda el indice y su manifest en index_dir
+        index_path, manifest_path = index_paths(self.index_dir, self.index_type)
+        manifest = build_manifest(self.source_fingerprints, self.embedding_dim, self.index_type,
+                                  self.index_params, self.recall_vs_flat)
+        try:
+            save_index(self.index, index_path, manifest_path, manifest)
+            print(f"OK - Indice guardado en {index_path}")
+        except OSError as e:
+            print(f"X - No se pudo guardar el indice en {index_path}: {e}")
+    
+    def _build_index(self):
+        # Construye el indice FAISS del tipo configurado (IndexFlatIP por defecto)
+        # Los bloques ya estan normalizados, asi que producto interno = similitud coseno
+        self.index = build_index(self._embedding_blocks, self.embedding_dim,
+                                 self.index_type, self.index_params)
+        
+        # Para indices aproximados medir recall@10 frente a la busqueda exacta
+        if self.index_type == 'flat':
+            self.recall_vs_flat = 1.0
+        else:
+            self.recall_vs_flat = recall_vs_flat(self.index, self._embedding_blocks, k=10,
+                                                 rescore=self.index_params.get('rescore', 0))
+            print(f"  Recall@10 vs flat ({self.index_type}): {self.recall_vs_flat:.4f}")
+    
+    def evaluate_recall(self, k: int = 10, n_queries: int = 200, nprobe: Optional[int] = None,
+                        ef_search: Optional[int] = None) -> float:
+        # Mide recall@k frente a flat con otros nprobe/efSearch (para elegir el trade-off)
+        return recall_vs_flat(self.index, self._embedding_blocks, k=k, n_queries=n_queries,
+                              nprobe=nprobe, ef_search=ef_search, rescore=self.index_params.get('rescore', 0))
+    
+    @property
+    def metadata_filter(self) -> MetadataFilter:
+        # Bitsets de filtrado (se construyen con la primera busqueda filtrada)
+        if self._filter is None:
+            with self._filter_lock:
+                if self._filter is None:
+                    self._filter = MetadataFilter(self.job_metadata)
+        return self._filter
+    
+    def filter_values(self, field: str) -> List[str]:
+        # Valores disponibles para filtrar por 'category', 'source' o '_source_file'
+        return self.metadata_filter.values(field)
+    
+    def search(self, query_embedding: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None, fields: Optional[List[str]] = None,
+               filters: Optional[Dict] = None, aggregation: Optional[str] = None) -> List[Dict]:
+        # Busca las k ofertas mas similares al embedding de consulta
+        # nprobe (IVF) y ef_search (HNSW) ajustan precision/latencia solo para esta consulta
+        # Una matriz m x d se toma como las ventanas de una misma consulta (perfil largo)
         query = np.array(query_embedding, dtype='float32')
         if query.ndim == 1:
             query = query.reshape(1, -1)
+        return self.search_batch(query, k=k, nprobe=nprobe, ef_search=ef_search, fields=fields,
+                                 filters=filters, query_offsets=[0, len(query)], aggregation=aggregation)[0]
+    
+    def search_batch(self, query_embeddings: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+                     ef_search: Optional[int] = None, fields: Optional[List[str]] = None,
+                     filters: Optional[Dict] = None, query_offsets: Optional[List[int]] = None,
+                     aggregation: Optional[str] = None) -> List[List[Dict]]:
+        # Busca las k ofertas mas similares para cada fila de una matriz n x d
+        # (una sola llamada a FAISS para todas las consultas)
+        # fields: campos de metadata a incluir en cada resultado (None = todos)
+        # filters: ver metadata_filters (category, source, _source_file, scraped_at)
+        # query_offsets: agrupa filas en consultas de varias ventanas; la consulta g
+        # son las filas query_offsets[g]:query_offsets[g + 1] (por defecto una por fila)
+        # aggregation: 'max' o 'mean_top' para combinar las similitudes de las
+        # ventanas de cada oferta (por defecto chunk_aggregation)
+        if self.index is None:
+            raise RuntimeError("Índice no inicializado. Llama a _build_index() primero.")
+        import faiss
+        
+        # Asegurar que las consultas son float32 y 2D
+        queries = np.array(query_embeddings, dtype='float32')
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
         
         # Normalizar para similitud coseno
-        faiss.normalize_L2(query)
+        faiss.normalize_L2(queries)
+        
+        if query_offsets is None:
+            query_offsets = np.arange(len(queries) + 1)
+        query_offsets = np.asarray(query_offsets, dtype='int64')
+        grouped = len(query_offsets) - 1 != len(queries)
+        
+        with self._lock.reading():
+            # Limitar k al número de ofertas disponibles
+            k = min(k, self.total_jobs)
+            if k == 0:
+                return [[] for _ in range(len(query_offsets) - 1)]
+            
+            # Buscar en el índice (los indices cuantizados reordenan sus candidatos
+            # con los vectores exactos, leidos del store mmap). Las ofertas quitadas
+            # que siguen en el indice se excluyen como un filtro mas
+            if self._chunk_offsets is not None or grouped:
+                scores, indices = self._chunked_search(queries, query_offsets, k, nprobe, ef_search, filters,
+                                                       aggregation or self.chunk_aggregation)
+            elif filters or len(self._tombstones):
+                scores, indices = self._filtered_search(queries, k, nprobe, ef_search, filters)
+            else:
+                params = search_parameters(self.index, nprobe, ef_search)
+                scores, indices = search_with_rescore(self.index, queries, k, self._embedding_blocks,
+                                                      self.index_params.get('rescore', 0), params=params)
+            
+            # Construir resultados (los indices aproximados devuelven -1 si no llenan k)
+            all_results = []
+            for row_scores, row_indices in zip(scores, indices):
+                results = []
+                for score, idx in zip(row_scores, row_indices):
+                    if idx < 0:
+                        continue
+                    job = self.job_metadata.get_record(idx, fields)
+                    job['similarity_score'] = float(score)
+                    results.append(job)
+                all_results.append(results)
+        
+        return all_results
+    
+    def _chunked_search(self, queries: np.ndarray, query_offsets: np.ndarray, k: int, nprobe: Optional[int],
+                        ef_search: Optional[int], filters: Optional[Dict], aggregation: str):
+        # Consultas de varias ventanas y/o ofertas con ventanas extra: cada ventana
+        # de la consulta propone candidatos (en el indice de ofertas, con filtros, y
+        # en el de chunks) y el score de cada candidata agrega las similitudes
+        # exactas de todos los pares (ventana de consulta, ventana de la oferta)
+        n_candidates = min(self.total_jobs, k * CHUNK_CANDIDATES)
+        bitmap = None
+        if filters or self._removed_count:
+            bitmap, _ = self._allowed(filters)
+        if filters or len(self._tombstones):
+            _, candidates = self._filtered_search(queries, n_candidates, nprobe, ef_search, filters)
+        else:
+            params = search_parameters(self.index, nprobe, ef_search)
+            _, candidates = search_with_rescore(self.index, queries, n_candidates, self._embedding_blocks,
+                                                self.index_params.get('rescore', 0), params=params)
+        
+        if self.chunk_index is not None:
+            # Una oferta larga puede aportar varias ventanas: se piden el doble de candidatos
+            params = search_parameters(self.chunk_index, nprobe, ef_search)
+            _, chunk_ids = self.chunk_index.search(queries, min(self.chunk_index.ntotal, 2 * n_candidates),
+                                                   params=params)
+            parents = np.searchsorted(self._chunk_offsets, chunk_ids, side='right') - 1
+            candidates = np.hstack([candidates, np.where(chunk_ids >= 0, parents, -1)])
         
-        # Limitar k al número de ofertas disponibles
-        k = min(k, len(self.job_metadata))
+        n_queries = len(query_offsets) - 1
+        scores = np.full((n_queries, k), -np.inf, dtype='float32')
+        indices = np.full((n_queries, k), -1, dtype='int64')
+        for q in range(n_queries):
+            rows = queries[query_offsets[q]:query_offsets[q + 1]]
+            offers = np.unique(candidates[query_offsets[q]:query_offsets[q + 1]])
+            offers = offers[offers >= 0]
+            if bitmap is not None:
+                offers = offers[((bitmap[offers >> 3] >> (offers & 7)) & 1).astype(bool)]
+            offer_scores = self._aggregate_scores(rows, offers, aggregation)
+            top = np.argsort(-offer_scores, kind='stable')[:k]
+            scores[q, :len(top)] = offer_scores[top]
+            indices[q, :len(top)] = offers[top]
+        return scores, indices
+    
+    def _aggregate_scores(self, rows: np.ndarray, offers: np.ndarray, aggregation: str) -> np.ndarray:
+        # Score de cada oferta: similitudes de las ventanas de la consulta con el
+        # embedding de la oferta y con sus ventanas extra, agregadas por oferta
+        similarities = [(rows @ gather_rows(self._embedding_blocks, offers).T).ravel()]
+        owners = [np.tile(np.arange(len(offers)), len(rows))]
+        if self._chunk_offsets is not None:
+            chunk_ids, chunk_owner = expand_ranges(self._chunk_offsets, offers)
+            if len(chunk_ids):
+                similarities.append((rows @ gather_rows(self._chunk_blocks, chunk_ids).T).ravel())
+                owners.append(np.tile(chunk_owner, len(rows)))
+        return aggregate(np.concatenate(similarities), np.concatenate(owners), len(offers), aggregation)
+    
+    def search_lexical(self, query_text: str, k: int = 10, fields: Optional[List[str]] = None,
+                       filters: Optional[Dict] = None, query_embedding: Optional[np.ndarray] = None,
+                       aggregation: Optional[str] = None) -> List[Dict]:
+        # Busca las k ofertas con mayor score BM25 para un texto limpio (ver search_lexical_batch)
+        offsets = None
+        if query_embedding is not None:
+            query_embedding = np.array(query_embedding, dtype='float32')
+            if query_embedding.ndim == 1:
+                query_embedding = query_embedding.reshape(1, -1)
+            offsets = [0, len(query_embedding)]
+        return self.search_lexical_batch([query_text], k=k, fields=fields, filters=filters,
+                                         query_embeddings=query_embedding, query_offsets=offsets,
+                                         aggregation=aggregation)[0]
+    
+    def search_lexical_batch(self, query_texts: List[str], k: int = 10, fields: Optional[List[str]] = None,
+                             filters: Optional[Dict] = None, query_embeddings: Optional[np.ndarray] = None,
+                             query_offsets: Optional[List[int]] = None,
+                             aggregation: Optional[str] = None) -> List[List[Dict]]:
+        # Top-k por BM25 de cada texto (limpio como cleaned_text), con 'bm25_score'.
+        # Con query_embeddings (filas agrupadas por query_offsets, como en
+        # search_batch) cada resultado trae ademas su 'similarity_score' exacto,
+        # para fusionar con la busqueda densa ofertas que FAISS no devolvio
+        if self.lexical_index is None:
+            raise RuntimeError("Índice BM25 no cargado. Usa JobSearcher(lexical=True).")
+        queries = None
+        if query_embeddings is not None:
+            import faiss
+            queries = np.array(query_embeddings, dtype='float32')
+            if queries.ndim == 1:
+                queries = queries.reshape(1, -1)
+            faiss.normalize_L2(queries)
+            if query_offsets is None:
+                query_offsets = np.arange(len(queries) + 1)
         
-        # Buscar en el índice
-        scores, indices = self.index.search(query, k)
+        with self._lock.reading():
+            allowed = None
+            if filters or self._removed_count:
+                bitmap, _ = self._allowed(filters)
+                allowed = np.unpackbits(bitmap, count=len(self.job_metadata), bitorder='little').astype(bool)
+            
+            all_results = []
+            for q, text in enumerate(query_texts):
+                scores, indices = self.lexical_index.search(text, k, allowed)
+                similarities = None
+                if queries is not None:
+                    rows = queries[query_offsets[q]:query_offsets[q + 1]]
+                    similarities = self._aggregate_scores(rows, indices, aggregation or self.chunk_aggregation)
+                results = []
+                for i, (score, idx) in enumerate(zip(scores, indices)):
+                    job = self.job_metadata.get_record(idx, fields)
+                    job['bm25_score'] = float(score)
+                    if similarities is not None:
+                        job['similarity_score'] = float(similarities[i])
+                    results.append(job)
+                all_results.append(results)
+        return all_results
+    
+    def _allowed(self, filters: Optional[Dict]) -> Tuple[np.ndarray, int]:
+        # Bitmap de ofertas que puede devolver una busqueda: las que pasan los
+        # filtros y no fueron quitadas
+        if filters:
+            bitmap, selected = self.metadata_filter.select(filters)
+            if not self._removed_count:
+                return bitmap, selected
+            bitmap = bitmap & self._live_bitmap()
+            return bitmap, int(np.unpackbits(bitmap, bitorder='little').sum())
+        return self._live_bitmap(), self.total_jobs
+    
+    def _live_bitmap(self) -> np.ndarray:
+        if self._live_bits is None:
+            live = np.ones(len(self.job_metadata), dtype=bool)
+            if self._removed is not None:
+                live &= ~self._removed
+            self._live_bits = np.packbits(live, bitorder='little')
+        return self._live_bits
+    
+    def _filtered_search(self, queries: np.ndarray, k: int, nprobe: Optional[int],
+                         ef_search: Optional[int], filters: Optional[Dict]):
+        # El filtro se aplica dentro de la busqueda (no se descartan resultados despues)
+        import faiss
+        bitmap, selected = self._allowed(filters)
+        n = len(self.job_metadata)
+        if selected == 0:
+            return (np.zeros((len(queries), 0), dtype='float32'),
+                    np.zeros((len(queries), 0), dtype='int64'))
+        k = min(k, selected)
         
-        # Construir resultados
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            job = self.job_metadata[idx].copy()
-            job['similarity_score'] = float(score)
-            results.append(job)
+        if selected <= EXACT_FILTER_ROWS:
+            # Filtro selectivo: recorrer solo las ofertas seleccionadas es exacto y barato
+            ids = np.flatnonzero(np.unpackbits(bitmap, count=n, bitorder='little'))
+            return exact_search_subset(queries, self._embedding_blocks, ids, k)
         
-        return results
+        selector = faiss.IDSelectorBitmap(n, faiss.swig_ptr(bitmap))
+        params = search_parameters(self.index, nprobe, ef_search, selector=selector)
+        scores, indices = search_with_rescore(self.index, queries, k, self._embedding_blocks,
+                                              self.index_params.get('rescore', 0), params=params)
+        
+        # Los indices de grafo/IVF pueden no llenar k con filtros: esas consultas se
+        # completan con la busqueda exacta sobre el subconjunto
+        short = np.flatnonzero((indices >= 0).sum(axis=1) < k)
+        if len(short):
+            ids = np.flatnonzero(np.unpackbits(bitmap, count=n, bitorder='little'))
+            scores[short], indices[short] = exact_search_subset(queries[short], self._embedding_blocks, ids, k)
+        return scores, indices
+    
+    def similar_to(self, offer_id: int, k: int = 10, fields: Optional[List[str]] = None) -> List[Dict]:
+        # Las k ofertas mas parecidas a una oferta (sin incluirla), con 'similarity_score'.
+        # Con el grafo de similares solo se lee su fila; sin el (o para una oferta
+        # agregada en ejecucion, o si quedan menos de k vecinos vigentes) se busca
+        # con su embedding
+        with self._lock.reading():
+            indices = self._indices_for_offers([offer_id])
+            if not len(indices):
+                raise KeyError(f"No existe la oferta {offer_id}")
+            row = int(indices[0])
+            graph = self.similar_graph
+            if graph is not None and row < len(graph):
+                neighbors, scores = graph.neighbors_of(row)
+                if self._removed is not None:
+                    live = ~self._removed[neighbors]
+                    neighbors, scores = neighbors[live], scores[live]
+            else:
+                neighbors = []
+            if len(neighbors) >= k:
+                results = []
+                for idx, score in zip(neighbors[:k], scores[:k]):
+                    job = self.job_metadata.get_record(idx, fields)
+                    job['similarity_score'] = float(score)
+                    results.append(job)
+                return results
+            embedding = self.get_embeddings(row)
+        
+        # Se piden algunos de mas para descartar la propia oferta (y sus copias en otras fuentes)
+        extra = 1 + len(indices)
+        results = self.search(embedding, k=k + extra, fields=fields)
+        return [job for job in results if job['_offer_id'] != offer_id][:k]
     
-    def get_job_by_index(self, index: int) -> Dict:
-        # Obtiene una oferta por su indice global
+    def get_job_by_index(self, index: int, fields: Optional[List[str]] = None) -> Dict:
+        # Obtiene una oferta por su indice global (solo lee los campos pedidos)
         if 0 <= index < len(self.job_metadata):
-            return self.job_metadata[index]
+            return self.job_metadata.get_record(index, fields)
         raise IndexError(f"Índice {index} fuera de rango (0-{len(self.job_metadata)-1})")
     
+    def get_job_by_offer_id(self, offer_id: int, fields: Optional[List[str]] = None) -> Dict:
+        # Obtiene una oferta por su id estable (el indice global puede cambiar entre cargas)
+        with self._lock.reading():
+            indices = self._indices_for_offers([offer_id])
+            if not len(indices):
+                raise KeyError(f"No existe la oferta {offer_id}")
+            return self.job_metadata.get_record(indices[0], fields)
+    
+    def get_embedding_by_offer_id(self, offer_id: int) -> np.ndarray:
+        # Embedding normalizado de una oferta por su id estable
+        with self._lock.reading():
+            indices = self._indices_for_offers([offer_id])
+            if not len(indices):
+                raise KeyError(f"No existe la oferta {offer_id}")
+            return self.get_embeddings(indices[0])[0]
+    
+    @property
+    def total_jobs(self) -> int:
+        # Ofertas que pueden aparecer en resultados (sin las quitadas)
+        return len(self.job_metadata) - self._removed_count
+    
+    def _indices_for_offers(self, offer_ids) -> np.ndarray:
+        # Indices globales (vigentes) de las ofertas con esos ids estables
+        if self._offer_ids is None:
+            self._offer_ids = self.job_metadata.offer_ids()
+            self._offer_order = np.argsort(self._offer_ids, kind='stable')
+        wanted = np.asarray(list(offer_ids), dtype='int64')
+        sorted_ids = self._offer_ids[self._offer_order]
+        left = np.searchsorted(sorted_ids, wanted, side='left')
+        right = np.searchsorted(sorted_ids, wanted, side='right')
+        # Una misma oferta puede estar en mas de una fuente
+        indices = np.concatenate([self._offer_order[l:r] for l, r in zip(left, right)] or
+                                 [np.zeros(0, dtype='int64')])
+        if self._removed is not None:
+            indices = indices[~self._removed[indices]]
+        return np.sort(indices)
+    
+    def add_offers(self, records: List[Dict], embeddings: np.ndarray) -> List[int]:
+        # Agrega ofertas al indice en ejecucion (sin reconstruirlo) y devuelve sus
+        # ids estables. Una oferta que ya existe (mismo titulo y descripcion) se
+        # reemplaza. Solo afecta a esta generacion: para que persistan hay que
+        # pasarlas por process_embeddings.
+        import faiss
+        vectors = np.array(embeddings, dtype='float32')
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        if len(vectors) != len(records):
+            raise ValueError(f"Se recibieron {len(records)} ofertas y {len(vectors)} embeddings")
+        if vectors.shape[1] != self.embedding_dim:
+            raise ValueError(f"Los embeddings deben tener dimensión {self.embedding_dim}")
+        faiss.normalize_L2(vectors)
+        ids = [offer_id(r.get('title'), r.get('description')) for r in records]
+        
+        with self._lock.writing():
+            self._make_mutable()
+            self._remove_indices(self._indices_for_offers(ids))
+            
+            start = len(self.job_metadata)
+            self.index.add_with_ids(vectors, np.arange(start, start + len(vectors), dtype='int64'))
+            if self.lexical_index is not None:
+                self.lexical_index = self.lexical_index.extend([r.get('cleaned_text') or '' for r in records])
+            
+            # Las altas se acumulan en una sola tabla (y bloque) al final, de modo que
+            # los indices globales existentes no cambian
+            stores = list(self.job_metadata.stores)
+            blocks = list(self._embedding_blocks)
+            if stores and stores[-1].name == RUNTIME_SOURCE:
+                previous = stores.pop()
+                records = [previous.get_record(i) for i in range(len(previous))] + list(records)
+                vectors = np.vstack([blocks.pop(), vectors])
+            stores.append(ColumnTable.from_records(RUNTIME_SOURCE, records))
+            blocks.append(vectors)
+            self.job_metadata = StoreMetadata(stores)
+            self._embedding_blocks = blocks
+            self._source_counts[RUNTIME_SOURCE] = len(records)
+            
+            if self._removed is not None:
+                self._removed = np.concatenate([self._removed, np.zeros(len(ids), dtype=bool)])
+            if self._offer_ids is not None:
+                self._offer_ids = np.concatenate([self._offer_ids, np.asarray(ids, dtype='int64')])
+                self._offer_order = np.argsort(self._offer_ids, kind='stable')
+            if self._chunk_offsets is not None:
+                # Las ofertas agregadas en ejecucion no tienen ventanas extra
+                self._chunk_offsets = np.concatenate([self._chunk_offsets,
+                                                      np.full(len(ids), self._chunk_offsets[-1], dtype='int64')])
+            self._live_bits = None
+            self._filter = None
+            self.revision += 1
+        return ids
+    
+    def remove_offers(self, offer_ids: List[int]) -> int:
+        # Quita ofertas por id estable; devuelve cuantas filas se quitaron. Quedan
+        # marcadas y se excluyen de inmediato; el indice se compacta al superar COMPACT_RATIO
+        with self._lock.writing():
+            indices = self._indices_for_offers(offer_ids)
+            self._remove_indices(indices)
+            if len(self._tombstones) > COMPACT_RATIO * max(1, self.index.ntotal):
+                self._compact()
+            if len(indices):
+                self.revision += 1
+        return len(indices)
+    
+    def compact(self) -> int:
+        # Quita del indice FAISS las ofertas marcadas; devuelve cuantas se quitaron
+        with self._lock.writing():
+            return self._compact()
+    
+    def _remove_indices(self, indices: np.ndarray):
+        if not len(indices):
+            return
+        if self._removed is None:
+            self._removed = np.zeros(len(self.job_metadata), dtype=bool)
+        self._removed[indices] = True
+        self._removed_count = int(self._removed.sum())
+        self._tombstones = np.union1d(self._tombstones, indices)
+        self._live_bits = None
+    
+    def _compact(self) -> int:
+        count = len(self._tombstones)
+        if not count:
+            return 0
+        self._make_mutable()
+        try:
+            self.index.remove_ids(np.ascontiguousarray(self._tombstones, dtype='int64'))
+        except RuntimeError:
+            # HNSW no permite quitar vectores: se reconstruye con las ofertas vigentes
+            live = np.flatnonzero(~self._removed)
+            self.index = build_index([gather_rows(self._embedding_blocks, live)], self.embedding_dim,
+                                     self.index_type, self.index_params, ids=live)
+        self._tombstones = np.zeros(0, dtype='int64')
+        print(f"OK - Indice compactado: {count} ofertas quitadas ({self.index.ntotal} vigentes)")
+        return count
+    
+    def _make_mutable(self):
+        # Un indice abierto con mmap es de solo lectura: se relee a memoria antes
+        # de modificarlo (o se reconstruye si el archivo ya no corresponde)
+        if not self._index_readonly:
+            return
+        index_path, _ = index_paths(self.index_dir, self.index_type)
+        try:
+            index = load_index(index_path, mmap=False)
+        except RuntimeError:
+            index = None
+        if index is None or index.ntotal != self.index.ntotal:
+            index = build_index(self._embedding_blocks, self.embedding_dim, self.index_type, self.index_params)
+        self.index = index
+        self._index_readonly = False
+    
     def get_statistics(self) -> Dict:
         # Retorna estadisticas del dataset indexado
-        sources = {}
-        for job in self.job_metadata:
-            source_file = job.get('_source_file', 'unknown')
-            sources[source_file] = sources.get(source_file, 0) + 1
-        
         return {
-            'total_jobs': len(self.job_metadata),
+            'total_jobs': self.total_jobs,
+            'removed_jobs': self._removed_count,
+            'pending_tombstones': len(self._tombstones),
             'embedding_dimension': self.embedding_dim,
-            'sources': sources,
-            'index_type': type(self.index).__name__
+            'sources': dict(self._source_counts),
+            'metadata_bytes': self.job_metadata.nbytes(),
+            'index_type': type(base_index(self.index)).__name__ if self.index is not None else None,
+            'index_kind': self.index_type,
+            'index_settings': index_settings(self.index) if self.index is not None else {},
+            'recall_vs_flat': self.recall_vs_flat,
+            'chunks': {
+                'extra_windows': int(self._chunk_offsets[-1]),
+                'chunked_offers': int((np.diff(self._chunk_offsets) > 0).sum()),
+                'aggregation': self.chunk_aggregation,
+                'index_type': self.chunk_index_type if self.chunk_index is not None else None,
+            } if self._chunk_offsets is not None else None,
+            'lexical': self.lexical_index.statistics() if self.lexical_index is not None else None,
+            'similar_graph': self.similar_graph.statistics() if self.similar_graph is not None else None,
+            'startup_seconds': dict(self.startup_seconds)
         }
 
 
@@ -155,7 +988,7 @@ if __name__ == "__main__":
     print("Generando embedding de prueba...")
     
     # Usar un embedding real del dataset para probar
-    test_embedding = searcher.all_embeddings[0]
+    test_embedding = searcher.get_embeddings(0)[0]
     results = searcher.search(test_embedding, k=5)
     
     print(f"\nTop 5 resultados más similares:")
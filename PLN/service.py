@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import datetime
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from recommender import RecommendationEngine
+from metadata_filters import filter_key
+
+
+# Servicio HTTP asincrono (solo libreria estandar) sobre RecommendationEngine:
+#   POST /recommend  {"perfil": "...", "k": 10, "nprobe": null, "ef_search": null,
+#                     "filters": {"category": ["programador"], "scraped_at": ["2025-12-01", null]}}
+#   POST /offers         {"ofertas": [{"title": ..., "description": ..., "category": ...}]}
+#   POST /offers/remove  {"offer_ids": [...]}
+#   GET  /stats
+#   GET  /health
+# Las peticiones concurrentes se agrupan unos milisegundos (micro-batching) y se
+# resuelven con un solo encode en lote + una sola busqueda FAISS.
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def _json_value(value):
+    # Columnas de fechas del store (datetime) como texto ISO en las respuestas
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no es serializable a JSON")
+
+
+def _positive_int(value) -> bool:
+    # En JSON true/false llegan como bool, que en Python es subclase de int
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+class MicroBatcher:
+    # Agrupa peticiones concurrentes y las ejecuta con recomendar_batch en un hilo
+    # aparte, para que el encoder no bloquee el event loop
+
+    def __init__(self, engine: RecommendationEngine, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        # Un solo hilo: mientras corre un lote, las nuevas peticiones forman el siguiente
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encoder")
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.requests = 0
+        self.batches = 0
+        self.max_seen_batch = 0
+        self.total_queue_wait = 0.0
+        self.total_batch_time = 0.0
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, perfil: str, k: int, nprobe: Optional[int] = None,
+                     ef_search: Optional[int] = None, filters: Optional[Dict] = None) -> List[Dict]:
+        # Encola una peticion y espera su resultado
+        future = asyncio.get_running_loop().create_future()
+        group = (nprobe, ef_search, filter_key(filters))
+        await self.queue.put((perfil, k, group, time.perf_counter(), future, filters))
+        return await future
+
+    async def _collect(self) -> List[Tuple]:
+        # Espera la primera peticion y junta las que lleguen durante max_wait
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+
+            # Las peticiones con distintos nprobe/ef_search/filtros van en grupos separados
+            groups: Dict[Tuple, List[Tuple]] = {}
+            for item in batch:
+                groups.setdefault(item[2], []).append(item)
+
+            for (nprobe, ef_search, _), items in groups.items():
+                perfiles = [item[0] for item in items]
+                k_max = max(item[1] for item in items)
+                filters = items[0][5]
+                try:
+                    results = await loop.run_in_executor(
+                        self.executor,
+                        lambda: self.engine.recomendar_batch(perfiles, k=k_max, nprobe=nprobe, ef_search=ef_search,
+                                                             filters=filters)
+                    )
+                except Exception as e:
+                    for item in items:
+                        if not item[4].done():
+                            item[4].set_exception(e)
+                    continue
+                for item, ofertas in zip(items, results):
+                    if not item[4].done():
+                        item[4].set_result(ofertas[:item[1]])
+
+            finished = time.perf_counter()
+            self.requests += len(batch)
+            self.batches += 1
+            self.max_seen_batch = max(self.max_seen_batch, len(batch))
+            self.total_queue_wait += sum(started - item[3] for item in batch)
+            self.total_batch_time += finished - started
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'avg_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'max_batch_size_seen': self.max_seen_batch,
+            'avg_queue_wait_ms': 1000 * self.total_queue_wait / self.requests if self.requests else 0.0,
+            'avg_batch_time_ms': 1000 * self.total_batch_time / self.batches if self.batches else 0.0,
+            'pending': self.queue.qsize() if self.queue else 0,
+            'config': {'max_batch_size': self.max_batch_size, 'max_wait_ms': self.max_wait * 1000},
+        }
+
+
+class RecommendationService:
+    # Servidor HTTP/1.1 minimo (keep-alive, cuerpos JSON) sobre asyncio
+
+    def __init__(self, engine: RecommendationEngine, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.engine = engine
+        self.batcher = MicroBatcher(engine, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.started_at = time.time()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        # Devuelve (metodo, ruta, headers, cuerpo) o None si se cerro la conexion
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise ValueError("Línea de petición inválida")
+        method, path, _ = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Cuerpo demasiado grande")
+        body = await reader.readexactly(length) if length else b''
+        return method, path.split('?', 1)[0], headers, body
+
+    async def _write_response(self, writer: asyncio.StreamWriter, status: int, payload: Dict,
+                              keep_alive: bool):
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                   500: 'Internal Server Error'}
+        body = json.dumps(payload, ensure_ascii=False, default=_json_value).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def _recommend(self, body: bytes) -> Tuple[int, Dict]:
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            return 400, {'error': 'El cuerpo debe ser JSON'}
+        perfil = data.get('perfil')
+        k = data.get('k', 10)
+        if not isinstance(perfil, str) or not self.engine.processor.clean_text(perfil):
+            return 400, {'error': "'perfil' debe ser un texto con contenido"}
+        if not _positive_int(k):
+            return 400, {'error': "'k' debe ser un entero positivo"}
+        for name in ('nprobe', 'ef_search'):
+            if data.get(name) is not None and not _positive_int(data[name]):
+                return 400, {'error': f"'{name}' debe ser un entero positivo o null"}
+        filters = data.get('filters')
+        if filters is not None and not isinstance(filters, dict):
+            return 400, {'error': "'filters' debe ser un objeto"}
+        try:
+            filter_key(filters)
+        except (TypeError, ValueError) as e:
+            return 400, {'error': f"'filters' inválido: {e}"}
+
+        start = time.perf_counter()
+        ofertas = await self.batcher.submit(perfil, k, data.get('nprobe'), data.get('ef_search'), filters)
+        return 200, {'ofertas': ofertas, 'elapsed_ms': round(1000 * (time.perf_counter() - start), 3)}
+
+    async def _add_offers(self, body: bytes) -> Tuple[int, Dict]:
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            return 400, {'error': 'El cuerpo debe ser JSON'}
+        ofertas = data.get('ofertas')
+        if not isinstance(ofertas, list) or not ofertas or not all(isinstance(o, dict) for o in ofertas):
+            return 400, {'error': "'ofertas' debe ser una lista de objetos"}
+        loop = asyncio.get_running_loop()
+        try:
+            ids = await loop.run_in_executor(self.batcher.executor, self.engine.add_offers, ofertas)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        return 200, {'offer_ids': ids}
+
+    async def _remove_offers(self, body: bytes) -> Tuple[int, Dict]:
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            return 400, {'error': 'El cuerpo debe ser JSON'}
+        offer_ids = data.get('offer_ids')
+        if not isinstance(offer_ids, list) or not all(isinstance(i, int) and not isinstance(i, bool)
+                                                      for i in offer_ids):
+            return 400, {'error': "'offer_ids' debe ser una lista de enteros"}
+        loop = asyncio.get_running_loop()
+        removed = await loop.run_in_executor(self.batcher.executor, self.engine.remove_offers, offer_ids)
+        return 200, {'removed': removed}
+
+    async def _stats(self) -> Tuple[int, Dict]:
+        # Las estadisticas consultan todos los shards (y en modo proceso esperan IPC):
+        # fuera del event loop, en el executor por defecto para no hacer cola detras
+        # de los lotes del encoder
+        loop = asyncio.get_running_loop()
+        engine_stats = await loop.run_in_executor(None, self.engine.get_statistics)
+        return 200, {
+            'engine': engine_stats,
+            'batcher': self.batcher.stats(),
+            'uptime_s': round(time.time() - self.started_at, 1),
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    await self._write_response(writer, 400, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+                try:
+                    if path == '/recommend':
+                        if method != 'POST':
+                            status, payload = 405, {'error': 'Usa POST'}
+                        else:
+                            status, payload = await self._recommend(body)
+                    elif path in ('/offers', '/offers/remove'):
+                        if method != 'POST':
+                            status, payload = 405, {'error': 'Usa POST'}
+                        elif path == '/offers':
+                            status, payload = await self._add_offers(body)
+                        else:
+                            status, payload = await self._remove_offers(body)
+                    elif path == '/stats' and method == 'GET':
+                        status, payload = await self._stats()
+                    elif path == '/health' and method == 'GET':
+                        status, payload = 200, {'status': 'ok'}
+                    else:
+                        status, payload = 404, {'error': f"Ruta no encontrada: {path}"}
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+
+                await self._write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8000):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"OK - Servicio escuchando en http://{host}:{port} (/recommend, /stats)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio HTTP de recomendación con micro-batching")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--data-dir", type=str, default=None, help="Carpeta con los vectors_*")
+    parser.add_argument("--index-type", type=str, default="flat")
+    parser.add_argument("--max-batch", type=int, default=32, help="Máximo de peticiones por lote")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Espera máxima para formar un lote")
+    parser.add_argument("--shard-by", type=str, default=None, choices=("source", "hash"),
+                        help="Reparte la búsqueda en shards (uno por fuente o por tramo de offer_id)")
+    parser.add_argument("--shards", type=int, default=4, help="Número de shards con --shard-by hash")
+    parser.add_argument("--shard-mode", type=str, default="thread", choices=("thread", "process"))
+    parser.add_argument("--watch", type=float, default=0,
+                        help="Segundos entre revisiones de datos nuevos para recargar el índice (0 = no vigilar)")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Perfiles y ofertas largas por ventanas (stores generados con --chunked)")
+    parser.add_argument("--chunk-aggregation", type=str, default="max", choices=("max", "mean_top"))
+    parser.add_argument("--rerank", action="store_true",
+                        help="Reordena los candidatos de FAISS con un cross-encoder (config.RERANKER_MODEL)")
+    parser.add_argument("--rerank-top-n", type=int, default=50, help="Candidatos que reordena el cross-encoder")
+    parser.add_argument("--hybrid", type=str, default=None, choices=("rrf", "weighted"),
+                        help="Fusiona la búsqueda densa con BM25 sobre cleaned_text")
+    parser.add_argument("--hybrid-weight", type=float, default=0.5,
+                        help="Peso de la similitud densa con --hybrid weighted (BM25 = 1 - peso)")
+    args = parser.parse_args()
+
+    engine = RecommendationEngine(os.path.abspath(args.data_dir) if args.data_dir else None,
+                                  index_type=args.index_type, auto_reload=args.watch > 0,
+                                  reload_interval=args.watch or 30.0, shard_by=args.shard_by,
+                                  n_shards=args.shards, shard_mode=args.shard_mode, chunked=args.chunked,
+                                  chunk_aggregation=args.chunk_aggregation, rerank=args.rerank,
+                                  rerank_top_n=args.rerank_top_n, hybrid=args.hybrid,
+                                  hybrid_weight=args.hybrid_weight)
+    service = RecommendationService(engine, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nServicio detenido")
@@ -0,0 +1,397 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from searcher import JobSearcher, default_data_dir, RUNTIME_SOURCE
+from vector_store import discover_sources, offer_id, offer_shard
+from similar_graph import EXTRA_NEIGHBORS
+
+
+# Busqueda repartida en shards, cada uno un JobSearcher con su propio indice:
+#   shard_by='source' -> un shard por fuente vectors_<categoria>
+#   shard_by='hash'   -> n_shards tramos iguales del rango de offer_id (shards parejos)
+# Cada consulta se envia a todos los shards a la vez (hilos de este proceso, o un
+# proceso por shard con mode='process') y los top-k parciales, ya ordenados, se
+# combinan con un heap. Expone la misma interfaz de busqueda que JobSearcher.
+# Las altas en ejecucion (add_offers) van al shard dueno de su offer_id (hash) o
+# al shard con menos ofertas (source) y reciben los siguientes indices globales.
+SHARD_BY = ('source', 'hash')
+SHARD_MODES = ('thread', 'process')
+
+_worker_searcher = None
+
+
+def _init_worker(searcher_args: Dict):
+    # Se ejecuta una vez en el proceso del shard: carga su JobSearcher
+    global _worker_searcher
+    _worker_searcher = JobSearcher(**searcher_args)
+
+
+def _call(searcher: JobSearcher, method: str, args: Tuple, kwargs: Dict):
+    # Ejecuta un metodo (o lee un atributo) del shard y mide cuanto tardo dentro de el
+    start = time.perf_counter()
+    target = getattr(searcher, method)
+    result = target(*args, **kwargs) if callable(target) else target
+    return result, time.perf_counter() - start
+
+
+def _worker_call(method: str, args: Tuple, kwargs: Dict):
+    return _call(_worker_searcher, method, args, kwargs)
+
+
+class _ThreadShard:
+    # Shard en este proceso: faiss libera el GIL mientras busca
+
+    def __init__(self, searcher_args: Dict, executor: ThreadPoolExecutor):
+        self.executor = executor
+        self.searcher = None
+        self._loading = executor.submit(JobSearcher, **searcher_args)
+
+    def ready(self):
+        self.searcher = self._loading.result()
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        return self.executor.submit(_call, self.searcher, method, args, kwargs)
+
+    def close(self):
+        pass
+
+
+class _ProcessShard:
+    # Shard en un proceso propio: su indice y su metadata viven solo en el worker
+
+    def __init__(self, searcher_args: Dict, mp_context: str):
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context(mp_context),
+                                            initializer=_init_worker, initargs=(searcher_args,))
+        self._loading = self.submit('total_jobs')
+
+    def ready(self):
+        self._loading.result()
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        return self.executor.submit(_worker_call, method, args, kwargs)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ShardedSearcher:
+    # Reparte el corpus en shards y busca en todos en paralelo
+
+    def __init__(self, processed_data_dir: Optional[str] = None, index_type: str = 'flat',
+                 index_params: Optional[Dict] = None, shard_by: str = 'source', n_shards: int = 4,
+                 mode: str = 'thread', index_dir: Optional[str] = None, use_saved_index: bool = True,
+                 mp_context: str = 'spawn', chunked: bool = False, chunk_aggregation: str = 'max',
+                 lexical: bool = False):
+        # n_shards solo aplica a shard_by='hash' (con 'source' hay un shard por fuente)
+        # Cada shard guarda su indice en index_dir/shards/<shard>
+        # chunked/chunk_aggregation: como en JobSearcher (cada shard agrega sus ofertas)
+        # lexical: cada shard carga el indice BM25 de sus ofertas; el idf es el del
+        # shard (como en los motores de busqueda distribuidos), asi que los scores
+        # de shards distintos son comparables solo aproximadamente
+        if shard_by not in SHARD_BY:
+            raise ValueError(f"shard_by desconocido: {shard_by}. Opciones: {', '.join(SHARD_BY)}")
+        if mode not in SHARD_MODES:
+            raise ValueError(f"Modo desconocido: {mode}. Opciones: {', '.join(SHARD_MODES)}")
+        processed_data_dir = processed_data_dir or default_data_dir()
+        self._init_args = dict(processed_data_dir=processed_data_dir, index_type=index_type,
+                               index_params=index_params, shard_by=shard_by, n_shards=n_shards, mode=mode,
+                               index_dir=index_dir, use_saved_index=use_saved_index, mp_context=mp_context,
+                               chunked=chunked, chunk_aggregation=chunk_aggregation, lexical=lexical)
+        self.processed_data_dir = processed_data_dir
+        self.index_type = index_type
+        self.shard_by = shard_by
+        self.n_shards = n_shards
+        self.mode = mode
+        self.revision = 0
+        shards_dir = os.path.join(index_dir or os.path.join(processed_data_dir, 'index'), 'shards')
+
+        base_args = dict(processed_data_dir=processed_data_dir, index_type=index_type,
+                         index_params=index_params, use_saved_index=use_saved_index,
+                         chunked=chunked, chunk_aggregation=chunk_aggregation, lexical=lexical)
+        if shard_by == 'source':
+            names = [os.path.basename(os.path.normpath(path)) for _, path in discover_sources(processed_data_dir)]
+            if not names:
+                raise FileNotFoundError(f"No se encontraron archivos .store ni .pkl en {processed_data_dir}")
+            shard_args = [dict(base_args, sources=[name], index_dir=os.path.join(shards_dir, name))
+                          for name in names]
+        else:
+            names = [f"hash_{i}_of_{n_shards}" for i in range(n_shards)]
+            shard_args = [dict(base_args, shard=(i, n_shards), index_dir=os.path.join(shards_dir, name))
+                          for i, name in enumerate(names)]
+        self.shard_names = names
+
+        # Todos los shards se cargan a la vez
+        print(f"Cargando {len(names)} shards ({shard_by}, {mode})...")
+        self._executor = None
+        if mode == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="shard")
+            self._shards = [_ThreadShard(args, self._executor) for args in shard_args]
+        else:
+            self._shards = [_ProcessShard(args, mp_context) for args in shard_args]
+        try:
+            for shard in self._shards:
+                shard.ready()
+        except Exception:
+            self.close()
+            raise
+
+        # Traduccion de indices locales de cada shard a indices globales (las altas
+        # en ejecucion se agregan al final de la fila de su shard)
+        sizes = self._gather('total_jobs')
+        if shard_by == 'hash':
+            self._global_rows = [np.asarray(rows, dtype='int64') for rows in self._gather('global_rows')]
+        else:
+            offsets = np.cumsum([0] + sizes)
+            self._global_rows = [np.arange(start, end, dtype='int64') for start, end in zip(offsets, offsets[1:])]
+        self._next_row = sum(len(rows) for rows in self._global_rows)
+        self._runtime_shards = set()
+        self._add_lock = threading.Lock()
+
+        self._latency_lock = threading.Lock()
+        self.latency = {name: {'calls': 0, 'total_ms': 0.0, 'search_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0}
+                        for name in names}
+        self.disk_signature = self.read_disk_signature()
+        print(f"OK - {len(names)} shards listos ({sum(sizes)} ofertas)")
+
+    def _gather(self, method: str, *args, **kwargs) -> List:
+        # Llama al mismo metodo en todos los shards y devuelve sus resultados en orden
+        futures = [shard.submit(method, *args, **kwargs) for shard in self._shards]
+        return [future.result()[0] for future in futures]
+
+    def _targets(self, filters: Optional[Dict]) -> List[int]:
+        # Con un shard por fuente, un filtro por '_source_file' descarta shards enteros
+        if self.shard_by != 'source' or not filters or '_source_file' not in filters:
+            return list(range(len(self._shards)))
+        wanted = filters['_source_file']
+        wanted = {wanted} if isinstance(wanted, str) else set(wanted)
+        return [i for i, name in enumerate(self.shard_names)
+                if name in wanted or (RUNTIME_SOURCE in wanted and i in self._runtime_shards)]
+
+    def _to_global(self, shard: int, jobs: List[Dict]) -> List[Dict]:
+        rows = self._global_rows[shard]
+        for job in jobs:
+            job['_global_index'] = int(rows[job['_global_index']])
+        return jobs
+
+    def search(self, query_embedding: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None, fields: Optional[List[str]] = None,
+               filters: Optional[Dict] = None, aggregation: Optional[str] = None) -> List[Dict]:
+        # Misma interfaz que JobSearcher.search
+        query = np.array(query_embedding, dtype='float32')
+        if query.ndim == 1:
+            query = query.reshape(1, -1)
+        return self.search_batch(query, k=k, nprobe=nprobe, ef_search=ef_search, fields=fields,
+                                 filters=filters, query_offsets=[0, len(query)], aggregation=aggregation)[0]
+
+    def search_batch(self, query_embeddings: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+                     ef_search: Optional[int] = None, fields: Optional[List[str]] = None,
+                     filters: Optional[Dict] = None, query_offsets: Optional[List[int]] = None,
+                     aggregation: Optional[str] = None) -> List[List[Dict]]:
+        # Envia el lote completo a cada shard y combina los top-k parciales de cada consulta
+        # (los scores agregados por oferta son comparables entre shards)
+        queries = np.array(query_embeddings, dtype='float32')
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        n_queries = len(queries) if query_offsets is None else len(query_offsets) - 1
+        return self._fan_out(self._targets(filters), n_queries, k, 'similarity_score', 'search_batch', queries, k=k,
+                             nprobe=nprobe, ef_search=ef_search, fields=fields, filters=filters,
+                             query_offsets=query_offsets, aggregation=aggregation)
+
+    def search_lexical(self, query_text: str, k: int = 10, fields: Optional[List[str]] = None,
+                       filters: Optional[Dict] = None, query_embedding: Optional[np.ndarray] = None,
+                       aggregation: Optional[str] = None) -> List[Dict]:
+        # Misma interfaz que JobSearcher.search_lexical
+        offsets = None
+        if query_embedding is not None:
+            query_embedding = np.array(query_embedding, dtype='float32')
+            if query_embedding.ndim == 1:
+                query_embedding = query_embedding.reshape(1, -1)
+            offsets = [0, len(query_embedding)]
+        return self.search_lexical_batch([query_text], k=k, fields=fields, filters=filters,
+                                         query_embeddings=query_embedding, query_offsets=offsets,
+                                         aggregation=aggregation)[0]
+
+    def search_lexical_batch(self, query_texts: List[str], k: int = 10, fields: Optional[List[str]] = None,
+                             filters: Optional[Dict] = None, query_embeddings: Optional[np.ndarray] = None,
+                             query_offsets: Optional[List[int]] = None,
+                             aggregation: Optional[str] = None) -> List[List[Dict]]:
+        # Top-k BM25 de cada shard, combinados por 'bm25_score'
+        return self._fan_out(self._targets(filters), len(query_texts), k, 'bm25_score', 'search_lexical_batch',
+                             list(query_texts), k=k, fields=fields, filters=filters,
+                             query_embeddings=query_embeddings, query_offsets=query_offsets,
+                             aggregation=aggregation)
+
+    def _fan_out(self, targets: List[int], n_queries: int, limit: int, score_field: str, method: str,
+                 *args, **kwargs) -> List[List[Dict]]:
+        # Envia el lote completo a los shards indicados y combina los top-limit
+        # parciales de cada consulta por el campo score_field
+        started = time.perf_counter()
+        done_at = {}
+        pending = []
+        for i in targets:
+            future = self._shards[i].submit(method, *args, **kwargs)
+            future.add_done_callback(lambda _, i=i: done_at.__setitem__(i, time.perf_counter()))
+            pending.append((i, future))
+
+        partials = []
+        for i, future in pending:
+            rows, seconds = future.result()
+            self._record_latency(i, done_at.get(i, time.perf_counter()) - started, seconds)
+            partials.append([self._to_global(i, jobs) for jobs in rows])
+
+        # Cada lista parcial viene ordenada por score: basta mezclarlas y cortar en k
+        results = []
+        for q in range(n_queries):
+            merged = heapq.merge(*(rows[q] for rows in partials), key=lambda job: -job[score_field])
+            results.append(list(itertools.islice(merged, limit)))
+        return results
+
+    def _record_latency(self, shard: int, seconds: float, search_seconds: float):
+        with self._latency_lock:
+            stats = self.latency[self.shard_names[shard]]
+            stats['calls'] += 1
+            stats['total_ms'] += 1000 * seconds
+            stats['search_ms'] += 1000 * search_seconds
+            stats['last_ms'] = 1000 * seconds
+            stats['max_ms'] = max(stats['max_ms'], 1000 * seconds)
+
+    def shard_latencies(self) -> Dict[str, Dict]:
+        # Latencia por shard: total (incluye cola e IPC) y tiempo de busqueda dentro del shard
+        with self._latency_lock:
+            return {
+                name: {
+                    'calls': s['calls'],
+                    'mean_ms': round(s['total_ms'] / s['calls'], 3) if s['calls'] else 0.0,
+                    'mean_search_ms': round(s['search_ms'] / s['calls'], 3) if s['calls'] else 0.0,
+                    'last_ms': round(s['last_ms'], 3),
+                    'max_ms': round(s['max_ms'], 3),
+                }
+                for name, s in self.latency.items()
+            }
+
+    @property
+    def total_jobs(self) -> int:
+        return sum(self._gather('total_jobs'))
+
+    def filter_values(self, field: str) -> List[str]:
+        return sorted(set(itertools.chain.from_iterable(self._gather('filter_values', field))))
+
+    def get_job_by_offer_id(self, offer_id: int, fields: Optional[List[str]] = None) -> Dict:
+        for i, shard in enumerate(self._shards):
+            try:
+                job, _ = shard.submit('get_job_by_offer_id', offer_id, fields).result()
+            except KeyError:
+                continue
+            return self._to_global(i, [job])[0]
+        raise KeyError(f"No existe la oferta {offer_id}")
+
+    def similar_to(self, offer_id: int, k: int = 10, fields: Optional[List[str]] = None) -> List[Dict]:
+        # Sin grafo global: el embedding de la oferta se pide a su shard y se busca en todos
+        for shard in self._shards:
+            try:
+                embedding, _ = shard.submit('get_embedding_by_offer_id', offer_id).result()
+            except KeyError:
+                continue
+            results = self.search(embedding, k=k + EXTRA_NEIGHBORS, fields=fields)
+            return [job for job in results if job['_offer_id'] != offer_id][:k]
+        raise KeyError(f"No existe la oferta {offer_id}")
+
+    def add_offers(self, records: List[Dict], embeddings: np.ndarray) -> List[int]:
+        # Misma interfaz que JobSearcher.add_offers: cada oferta se agrega a su shard
+        # y recibe el siguiente indice global (los existentes no cambian)
+        vectors = np.array(embeddings, dtype='float32')
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        if len(vectors) != len(records):
+            raise ValueError(f"Se recibieron {len(records)} ofertas y {len(vectors)} embeddings")
+        ids = np.array([offer_id(r.get('title'), r.get('description')) for r in records], dtype='int64')
+        
+        with self._add_lock:
+            if self.shard_by == 'hash':
+                owners = offer_shard(ids, self.n_shards)
+            else:
+                # La oferta reemplazada puede estar en cualquier fuente
+                self._gather('remove_offers', ids.tolist())
+                owners = np.full(len(ids), int(np.argmin([len(rows) for rows in self._global_rows])))
+            
+            # El mapeo de las filas nuevas se publica antes de que el shard pueda devolverlas
+            # (en el orden de records, como en JobSearcher)
+            added = {}
+            for shard in np.unique(owners):
+                members = np.flatnonzero(owners == shard)
+                added[int(shard)] = members
+                self._global_rows[shard] = np.concatenate([self._global_rows[shard], self._next_row + members])
+            self._next_row += len(ids)
+            futures = {shard: self._shards[shard].submit('add_offers', [records[i] for i in members],
+                                                         vectors[members])
+                       for shard, members in added.items()}
+            errors = []
+            for shard, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    # El shard no agrego nada (valida antes de modificarse): se deshace su mapeo
+                    self._global_rows[shard] = self._global_rows[shard][:-len(added[shard])]
+                    errors.append(e)
+            if errors:
+                raise errors[0]
+            self._runtime_shards.update(added)
+            self.revision += 1
+        return ids.tolist()
+
+    def remove_offers(self, offer_ids: List[int]) -> int:
+        # Cada shard quita las filas que tenga de esas ofertas
+        removed = sum(self._gather('remove_offers', list(offer_ids)))
+        if removed:
+            self.revision += 1
+        return removed
+
+    def compact(self) -> int:
+        return sum(self._gather('compact'))
+
+    def read_disk_signature(self) -> Tuple:
+        return tuple(self._gather('read_disk_signature'))
+
+    def reload(self) -> 'ShardedSearcher':
+        # Construye una generacion nueva con la misma configuracion
+        return ShardedSearcher(**self._init_args)
+
+    def get_statistics(self) -> Dict:
+        # Estadisticas combinadas de los shards, mas las de cada uno
+        shard_stats = self._gather('get_statistics')
+        sources = {}
+        for stats in shard_stats:
+            for name, count in stats['sources'].items():
+                sources[name] = sources.get(name, 0) + count
+        recalls = [s['recall_vs_flat'] for s in shard_stats if s['recall_vs_flat'] is not None]
+        latencies = self.shard_latencies()
+        return {
+            'total_jobs': sum(s['total_jobs'] for s in shard_stats),
+            'removed_jobs': sum(s['removed_jobs'] for s in shard_stats),
+            'embedding_dimension': shard_stats[0]['embedding_dimension'],
+            'sources': sources,
+            'metadata_bytes': sum(s['metadata_bytes'] for s in shard_stats),
+            'index_type': shard_stats[0]['index_type'],
+            'index_kind': self.index_type,
+            'index_settings': shard_stats[0]['index_settings'],
+            'recall_vs_flat': min(recalls) if recalls else None,
+            'sharding': {'shard_by': self.shard_by, 'mode': self.mode, 'shards': len(self._shards)},
+            'shards': {name: dict(latencies[name], total_jobs=stats['total_jobs'])
+                       for name, stats in zip(self.shard_names, shard_stats)},
+        }
+
+    def close(self):
+        # Detiene los workers de los shards (modo proceso) y el pool de hilos
+        for shard in getattr(self, '_shards', []):
+            shard.close()
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown(wait=False)
+
+    def __del__(self):
+        self.close()
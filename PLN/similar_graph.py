@@ -0,0 +1,128 @@
+import os
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from index_factory import gather_rows, search_with_rescore, build_manifest, read_manifest, manifest_matches
+
+
+# Grafo de ofertas similares: los M vecinos mas cercanos de cada oferta, calculados
+# offline con una auto-busqueda en lotes sobre el indice FAISS. "Ofertas similares"
+# se sirve leyendo una fila del grafo (O(M), sin consultar el indice).
+# Formato CSR en index_dir (junto al indice):
+#   similar.manifest.json -> fuentes, M y filas con las que se construyo
+#   similar.offsets.i64   -> int64 (ofertas + 1)
+#   similar.ids.i32       -> indice global de cada vecino, de mayor a menor similitud
+#   similar.scores.f16    -> similitud coseno de cada vecino
+# Los vecinos de la fila i son ids[offsets[i]:offsets[i + 1]]; no incluyen a la
+# propia oferta ni a sus copias en otras fuentes (mismo offer_id).
+SIMILAR_NEIGHBORS = 20
+GRAPH_NAME = 'similar'
+# Consultas por llamada a FAISS al construir el grafo
+GRAPH_BATCH = 4096
+# Vecinos extra pedidos por consulta para reponer la propia oferta y sus copias
+EXTRA_NEIGHBORS = 4
+
+
+def graph_paths(index_dir: str) -> Dict[str, str]:
+    return {name: os.path.join(index_dir, f"{GRAPH_NAME}.{name}")
+            for name in ('manifest.json', 'offsets.i64', 'ids.i32', 'scores.f16')}
+
+
+class SimilarGraph:
+    # Vecinos de cada oferta (por indice global) en formato CSR
+
+    def __init__(self, offsets: np.ndarray, ids: np.ndarray, scores: np.ndarray, neighbors: int):
+        self.offsets = offsets
+        self.ids = ids
+        self.scores = scores
+        self.neighbors = neighbors
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def neighbors_of(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        # (indices globales, similitudes) de los vecinos de la fila, de mayor a menor
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return np.asarray(self.ids[start:end], dtype='int64'), np.asarray(self.scores[start:end], dtype='float32')
+
+    @classmethod
+    def build(cls, index: "faiss.Index", blocks: List[np.ndarray], offer_ids: np.ndarray,
+              neighbors: int = SIMILAR_NEIGHBORS, rescore: int = 0, params=None,
+              batch_size: int = GRAPH_BATCH) -> 'SimilarGraph':
+        # Auto-busqueda de todas las filas (cada una es consulta de si misma, en
+        # lotes de batch_size) con el mismo indice y reordenamiento que search
+        n = sum(len(b) for b in blocks)
+        k = min(n, neighbors + 1 + EXTRA_NEIGHBORS)
+        graph_ids = np.full((n, neighbors), -1, dtype='int32')
+        graph_scores = np.zeros((n, neighbors), dtype='float16')
+        start_time = time.time()
+        for start in range(0, n, batch_size):
+            rows = np.arange(start, min(n, start + batch_size))
+            scores, found = search_with_rescore(index, gather_rows(blocks, rows), k, blocks, rescore, params=params)
+            valid = (found >= 0) & (found != rows[:, None])
+            valid &= offer_ids[np.maximum(found, 0)] != offer_ids[rows][:, None]
+            # Los primeros 'neighbors' validos de cada fila, en el orden de la busqueda
+            rank = np.cumsum(valid, axis=1) - 1
+            r, c = np.nonzero(valid & (rank < neighbors))
+            graph_ids[rows[r], rank[r, c]] = found[r, c]
+            graph_scores[rows[r], rank[r, c]] = scores[r, c]
+        present = graph_ids >= 0
+        offsets = np.concatenate([[0], np.cumsum(present.sum(axis=1))]).astype('int64')
+        print(f"OK - Grafo de similares: {n} ofertas x {neighbors} vecinos ({time.time() - start_time:.1f}s)")
+        return cls(offsets, graph_ids[present], graph_scores[present], neighbors)
+
+    def save(self, index_dir: str, sources: List[Dict], dim: int, built_with: Optional[str] = None):
+        # Escribe los arreglos y al final el manifest (sin manifest no se usa el grafo)
+        paths = graph_paths(index_dir)
+        os.makedirs(index_dir, exist_ok=True)
+        if os.path.exists(paths['manifest.json']):
+            os.remove(paths['manifest.json'])
+        for name, array in (('offsets.i64', self.offsets.astype('<i8')), ('ids.i32', self.ids.astype('<i4')),
+                            ('scores.f16', self.scores.astype('<f2'))):
+            array.tofile(paths[name] + '.tmp')
+            os.replace(paths[name] + '.tmp', paths[name])
+
+        manifest = build_manifest(sources, dim, GRAPH_NAME, {'neighbors': self.neighbors})
+        manifest['total'] = len(self)
+        manifest['edges'] = int(len(self.ids))
+        manifest['built_with'] = built_with
+        with open(paths['manifest.json'] + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(paths['manifest.json'] + '.tmp', paths['manifest.json'])
+
+    @classmethod
+    def load(cls, index_dir: str, sources: List[Dict], dim: int, total: int,
+             min_neighbors: int = 0) -> Optional['SimilarGraph']:
+        # Abre el grafo guardado (mmap) si corresponde a las fuentes actuales y
+        # tiene al menos min_neighbors vecinos por oferta; si no, None
+        paths = graph_paths(index_dir)
+        manifest = read_manifest(paths['manifest.json'])
+        if not manifest or manifest.get('total') != total:
+            return None
+        params = manifest.get('index_params') or {}
+        if params.get('neighbors', 0) < min_neighbors:
+            return None
+        if not manifest_matches(manifest, sources, dim, GRAPH_NAME, params):
+            return None
+        try:
+            offsets = np.memmap(paths['offsets.i64'], dtype='<i8', mode='r', shape=(total + 1,))
+            edges = int(offsets[-1])
+            if edges != manifest.get('edges'):
+                return None
+            if edges:
+                ids = np.memmap(paths['ids.i32'], dtype='<i4', mode='r', shape=(edges,))
+                scores = np.memmap(paths['scores.f16'], dtype='<f2', mode='r', shape=(edges,))
+            else:
+                ids, scores = np.zeros(0, dtype='int32'), np.zeros(0, dtype='float16')
+        except (OSError, ValueError):
+            return None
+        return cls(offsets, ids, scores, params['neighbors'])
+
+    def statistics(self) -> Dict:
+        return {
+            'offers': len(self),
+            'neighbors': self.neighbors,
+            'edges': int(len(self.ids)),
+            'bytes': int(self.offsets.nbytes + self.ids.nbytes + self.scores.nbytes),
+        }
@@ -0,0 +1,686 @@
+import os
+import json
+import glob
+import hashlib
+import pickle
+import shutil
+import argparse
+import datetime
+from collections.abc import Sequence
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+
+# Formato en disco de un "store" de embeddings (un directorio por categoria):
+#   header.json       -> numero de filas, dimension, columnas, modelo, etc.
+#   embeddings.f32    -> matriz float32 cruda (count x dim), se abre con np.memmap
+#   col_XXX.data      -> bytes utf-8 concatenados de la columna XXX
+#   col_XXX.offsets   -> int64 (count + 1) con el inicio de cada valor en .data
+#   col_XXX.values    -> en lugar de .data/.offsets, arreglo crudo de las columnas
+#                        numericas, booleanas o de fechas (tipo en header['column_dtypes'])
+# Opcional (process_embeddings --chunked), ventanas extra de las ofertas largas:
+#   chunks.f32        -> float32 (n_chunks x dim) de las ventanas 2..m de cada oferta
+#   chunk_offsets.i64 -> int64 (count + 1): las ventanas de la fila i son chunks[o[i]:o[i + 1]]
+# Opcional (lexical_index), indice invertido BM25 de cleaned_text:
+#   bm25.json + bm25_*  -> vocabulario y postings en formato CSR
+STORE_SUFFIX = '.store'
+HEADER_FILE = 'header.json'
+EMBEDDINGS_FILE = 'embeddings.f32'
+CHUNKS_FILE = 'chunks.f32'
+CHUNK_OFFSETS_FILE = 'chunk_offsets.i64'
+FORMAT_VERSION = 1
+
+# Tipos de columna: 'str' (por defecto y en los stores sin 'column_dtypes') o uno
+# de estos, guardados como arreglo numpy. Los faltantes (None/NaN/NaT) se guardan
+# como NaN/NaT, por eso una columna entera con faltantes se guarda como float64.
+TYPED_COLUMNS = {
+    'bool': '|u1',
+    'int64': '<i8',
+    'float64': '<f8',
+    'datetime64': '<M8[us]',
+}
+
+
+def store_path_for(output_path: str) -> str:
+    # Convierte una ruta de salida (.pkl o sin extension) en la ruta del store
+    root, ext = os.path.splitext(output_path)
+    if ext == STORE_SUFFIX:
+        return output_path
+    if ext == '.pkl':
+        return root + STORE_SUFFIX
+    return output_path + STORE_SUFFIX
+
+
+def source_category(source_name: str) -> str:
+    # 'vectors_asistente.store' / 'vectors_asistente.pkl' -> 'asistente'
+    name = os.path.basename(source_name)
+    for suffix in (STORE_SUFFIX, '.pkl'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name.replace('vectors_', '', 1)
+
+
+def offer_id(title, description) -> int:
+    # Id estable de una oferta: 63 bits del sha256 de titulo + descripcion. No
+    # depende del orden de carga, del archivo en que esta ni del modelo, asi que
+    # sobrevive a reconstrucciones del indice y a cambios en otras fuentes.
+    digest = hashlib.sha256(f"{_to_text(title)}\0{_to_text(description)}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little') & 0x7FFFFFFFFFFFFFFF
+
+
+def offer_shard(offer_ids: np.ndarray, n_shards: int) -> np.ndarray:
+    # Shard de cada oferta al partir el rango de offer_id en n_shards tramos iguales
+    width = np.uint64(-(-(1 << 63) // n_shards))
+    return (np.asarray(offer_ids, dtype='int64').astype(np.uint64) // width).astype('int64')
+
+
+def _to_text(value) -> str:
+    # Las columnas se guardan como texto; None/NaN se guardan como cadena vacia
+    if value is None:
+        return ""
+    if isinstance(value, float) and value != value:
+        return ""
+    return value if isinstance(value, str) else str(value)
+
+
+def _is_missing(value) -> bool:
+    # None, NaN y NaT (tambien los de numpy/pandas) cuentan como faltantes
+    if value is None:
+        return True
+    try:
+        return bool(value != value)
+    except (TypeError, ValueError):
+        return False
+
+
+def column_dtype(values: List) -> str:
+    # Tipo con que se guarda una columna segun sus valores (ver TYPED_COLUMNS);
+    # los booleanos con faltantes y las columnas mixtas o vacias quedan como 'str'
+    present = [v for v in values if not _is_missing(v)]
+    if not present:
+        return 'str'
+    if all(isinstance(v, (bool, np.bool_)) for v in present):
+        return 'bool' if len(present) == len(values) else 'str'
+    if any(isinstance(v, (bool, np.bool_)) for v in present):
+        return 'str'
+    if all(isinstance(v, (int, np.integer)) for v in present):
+        return 'int64' if len(present) == len(values) else 'float64'
+    if all(isinstance(v, (int, float, np.integer, np.floating)) for v in present):
+        return 'float64'
+    if all(isinstance(v, (datetime.date, np.datetime64)) for v in present):
+        return 'datetime64'
+    return 'str'
+
+
+def fits_column(dtype: str, values: List) -> bool:
+    # Si los valores se pueden agregar a una columna ya guardada con ese tipo
+    if dtype == 'str':
+        return True
+    if all(_is_missing(v) for v in values):
+        return dtype in ('float64', 'datetime64') or not values
+    accepted = {'bool': ('bool',), 'int64': ('int64',), 'float64': ('int64', 'float64'),
+                'datetime64': ('datetime64',)}
+    return column_dtype(values) in accepted[dtype]
+
+
+def _encode_typed(values: List, dtype: str) -> np.ndarray:
+    # Valores -> arreglo del tipo de la columna (faltantes como NaN/NaT)
+    if dtype == 'datetime64':
+        return np.array([np.datetime64('NaT') if _is_missing(v) else np.datetime64(v, 'us') for v in values],
+                        dtype=TYPED_COLUMNS[dtype])
+    if dtype == 'float64':
+        values = [np.nan if _is_missing(v) else v for v in values]
+    return np.array(values, dtype=TYPED_COLUMNS[dtype])
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    # Normaliza L2 por fila (se guardan ya normalizados para no copiarlos al cargar)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (embeddings / norms).astype('<f4')
+
+
+def _encode_column(values: List) -> Tuple[np.ndarray, bytes]:
+    # Devuelve (offsets int64 de len(values) + 1, bytes utf-8 concatenados)
+    encoded = [_to_text(v).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    if encoded:
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def _write_header(store_path: str, header: Dict):
+    tmp_header = os.path.join(store_path, HEADER_FILE + '.tmp')
+    with open(tmp_header, 'w', encoding='utf-8') as f:
+        json.dump(header, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_header, os.path.join(store_path, HEADER_FILE))
+
+
+def read_header(store_path: str) -> Dict:
+    with open(os.path.join(store_path, HEADER_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _check_chunks(chunks: Tuple[np.ndarray, np.ndarray], count: int, dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    # (embeddings de los chunks, offsets count + 1 que empiezan en 0)
+    chunk_embeddings = np.ascontiguousarray(chunks[0], dtype='<f4').reshape(-1, dim)
+    chunk_offsets = np.ascontiguousarray(chunks[1], dtype='<i8')
+    if len(chunk_offsets) != count + 1 or chunk_offsets[0] != 0 or chunk_offsets[-1] != len(chunk_embeddings):
+        raise ValueError(f"Los offsets de los chunks deben ir de 0 a {len(chunk_embeddings)} con {count + 1} valores")
+    return chunk_embeddings, chunk_offsets
+
+
+def write_vector_store(store_path: str, columns: Dict[str, List], embeddings: np.ndarray,
+                       model_name: Optional[str] = None, normalize: bool = True,
+                       chunks: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                       chunk_params: Optional[Dict] = None) -> str:
+    # Escribe un store completo (se reemplaza de forma atomica si ya existe)
+    # chunks: (embeddings, offsets) de las ventanas extra de cada fila (ver chunking)
+    embeddings = np.ascontiguousarray(embeddings, dtype='<f4')
+    if embeddings.ndim != 2:
+        raise ValueError("Los embeddings deben ser una matriz 2D")
+    count, dim = embeddings.shape
+
+    for name, values in columns.items():
+        if len(values) != count:
+            raise ValueError(f"La columna '{name}' tiene {len(values)} valores, se esperaban {count}")
+
+    if chunks is not None:
+        chunk_embeddings, chunk_offsets = _check_chunks(chunks, count, dim)
+
+    if normalize:
+        embeddings = _normalize(embeddings)
+        if chunks is not None:
+            chunk_embeddings = _normalize(chunk_embeddings)
+
+    tmp_path = store_path + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    # Digest del contenido: permite detectar cambios sin releer el store
+    digest = hashlib.sha256()
+    embeddings.tofile(os.path.join(tmp_path, EMBEDDINGS_FILE))
+    digest.update(embeddings.tobytes())
+
+    column_names = list(columns.keys())
+    column_dtypes = {}
+    for i, name in enumerate(column_names):
+        dtype = column_dtypes[name] = column_dtype(columns[name])
+        digest.update(name.encode('utf-8'))
+        if dtype in TYPED_COLUMNS:
+            values = _encode_typed(columns[name], dtype)
+            values.tofile(os.path.join(tmp_path, f"col_{i:03d}.values"))
+            digest.update(values.tobytes())
+            continue
+        offsets, data = _encode_column(columns[name])
+        with open(os.path.join(tmp_path, f"col_{i:03d}.data"), 'wb') as f:
+            f.write(data)
+        offsets.tofile(os.path.join(tmp_path, f"col_{i:03d}.offsets"))
+        digest.update(offsets.tobytes())
+        digest.update(data)
+
+    if chunks is not None:
+        chunk_embeddings.tofile(os.path.join(tmp_path, CHUNKS_FILE))
+        chunk_offsets.tofile(os.path.join(tmp_path, CHUNK_OFFSETS_FILE))
+        digest.update(chunk_offsets.tobytes())
+        digest.update(chunk_embeddings.tobytes())
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'count': int(count),
+        'dim': int(dim),
+        'dtype': 'float32',
+        'normalized': bool(normalize),
+        'model_name': model_name,
+        'columns': column_names,
+        'column_dtypes': column_dtypes,
+        'digest': digest.hexdigest(),
+        # Cada escritura/agregado deja un segmento (count, digest): permite saber
+        # si el store actual es el anterior mas filas agregadas al final
+        'segments': [{'count': int(count), 'digest': digest.hexdigest()}],
+    }
+    if chunks is not None:
+        header['chunks'] = dict(chunk_params or {}, count=int(len(chunk_embeddings)))
+    _write_header(tmp_path, header)
+
+    if os.path.exists(store_path):
+        shutil.rmtree(store_path)
+    os.rename(tmp_path, store_path)
+    return store_path
+
+
+def _truncate(path: str, size: int):
+    if os.path.getsize(path) > size:
+        with open(path, 'r+b') as f:
+            f.truncate(size)
+
+
+def append_to_vector_store(store_path: str, columns: Dict[str, List], embeddings: np.ndarray,
+                           chunks: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Dict:
+    # Agrega filas al final de un store existente sin reescribirlo.
+    # El header se escribe al final: si el proceso se interrumpe, los bytes
+    # sobrantes se descartan en el siguiente agregado.
+    # chunks es obligatorio si el store tiene chunks (y no se admite si no los tiene)
+    header = read_header(store_path)
+    if list(columns.keys()) != header['columns']:
+        raise ValueError("Las columnas no coinciden con las del store existente")
+    if (chunks is None) != ('chunks' not in header):
+        raise ValueError("El store " + ("tiene" if 'chunks' in header else "no tiene") +
+                         " chunks: se deben agregar filas con el mismo formato")
+
+    embeddings = np.ascontiguousarray(embeddings, dtype='<f4')
+    if embeddings.ndim != 2 or embeddings.shape[1] != header['dim']:
+        raise ValueError(f"Los embeddings deben tener dimensión {header['dim']}")
+    new_count = len(embeddings)
+    for name, values in columns.items():
+        if len(values) != new_count:
+            raise ValueError(f"La columna '{name}' tiene {len(values)} valores, se esperaban {new_count}")
+    if new_count == 0:
+        return header
+    column_dtypes = header.get('column_dtypes', {})
+    for name, values in columns.items():
+        if not fits_column(column_dtypes.get(name, 'str'), values):
+            raise ValueError(f"La columna '{name}' es de tipo {column_dtypes[name]}: "
+                             f"no admite valores de tipo {column_dtype(values)}")
+    if chunks is not None:
+        chunk_embeddings, chunk_offsets = _check_chunks(chunks, new_count, header['dim'])
+
+    if header.get('normalized'):
+        embeddings = _normalize(embeddings)
+        if chunks is not None:
+            chunk_embeddings = _normalize(chunk_embeddings)
+
+    old_count = header['count']
+    segment = hashlib.sha256()
+
+    emb_path = os.path.join(store_path, EMBEDDINGS_FILE)
+    _truncate(emb_path, old_count * header['dim'] * 4)
+    with open(emb_path, 'ab') as f:
+        f.write(embeddings.tobytes())
+    segment.update(embeddings.tobytes())
+
+    for i, name in enumerate(header['columns']):
+        dtype = column_dtypes.get(name, 'str')
+        segment.update(name.encode('utf-8'))
+        if dtype in TYPED_COLUMNS:
+            values_path = os.path.join(store_path, f"col_{i:03d}.values")
+            values = _encode_typed(columns[name], dtype)
+            _truncate(values_path, old_count * values.itemsize)
+            with open(values_path, 'ab') as f:
+                f.write(values.tobytes())
+            segment.update(values.tobytes())
+            continue
+        data_path = os.path.join(store_path, f"col_{i:03d}.data")
+        offsets_path = os.path.join(store_path, f"col_{i:03d}.offsets")
+        _truncate(offsets_path, (old_count + 1) * 8)
+        data_size = int(np.fromfile(offsets_path, dtype='<i8', count=old_count + 1)[old_count])
+        _truncate(data_path, data_size)
+
+        offsets, data = _encode_column(columns[name])
+        tail = offsets[1:] + data_size
+        with open(data_path, 'ab') as f:
+            f.write(data)
+        with open(offsets_path, 'ab') as f:
+            f.write(tail.tobytes())
+        segment.update(tail.tobytes())
+        segment.update(data)
+
+    if chunks is not None:
+        old_chunks = header['chunks']['count']
+        chunks_path = os.path.join(store_path, CHUNKS_FILE)
+        chunk_offsets_path = os.path.join(store_path, CHUNK_OFFSETS_FILE)
+        _truncate(chunks_path, old_chunks * header['dim'] * 4)
+        _truncate(chunk_offsets_path, (old_count + 1) * 8)
+        tail = chunk_offsets[1:] + old_chunks
+        with open(chunks_path, 'ab') as f:
+            f.write(chunk_embeddings.tobytes())
+        with open(chunk_offsets_path, 'ab') as f:
+            f.write(tail.tobytes())
+        segment.update(tail.tobytes())
+        segment.update(chunk_embeddings.tobytes())
+        header['chunks']['count'] = old_chunks + len(chunk_embeddings)
+
+    digest = hashlib.sha256((header.get('digest', '') + segment.hexdigest()).encode('utf-8')).hexdigest()
+    header['count'] = old_count + new_count
+    header['digest'] = digest
+    header.setdefault('segments', []).append({'count': header['count'], 'digest': digest})
+    _write_header(store_path, header)
+    return header
+
+
+class StringColumn(Sequence):
+    # Columna de texto respaldada por un buffer de bytes y un buffer de offsets
+    # (mmap para los stores, arreglos en memoria para los .pkl antiguos)
+
+    def __init__(self, data_path: str, offsets_path: str, count: int):
+        self._count = count
+        self._offsets = np.memmap(offsets_path, dtype='<i8', mode='r', shape=(count + 1,))
+        if os.path.getsize(data_path) > 0:
+            self._data = np.memmap(data_path, dtype=np.uint8, mode='r')
+        else:
+            self._data = np.zeros(0, dtype=np.uint8)
+
+    @classmethod
+    def from_values(cls, values: List) -> 'StringColumn':
+        # Construye la columna en memoria (un solo buffer en lugar de un str por fila)
+        column = cls.__new__(cls)
+        offsets, data = _encode_column(values)
+        column._count = len(values)
+        column._offsets = offsets
+        column._data = np.frombuffer(data, dtype=np.uint8)
+        return column
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(f"Índice {i} fuera de rango (0-{self._count - 1})")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._data[start:end].tobytes().decode('utf-8')
+
+    def nbytes(self) -> int:
+        return int(self._offsets.nbytes + self._data.nbytes)
+
+
+class TypedColumn(Sequence):
+    # Columna numerica, booleana o de fechas respaldada por un arreglo numpy
+    # (mmap para los stores); los valores se devuelven como int/float/bool/datetime
+    # de Python y los faltantes como None
+
+    def __init__(self, values: np.ndarray, dtype: str):
+        self._values = values
+        self.dtype = dtype
+
+    @classmethod
+    def open(cls, path: str, dtype: str, count: int) -> 'TypedColumn':
+        if count > 0:
+            values = np.memmap(path, dtype=TYPED_COLUMNS[dtype], mode='r', shape=(count,))
+        else:
+            values = np.zeros(0, dtype=TYPED_COLUMNS[dtype])
+        return cls(values, dtype)
+
+    @classmethod
+    def from_values(cls, values: List, dtype: str) -> 'TypedColumn':
+        return cls(_encode_typed(values, dtype), dtype)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _value(self, value):
+        if self.dtype == 'bool':
+            return bool(value)
+        if self.dtype != 'int64' and value != value:
+            return None
+        return value.item()
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._value(v) for v in self._values[i]]
+        return self._value(self._values[i])
+
+    def array(self) -> np.ndarray:
+        # Los valores tal cual (sin convertir a objetos de Python)
+        return self._values
+
+    def nbytes(self) -> int:
+        return int(self._values.nbytes)
+
+
+class ColumnSubset(Sequence):
+    # Vista de algunas filas de una columna (no copia sus buffers)
+
+    def __init__(self, column: Sequence, rows: np.ndarray):
+        self._column = column
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._column[int(r)] for r in self._rows[i]]
+        return self._column[int(self._rows[i])]
+
+    def nbytes(self) -> int:
+        return int(self._rows.nbytes)
+
+
+class ColumnTable:
+    # Tabla de solo lectura con columnas StringColumn/TypedColumn: una fila se
+    # materializa como dict solo cuando se pide, y solo con los campos pedidos
+
+    def __init__(self, name: str, columns: Dict[str, Sequence], count: int):
+        self.name = name
+        self.columns = columns
+        self.count = count
+
+    @classmethod
+    def from_records(cls, name: str, records: List[Dict]) -> 'ColumnTable':
+        # Convierte una lista de dicts (metadata de un .pkl) a columnas
+        names = list(dict.fromkeys(key for record in records for key in record))
+        columns = {}
+        for col in names:
+            values = [r.get(col) for r in records]
+            dtype = column_dtype(values)
+            columns[col] = (TypedColumn.from_values(values, dtype) if dtype in TYPED_COLUMNS
+                            else StringColumn.from_values(values))
+        return cls(name, columns, len(records))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get_record(self, i: int, fields: Optional[List[str]] = None) -> Dict:
+        # Materializa solo la fila i (y solo los campos pedidos)
+        names = self.columns.keys() if fields is None else [f for f in fields if f in self.columns]
+        return {name: self.columns[name][i] for name in names}
+
+    def subset(self, rows: np.ndarray) -> 'ColumnTable':
+        # Tabla con solo las filas indicadas (vistas sobre las mismas columnas)
+        rows = np.asarray(rows, dtype='int64')
+        columns = {name: ColumnSubset(column, rows) for name, column in self.columns.items()}
+        return ColumnTable(self.name, columns, len(rows))
+
+    def offer_id(self, i: int) -> int:
+        # Id estable de la fila i (ver offer_id)
+        return offer_id(self._text(i, 'title'), self._text(i, 'description'))
+
+    def offer_ids(self) -> np.ndarray:
+        # Ids estables de todas las filas (int64)
+        return np.fromiter((self.offer_id(i) for i in range(self.count)), dtype='int64', count=self.count)
+
+    def _text(self, i: int, name: str) -> str:
+        column = self.columns.get(name)
+        return _to_text(column[i]) if column is not None else ""
+
+
+class VectorStore(ColumnTable):
+    # Acceso de solo lectura a un store: embeddings y columnas se abren con mmap,
+    # por lo que abrirlo no depende del tamaño del corpus y varios procesos
+    # comparten las mismas paginas del page cache.
+
+    def __init__(self, store_path: str):
+        self.path = store_path
+        self.header = read_header(store_path)
+
+        if self.header.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Versión de formato no soportada en {store_path}")
+
+        count = self.header['count']
+        self.dim = self.header['dim']
+        self.normalized = self.header.get('normalized', False)
+        self.model_name = self.header.get('model_name')
+
+        if count > 0:
+            self.embeddings = np.memmap(
+                os.path.join(store_path, EMBEDDINGS_FILE),
+                dtype='<f4', mode='r', shape=(count, self.dim)
+            )
+        else:
+            self.embeddings = np.zeros((0, self.dim), dtype='float32')
+
+        # Ventanas extra de las ofertas largas (None si el store no tiene chunks)
+        self.chunk_embeddings = None
+        self.chunk_offsets = None
+        chunk_info = self.header.get('chunks')
+        if chunk_info is not None:
+            self.chunk_offsets = np.memmap(os.path.join(store_path, CHUNK_OFFSETS_FILE),
+                                           dtype='<i8', mode='r', shape=(count + 1,))
+            if chunk_info['count'] > 0:
+                self.chunk_embeddings = np.memmap(os.path.join(store_path, CHUNKS_FILE), dtype='<f4', mode='r',
+                                                  shape=(chunk_info['count'], self.dim))
+            else:
+                self.chunk_embeddings = np.zeros((0, self.dim), dtype='float32')
+
+        columns = {}
+        column_dtypes = self.header.get('column_dtypes', {})
+        for i, name in enumerate(self.header['columns']):
+            dtype = column_dtypes.get(name, 'str')
+            if dtype in TYPED_COLUMNS:
+                columns[name] = TypedColumn.open(os.path.join(store_path, f"col_{i:03d}.values"), dtype, count)
+                continue
+            columns[name] = StringColumn(
+                os.path.join(store_path, f"col_{i:03d}.data"),
+                os.path.join(store_path, f"col_{i:03d}.offsets"),
+                count
+            )
+        super().__init__(os.path.basename(os.path.normpath(store_path)), columns, count)
+
+
+class StoreMetadata(Sequence):
+    # Vista de metadata sobre varias tablas (stores o .pkl convertidos): se comporta
+    # como la lista de dicts original (con '_global_index', '_source_file' y el id
+    # estable '_offer_id'), pero cada dict se crea al pedirlo en lugar de cargarse
+    # entero al inicio.
+
+    def __init__(self, stores: List[ColumnTable]):
+        self.stores = stores
+        self._starts = np.cumsum([0] + [len(s) for s in stores])
+
+    def __len__(self) -> int:
+        return int(self._starts[-1])
+
+    def locate(self, index: int) -> Tuple[ColumnTable, int]:
+        # Devuelve (tabla, fila local) de un indice global
+        block = int(np.searchsorted(self._starts, index, side='right')) - 1
+        return self.stores[block], index - int(self._starts[block])
+
+    def get_record(self, index: int, fields: Optional[List[str]] = None) -> Dict:
+        # Dict de la oferta con solo los campos pedidos (None = todos), mas
+        # '_global_index', '_source_file' y '_offer_id'
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Índice {index} fuera de rango (0-{len(self) - 1})")
+        store, local = self.locate(index)
+        job = store.get_record(local, fields)
+        job['_global_index'] = index
+        job['_source_file'] = store.name
+        job['_offer_id'] = store.offer_id(local)
+        return job
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.get_record(index)
+
+    def field_names(self) -> List[str]:
+        # Union de las columnas de todas las tablas (en orden de aparicion)
+        return list(dict.fromkeys(name for store in self.stores for name in store.columns))
+
+    def column(self, name: str, fallback: Optional[str] = None) -> List[str]:
+        # Valores de una columna en todas las filas (sin crear dicts); si una
+        # tabla no la tiene se usa la columna fallback, o cadenas vacias
+        values = []
+        for store in self.stores:
+            column = store.columns.get(name) or (store.columns.get(fallback) if fallback else None)
+            values.extend(column[:] if column is not None else [""] * len(store))
+        return values
+
+    def offer_ids(self) -> np.ndarray:
+        # Id estable de cada fila, en el orden de los indices globales
+        if not self.stores:
+            return np.zeros(0, dtype='int64')
+        return np.concatenate([store.offer_ids() for store in self.stores])
+
+    def nbytes(self) -> int:
+        # Memoria (o mmap) ocupada por los buffers de las columnas
+        return sum(col.nbytes() for store in self.stores for col in store.columns.values())
+
+
+def file_sha256(path: str) -> str:
+    # sha256 de un archivo leyendo por bloques
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(kind: str, path: str, previous: Optional[Dict] = None) -> Dict:
+    # Identifica el contenido de una fuente para el manifest del indice.
+    # Un .store usa el digest de su header; un .pkl se hashea, salvo que el
+    # tamaño y la fecha coincidan con la huella anterior.
+    name = os.path.basename(os.path.normpath(path))
+    if kind == 'store':
+        header = read_header(path)
+        sha = header.get('digest') or file_sha256(os.path.join(path, EMBEDDINGS_FILE))
+        return {'name': name, 'kind': kind, 'count': header['count'], 'sha256': sha}
+
+    stat = os.stat(path)
+    if (previous and previous.get('name') == name and previous.get('size') == stat.st_size
+            and previous.get('mtime_ns') == stat.st_mtime_ns):
+        sha = previous['sha256']
+    else:
+        sha = file_sha256(path)
+    return {'name': name, 'kind': kind, 'sha256': sha, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def discover_sources(processed_data_dir: str) -> List[Tuple[str, str]]:
+    # Lista (tipo, ruta) de las fuentes 'vectors_*' ordenadas por nombre.
+    # Si existen el .store y el .pkl de una misma categoria se usa el .store.
+    sources = {}
+    for pkl_file in glob.glob(os.path.join(processed_data_dir, "vectors_*.pkl")):
+        stem = os.path.basename(pkl_file)[:-len('.pkl')]
+        sources[stem] = ('pkl', pkl_file)
+    for store_dir in glob.glob(os.path.join(processed_data_dir, "vectors_*" + STORE_SUFFIX)):
+        if os.path.isfile(os.path.join(store_dir, HEADER_FILE)):
+            stem = os.path.basename(store_dir)[:-len(STORE_SUFFIX)]
+            sources[stem] = ('store', store_dir)
+    return [sources[stem] for stem in sorted(sources)]
+
+
+def convert_pickle(pkl_path: str, model_name: Optional[str] = None) -> str:
+    # Convierte un vectors_*.pkl antiguo al formato store
+    with open(pkl_path, 'rb') as f:
+        data = pickle.load(f)
+
+    metadata = data['metadata']
+    column_names = []
+    for job in metadata:
+        for key in job:
+            if key not in column_names and not key.startswith('_'):
+                column_names.append(key)
+    columns = {name: [job.get(name) for job in metadata] for name in column_names}
+
+    return write_vector_store(store_path_for(pkl_path), columns, data['embeddings'], model_name=model_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte los vectors_*.pkl de una carpeta al formato store (mmap)")
+    parser.add_argument("folder", type=str, help="Carpeta con los vectors_*.pkl")
+    args = parser.parse_args()
+
+    pkl_files = sorted(glob.glob(os.path.join(args.folder, "vectors_*.pkl")))
+    if not pkl_files:
+        print(f"No se encontraron archivos .pkl en {args.folder}")
+
+    for pkl_file in pkl_files:
+        out = convert_pickle(pkl_file)
+        print(f"OK - {os.path.basename(pkl_file)} -> {os.path.basename(out)}")
@@ -10,6 +10,7 @@ if pln_dir not in sys.path:
     sys.path.insert(0, pln_dir)
 
 from PLN.recommender import RecommendationEngine
+from PLN.vector_store import source_category
 
 
 # Configuracion de la pagina
@@ -54,7 +55,9 @@ def load_recommendation_engine():
     old_stdout = sys.stdout
     sys.stdout = io.StringIO()
     try:
-        engine = RecommendationEngine()
+        # El motor vigila dataset/clean y activa los datos nuevos sin reiniciar la app
+        # Los CV en PDF suelen superar la ventana del encoder: se codifican por ventanas
+        engine = RecommendationEngine(auto_reload=True, reload_interval=60, chunked=True)
         return engine
     finally:
         sys.stdout = old_stdout
@@ -107,8 +110,18 @@ def main():
                 st.metric("Dimension Embeddings", stats['embedding_dimension'])
                 st.markdown("**Categorias disponibles:**")
                 for source, count in stats['sources'].items():
-                    categoria = source.replace('vectors_', '').replace('.pkl', '').title()
+                    categoria = source_category(source).title()
                     st.write(f"• {categoria}: {count}")
+                categorias = st.multiselect("Filtrar por categoria", engine.searcher.filter_values('category'),
+                                            format_func=str.title)
+                reload_stats = stats.get('reload', {})
+                if reload_stats.get('last_reload'):
+                    st.caption(f"Índice generación {reload_stats['generation']} "
+                               f"(recargado {reload_stats['last_reload']['at']})")
+                cache_stats = stats.get('profile_cache', {})
+                if cache_stats.get('enabled'):
+                    st.caption(f"Cache de perfiles: {cache_stats['hits']} aciertos / {cache_stats['misses']} fallos "
+                               f"({cache_stats['encoder_seconds_saved']:.2f}s de encoder ahorrados)")
             except Exception as e:
                 st.error(f"Error al cargar el sistema: {str(e)}")
                 return
@@ -158,10 +171,15 @@ def main():
         
         with st.spinner("Analizando tu perfil y buscando ofertas relevantes..."):
             try:
-                ofertas = engine.recomendar(perfil_texto, k=k, verbose=False)
+                filtros = {'category': categorias} if categorias else None
+                ofertas = engine.recomendar(perfil_texto, k=k, verbose=False, filters=filtros)
                 st.markdown("---")
                 st.markdown("## Resultados")
                 
+                if not ofertas:
+                    st.warning("No hay ofertas que cumplan los filtros seleccionados.")
+                    return
+                
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     st.metric("Ofertas Encontradas", len(ofertas))
@@ -177,17 +195,22 @@ def main():
                 
                 for i, oferta in enumerate(ofertas, 1):
                     score_color = get_score_color(oferta['score'])
-                    categoria = oferta['_source_file'].replace('vectors_', '').replace('.pkl', '').title()
+                    categoria = source_category(oferta['_source_file']).title()
                     with st.expander(f"**{i}. {oferta['title']}** - Match: {format_score(oferta['score'])}", expanded=(i <= 3)):
                         col1, col2 = st.columns([3, 1])
                         with col1:
                             st.markdown(f"**Categoria:** {categoria}")
-                            st.markdown(f"**ID:** {oferta['id']}")
+                            st.markdown(f"**ID:** {oferta['offer_id']}")
                         with col2:
                             st.markdown(f'<div style="background-color: {score_color}; color: white; padding: 0.5rem; border-radius: 5px; text-align: center; font-weight: bold;">{format_score(oferta["score"])}</div>', unsafe_allow_html=True)
                         st.markdown("**Descripcion:**")
                         st.write(oferta['description'])
                         st.markdown(f"**Fuente:** {oferta['source']} | **Fecha:** {oferta['scraped_at'][:10]}")
+                        similares = engine.similares(oferta['offer_id'], k=3)
+                        if similares:
+                            st.markdown("**Ofertas similares:**")
+                            for similar in similares:
+                                st.markdown(f"- {similar['title']} (ID {similar['offer_id']}, {format_score(similar['score'])})")
                 
                 st.success("Busqueda completada exitosamente")
             except Exception as e:
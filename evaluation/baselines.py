@@ -1,30 +1,89 @@
 import random
+import pickle
+import numpy as np
 import pandas as pd
 from typing import List, Dict
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import sys
 import os
 
-# Agregar la raíz del proyecto al path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Agregar la raíz del proyecto y el directorio PLN al path
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+sys.path.append(os.path.join(root_dir, 'PLN'))
 
 from PLN.searcher import JobSearcher
+from PLN.vector_store import discover_sources, source_fingerprint
+
+TFIDF_PARAMS = {'stop_words': 'english', 'max_features': 5000}
+
 
 class Baselines:
-    def __init__(self, processed_data_dir: str = None):
-        self.searcher = JobSearcher(processed_data_dir)
+    def __init__(self, processed_data_dir: str = None, use_cache: bool = True):
+        # Solo metadata y embeddings: los baselines no usan el indice FAISS
+        self.searcher = JobSearcher(processed_data_dir, with_index=False)
         self.jobs = self.searcher.job_metadata
-        self.df = pd.DataFrame(self.jobs)
+        # Solo la columna que usa el baseline de popularidad (sin un dict por oferta)
+        self.df = pd.DataFrame({'scraped_at': self.jobs.column('scraped_at')})
         
-        # Pre-calcular matriz TF-IDF para el baseline TF-IDF
-        print("Entrenando vectorizador TF-IDF para baseline...")
-        self.vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
-        # Usar cleaned_text si está disponible, sino description
-        texts = [job.get('cleaned_text', job.get('description', '')) for job in self.jobs]
-        self.tfidf_matrix = self.vectorizer.fit_transform(texts)
+        # Pre-calcular matriz TF-IDF para el baseline TF-IDF (o cargarla de la cache)
+        self.cache_path = os.path.join(self.searcher.index_dir, 'tfidf_baseline.pkl')
+        if not (use_cache and self._load_tfidf_cache()):
+            print("Entrenando vectorizador TF-IDF para baseline...")
+            self.vectorizer = TfidfVectorizer(**TFIDF_PARAMS)
+            # Usar cleaned_text si está disponible, sino description
+            texts = self.jobs.column('cleaned_text', fallback='description')
+            # Las filas quedan normalizadas L2 (norm='l2'): coseno = producto punto
+            self.tfidf_matrix = self.vectorizer.fit_transform(texts).tocsr()
+            if use_cache:
+                self._save_tfidf_cache()
         print("Vectorizador TF-IDF listo.")
 
+    def _tfidf_fingerprint(self, previous: Dict = None) -> Dict:
+        # Identifica el corpus y la configuracion con la que se ajusto el vectorizador.
+        # Con la huella anterior, un .pkl con igual tamaño y fecha no se vuelve a hashear
+        previous_sources = {s['name']: s for s in (previous or {}).get('sources', []) if isinstance(s, dict)}
+        sources = []
+        for kind, path in discover_sources(self.searcher.processed_data_dir):
+            name = os.path.basename(os.path.normpath(path))
+            sources.append(source_fingerprint(kind, path, previous_sources.get(name)))
+        return {'sources': sources, 'params': TFIDF_PARAMS}
+
+    @staticmethod
+    def _same_corpus(a: Dict, b: Dict) -> bool:
+        def key(fingerprint):
+            sources = [(s.get('name'), s.get('sha256')) for s in fingerprint.get('sources', [])
+                       if isinstance(s, dict)]
+            return sources, fingerprint.get('params')
+        return key(a) == key(b)
+
+    def _load_tfidf_cache(self) -> bool:
+        # Usa el vectorizador guardado si corresponde al corpus actual
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False
+        fingerprint = self._tfidf_fingerprint(cached.get('fingerprint'))
+        if not (fingerprint['sources'] and self._same_corpus(cached.get('fingerprint') or {}, fingerprint)):
+            return False
+        self.vectorizer = cached['vectorizer']
+        self.tfidf_matrix = cached['tfidf_matrix']
+        print(f"Vectorizador TF-IDF cargado desde {self.cache_path}")
+        return True
+
+    def _save_tfidf_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, 'wb') as f:
+                pickle.dump({
+                    'fingerprint': self._tfidf_fingerprint(),
+                    'vectorizer': self.vectorizer,
+                    'tfidf_matrix': self.tfidf_matrix,
+                }, f)
+        except OSError as e:
+            print(f"X - No se pudo guardar la cache TF-IDF: {e}")
+
     def random_recommendation(self, k: int = 10) -> List[Dict]:
         """Baseline 1: Aleatorio"""
         return random.sample(self.jobs, k)
@@ -33,16 +92,22 @@ class Baselines:
         """Baseline 2: Popularidad (Más recientes)"""
         # Ordenar por scraped_at descendente
         sorted_jobs = self.df.sort_values('scraped_at', ascending=False).head(k)
-        return sorted_jobs.to_dict('records')
+        return [self.jobs[int(idx)] for idx in sorted_jobs.index]
 
     def tfidf_recommendation(self, profile_text: str, k: int = 10) -> List[Dict]:
         """Baseline 3: TF-IDF"""
-        profile_vector = self.vectorizer.transform([profile_text])
-        similarities = cosine_similarity(profile_vector, self.tfidf_matrix).flatten()
-        # Obtener los índices top k
-        top_k_indices = similarities.argsort()[-k:][::-1]
-        
-        results = []
-        for idx in top_k_indices:
-            results.append(self.jobs[idx])
-        return results
+        return self.tfidf_recommendation_batch([profile_text], k)[0]
+
+    def tfidf_recommendation_batch(self, profile_texts: List[str], k: int = 10) -> List[List[Dict]]:
+        """Baseline 3: TF-IDF para varios perfiles (un solo producto disperso)"""
+        profile_vectors = self.vectorizer.transform(profile_texts)
+        # Filas normalizadas L2 en ambos lados: el producto punto es el coseno
+        similarities = (profile_vectors @ self.tfidf_matrix.T).toarray()
+
+        # Top k sin ordenar todo el corpus: argpartition y luego ordenar solo esos k
+        k = min(k, similarities.shape[1])
+        top_k = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(similarities, top_k, axis=1), axis=1, kind='stable')
+        top_k = np.take_along_axis(top_k, order, axis=1)
+
+        return [[self.jobs[int(idx)] for idx in row] for row in top_k]
@@ -0,0 +1,399 @@
+import gc
+import json
+import os
+import sys
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+
+# Agregar la raíz del proyecto y el directorio PLN al path
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+sys.path.append(os.path.join(root_dir, 'PLN'))
+
+from PLN.index_factory import INDEX_TYPES
+from PLN.encoders import BACKENDS
+
+
+# Benchmark del camino caliente del motor (RecommendationEngine.recomendar):
+#   - arranque en frio: imports, carga del modelo, _load_all_data y construccion
+#     del indice; y arranque en caliente con el indice ya guardado
+#   - latencia p50/p95/p99 por perfil (encoder + FAISS), solo FAISS y por lote
+#   - QPS con varios hilos concurrentes y pico de memoria (RSS)
+# Cada combinacion tipo de indice x backend del encoder x escala corre en un
+# proceso nuevo (arranque y RSS no se contaminan entre corridas) sobre corpus
+# sinteticos: las ofertas reales repetidas 'scale' veces con ruido en los
+# embeddings. Los resultados se guardan en JSON y se comparan con un baseline:
+#   python evaluation/benchmark.py --scales 1 10 --update-baseline
+#   python evaluation/benchmark.py --scales 1 10   (falla si algo empeora)
+BENCHMARK_VERSION = 1
+PERCENTILES = (50, 95, 99)
+# Empeoramiento relativo tolerado frente al baseline
+REGRESSION_TOLERANCE = 0.2
+# Diferencias absolutas por debajo de estas se consideran ruido (por sufijo de la metrica)
+NOISE_FLOOR = {'_ms': 0.5, '_seconds': 0.05, '_mb': 10.0, 'qps': 1.0, '_per_second': 1.0}
+# Metricas donde mas es mejor (el resto son tiempos o memoria)
+HIGHER_IS_BETTER = ('qps', '_per_second')
+# Secciones de cada resultado que se comparan con el baseline
+MEASURED_SECTIONS = ('cold_start', 'warm_start', 'single', 'search', 'batch', 'concurrency', 'peak_rss_mb')
+CORPUS_FILE = 'corpus.json'
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_PROFILES = os.path.join(DATA_DIR, 'test_profiles.json')
+DEFAULT_OUTPUT = os.path.join(DATA_DIR, 'benchmark_results.json')
+DEFAULT_BASELINE = os.path.join(DATA_DIR, 'benchmark_baseline.json')
+
+
+def peak_rss_mb() -> Optional[float]:
+    # Pico de memoria residente del proceso (None si la plataforma no lo expone)
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1e6
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo informa en KB y macOS en bytes
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def latency_summary(seconds: List[float]) -> Dict:
+    # p50/p95/p99 y media en milisegundos
+    ms = np.asarray(seconds, dtype='float64') * 1e3
+    summary = {f"p{p}_ms": round(float(np.percentile(ms, p)), 3) for p in PERCENTILES}
+    summary['mean_ms'] = round(float(ms.mean()), 3)
+    return summary
+
+
+def timed(call, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    call(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def build_corpus(source_dir: str, corpus_dir: str, scale: int, noise: float = 0.05, seed: int = 0) -> Dict:
+    # Escribe un corpus sintetico con cada oferta real repetida 'scale' veces. Las
+    # copias cambian el titulo (otro offer_id) y suman ruido gaussiano al embedding
+    # (norma ~noise) para que el indice no vea vectores duplicados. Si el corpus ya
+    # existe con los mismos parametros se reutiliza.
+    from PLN.searcher import JobSearcher
+    from PLN.vector_store import write_vector_store, source_category
+
+    description = {'version': BENCHMARK_VERSION, 'source_dir': os.path.abspath(source_dir),
+                   'scale': scale, 'noise': noise, 'seed': seed}
+    corpus_file = os.path.join(corpus_dir, CORPUS_FILE)
+    if os.path.exists(corpus_file):
+        with open(corpus_file, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        if {key: previous.get(key) for key in description} == description:
+            return previous
+
+    # Solo se borra un directorio que ya era un corpus del benchmark
+    if os.path.isdir(corpus_dir) and os.listdir(corpus_dir):
+        if not os.path.exists(corpus_file):
+            raise FileExistsError(f"{corpus_dir} no es un corpus del benchmark; usa otro --work-dir")
+        shutil.rmtree(corpus_dir)
+    print(f"Generando corpus x{scale} en {corpus_dir}...")
+    os.makedirs(corpus_dir, exist_ok=True)
+    searcher = JobSearcher(source_dir, with_index=False)
+    rng = np.random.default_rng(seed)
+    start = 0
+    for table in searcher.job_metadata.stores:
+        rows = np.arange(start, start + len(table))
+        start += len(table)
+        embeddings = searcher.get_embeddings(rows)
+        fields = [name for name in table.columns if not name.startswith('_')]
+        columns = {name: [] for name in fields}
+        blocks = []
+        for copy in range(scale):
+            block = embeddings
+            if copy:
+                block = embeddings + rng.normal(0, noise / np.sqrt(embeddings.shape[1]), embeddings.shape)
+            blocks.append(block.astype('float32'))
+            for name in fields:
+                values = list(table.columns[name])
+                if name == 'title' and copy:
+                    values = [f"{value} ({copy})" for value in values]
+                columns[name].extend(values)
+        store_path = os.path.join(corpus_dir, f"vectors_{source_category(table.name)}.store")
+        write_vector_store(store_path, columns, np.vstack(blocks), model_name=getattr(table, 'model_name', None))
+
+    description['offers'] = start * scale
+    with open(corpus_file, 'w', encoding='utf-8') as f:
+        json.dump(description, f, indent=2)
+    print(f"OK - Corpus x{scale}: {description['offers']} ofertas")
+    return description
+
+
+def run_configuration(config: Dict) -> Dict:
+    # Corre una configuracion completa (se llama en un proceso nuevo, ver run_isolated)
+    start = time.perf_counter()
+    import faiss  # noqa: F401 (se importa aqui para contarlo en el arranque)
+    from PLN.profile_processor import ProfileProcessor
+    from PLN.recommender import RecommendationEngine
+    imports_seconds = time.perf_counter() - start
+
+    # El modelo queda en model_registry y el motor reutiliza esa instancia
+    model_seconds = timed(ProfileProcessor, backend=config['backend'])
+
+    # Sin indice guardado: el motor lo construye (y lo guarda para el arranque en caliente)
+    shutil.rmtree(os.path.join(config['corpus_dir'], 'index'), ignore_errors=True)
+    engine_kwargs = {'processed_data_dir': config['corpus_dir'], 'index_type': config['index_type'],
+                     'index_params': config['index_params'], 'encoder_backend': config['backend'],
+                     'cache_max_mb': 0}
+    start = time.perf_counter()
+    engine = RecommendationEngine(**engine_kwargs)
+    engine_seconds = time.perf_counter() - start
+    searcher = engine.searcher.current
+    stats = searcher.get_statistics()
+    startup = stats['startup_seconds']
+
+    with open(config['profiles'], 'r', encoding='utf-8') as f:
+        texts = [p['texto'] for p in json.load(f)]
+    queries = [texts[i % len(texts)] for i in range(config['queries'])]
+    k = config['k']
+    for text in queries[:config['warmup']]:
+        engine.recomendar(text, k=k)
+
+    # Un perfil por llamada (limpieza + encoder + FAISS + formato)
+    single = [timed(engine.recomendar, text, k=k) for text in queries]
+    # Solo la busqueda en el indice, con los embeddings ya calculados
+    embeddings = engine.processor.process_profiles_batch(queries)
+    search = [timed(searcher.search, embedding, k=k) for embedding in embeddings]
+    # Perfiles en lotes de batch_size (un encode y una busqueda por lote)
+    batch_size = config['batch_size']
+    batches = [queries[i:i + batch_size] for i in range(0, len(queries), batch_size)]
+    batch = [timed(engine.recomendar_batch, perfiles, k=k) for perfiles in batches]
+
+    concurrency = {}
+    for workers in config['concurrency']:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            start = time.perf_counter()
+            latencies = list(pool.map(lambda text: timed(engine.recomendar, text, k=k), queries))
+            wall = time.perf_counter() - start
+        concurrency[str(workers)] = {'qps': round(len(queries) / wall, 2), **latency_summary(latencies)}
+    rss = peak_rss_mb()
+
+    # Arranque en caliente: el indice se carga del que guardo el primer motor
+    del engine, searcher
+    gc.collect()
+    start = time.perf_counter()
+    engine = RecommendationEngine(**engine_kwargs)
+    warm_seconds = time.perf_counter() - start
+
+    return {
+        'index_type': config['index_type'],
+        'backend': config['backend'],
+        'scale': config['scale'],
+        'offers': stats['total_jobs'],
+        'index': stats['index_type'],
+        'cold_start': {
+            'imports_seconds': round(imports_seconds, 4),
+            'model_load_seconds': round(model_seconds, 4),
+            'load_data_seconds': startup['load_data'],
+            'build_index_seconds': startup['index'],
+            'total_seconds': round(imports_seconds + model_seconds + engine_seconds, 4),
+        },
+        'warm_start': {
+            'load_index_seconds': engine.searcher.current.get_statistics()['startup_seconds']['index'],
+            'total_seconds': round(warm_seconds, 4),
+        },
+        'single': latency_summary(single),
+        'search': latency_summary(search),
+        'batch': {'batch_size': batch_size, **latency_summary(batch),
+                  'profiles_per_second': round(len(queries) / sum(batch), 2)},
+        'concurrency': concurrency,
+        'peak_rss_mb': round(rss, 1) if rss is not None else None,
+    }
+
+
+def run_isolated(config: Dict, verbose: bool = False) -> Dict:
+    # Lanza run_configuration en un proceso nuevo y devuelve su resultado (o el error)
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, 'config.json')
+        result_path = os.path.join(tmp, 'result.json')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', config_path, result_path],
+                                   stdout=None if verbose else subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   text=True, encoding='utf-8', errors='replace')
+        if completed.returncode != 0 or not os.path.exists(result_path):
+            output = (completed.stdout or '').strip().splitlines()
+            return {'error': output[-1] if output else f"código de salida {completed.returncode}",
+                    'index_type': config['index_type'], 'backend': config['backend'], 'scale': config['scale']}
+        with open(result_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def result_name(result: Dict) -> str:
+    return f"{result['index_type']}/{result['backend']}/x{result['scale']}"
+
+
+def flatten_metrics(result: Dict) -> Dict[str, float]:
+    # 'single.p95_ms' -> valor, solo de las secciones medidas
+    metrics = {}
+
+    def walk(prefix: str, value):
+        if isinstance(value, dict):
+            for key, inner in value.items():
+                walk(f"{prefix}.{key}", inner)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and not prefix.endswith('batch_size'):
+            metrics[prefix] = float(value)
+
+    for section in MEASURED_SECTIONS:
+        if result.get(section) is not None:
+            walk(section, result[section])
+    return metrics
+
+
+def compare_reports(current: Dict, baseline: Dict, tolerance: float = REGRESSION_TOLERANCE) -> List[Dict]:
+    # Metricas que empeoran mas que 'tolerance' (relativo) y que el piso de ruido
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None or 'error' in result or 'error' in previous:
+            continue
+        before, after = flatten_metrics(previous), flatten_metrics(result)
+        for metric in sorted(before.keys() & after.keys()):
+            old, new = before[metric], after[metric]
+            higher_is_better = metric.endswith(HIGHER_IS_BETTER)
+            worse = old - new if higher_is_better else new - old
+            floor = next((v for suffix, v in NOISE_FLOOR.items() if metric.endswith(suffix)), 0.0)
+            if worse > floor and worse > tolerance * abs(old):
+                regressions.append({'config': name, 'metric': metric, 'baseline': old, 'current': new,
+                                    'change': round((new - old) / old, 4) if old else None})
+    return regressions
+
+
+def environment() -> Dict:
+    import faiss
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'faiss': getattr(faiss, '__version__', 'unknown'),
+    }
+
+
+def print_result(result: Dict):
+    if 'error' in result:
+        print(f"X - {result_name(result)}: {result['error']}")
+        return
+    print(f"OK - {result_name(result)} ({result['offers']} ofertas, {result['index']})")
+    print(f"  Arranque: {result['cold_start']['total_seconds']:.2f}s en frio "
+          f"(índice {result['cold_start']['build_index_seconds']:.2f}s) | "
+          f"{result['warm_start']['total_seconds']:.2f}s en caliente")
+    for section, label in (('single', 'Perfil'), ('search', 'Solo FAISS'), ('batch', 'Lote')):
+        summary = result[section]
+        print(f"  {label}: p50 {summary['p50_ms']:.2f}ms | p95 {summary['p95_ms']:.2f}ms | "
+              f"p99 {summary['p99_ms']:.2f}ms")
+    qps = ' | '.join(f"{workers} hilos {level['qps']:.1f}" for workers, level in result['concurrency'].items())
+    print(f"  QPS: {qps}")
+    if result['peak_rss_mb'] is not None:
+        print(f"  RSS máximo: {result['peak_rss_mb']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latencia, throughput y memoria del motor")
+    parser.add_argument("--data-dir", type=str, default=os.path.join(root_dir, 'dataset', 'processed'),
+                        help="Carpeta con los vectors_*.pkl / vectors_*.store reales")
+    parser.add_argument("--work-dir", type=str, default=os.path.join(tempfile.gettempdir(), 'pln_benchmark'),
+                        help="Donde se generan los corpus sintéticos")
+    parser.add_argument("--scales", type=int, nargs='+', default=[1, 10],
+                        help="Veces que se repite el corpus real")
+    parser.add_argument("--index-types", type=str, nargs='+', default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--index-params", type=str, default=None,
+                        help='Parámetros en JSON para todos los índices, ej: \'{"nprobe": 16}\'')
+    parser.add_argument("--backends", type=str, nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--profiles", type=str, default=DEFAULT_PROFILES, help="JSON con perfiles ('texto')")
+    parser.add_argument("--queries", type=int, default=200, help="Consultas por medición")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument("--noise", type=float, default=0.05, help="Ruido de los embeddings de las copias")
+    parser.add_argument("--output", type=str, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Guardar estos resultados como baseline")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="Empeoramiento relativo tolerado frente al baseline")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar la salida de cada corrida")
+    parser.add_argument("--worker", nargs=2, metavar=("CONFIG", "RESULT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        config_path, result_path = args.worker
+        with open(config_path, 'r', encoding='utf-8') as f:
+            result = run_configuration(json.load(f))
+        with open(result_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    index_params = json.loads(args.index_params) if args.index_params else None
+    corpora = {scale: build_corpus(args.data_dir, os.path.join(args.work_dir, f"x{scale}"), scale, args.noise)
+               for scale in args.scales}
+
+    results = {}
+    for scale in args.scales:
+        for backend in args.backends:
+            for index_type in args.index_types:
+                config = {'corpus_dir': os.path.join(args.work_dir, f"x{scale}"), 'scale': scale,
+                          'index_type': index_type, 'index_params': index_params, 'backend': backend,
+                          'profiles': args.profiles, 'queries': args.queries, 'warmup': args.warmup,
+                          'k': args.k, 'batch_size': args.batch_size, 'concurrency': args.concurrency}
+                print(f"\nBenchmark {index_type}/{backend}/x{scale}...")
+                result = run_isolated(config, verbose=args.verbose)
+                print_result(result)
+                results[result_name(result)] = result
+
+    report = {
+        'version': BENCHMARK_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {'queries': args.queries, 'warmup': args.warmup, 'k': args.k, 'batch_size': args.batch_size,
+                     'concurrency': args.concurrency, 'index_params': index_params,
+                     'corpora': {f"x{scale}": corpus['offers'] for scale, corpus in corpora.items()}},
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nOK - Resultados guardados en {args.output}")
+
+    if args.update_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"OK - Baseline actualizado: {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"Sin baseline en {args.baseline} (crearlo con --update-baseline)")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('environment') != report['environment']:
+        print("Advertencia: el baseline se midió en otro entorno; las diferencias pueden no ser regresiones")
+    regressions = compare_reports(report, baseline, args.tolerance)
+    if not regressions:
+        print(f"OK - Sin regresiones frente al baseline (tolerancia {args.tolerance:.0%})")
+        return
+    print(f"X - {len(regressions)} regresiones frente al baseline (tolerancia {args.tolerance:.0%}):")
+    for regression in regressions:
+        change = f"{regression['change']:+.0%}" if regression['change'] is not None else "n/a"
+        print(f"  {regression['config']} {regression['metric']}: {regression['baseline']:g} -> "
+              f"{regression['current']:g} ({change})")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
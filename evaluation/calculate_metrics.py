@@ -33,6 +33,20 @@ def hit_rate_at_k(recomendados: list, relevantes: set, k: int) -> float:
     top_k = recomendados[:k]
     return 1.0 if any(x in relevantes for x in top_k) else 0.0
 
+def ground_truth_id_field(ground_truth: dict) -> str:
+    """
+    Identificador con el que se guardaron las ofertas relevantes: 'offer_id'
+    (estable) o 'id' (indice global, ground truth anteriores sin id_field).
+    Los indices globales solo valen para la misma carga del dataset.
+    """
+    fields = {entry.get('id_field', 'id') for entry in ground_truth.values()}
+    if len(fields) > 1:
+        raise ValueError(f"ground_truth.json mezcla identificadores {sorted(fields)}; regenerarlo con generate_labels.py")
+    field = fields.pop() if fields else 'offer_id'
+    if field != 'offer_id':
+        print("Advertencia: ground_truth.json usa indices globales; se comparan por indice (regenerarlo con generate_labels.py)")
+    return field
+
 def evaluar_sistema():
     # Cargar resultados
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -51,6 +65,8 @@ def evaluar_sistema():
         print(f"Error: {e}")
         return
     
+    id_field = ground_truth_id_field(ground_truth)
+    
     precision_scores = []
     recall_scores = []
     mrr_scores = []
@@ -58,7 +74,8 @@ def evaluar_sistema():
     
     for profile_id, data in results_data.items():
         # Obtener IDs de recomendaciones
-        ids_recomendados = [r['id'] for r in data['recomendaciones']]
+        # Mismo identificador con el que se genero el ground truth
+        ids_recomendados = [r[id_field] for r in data['recomendaciones']]
         
         # Obtener IDs relevantes
         if profile_id not in ground_truth:
@@ -11,6 +11,7 @@ sys.path.append(os.path.join(root_dir, 'PLN'))
 
 from PLN.recommender import RecommendationEngine
 from evaluation.baselines import Baselines
+from evaluation.calculate_metrics import ground_truth_id_field
 
 # Funciones de métricas
 def precision_at_k(recomendados: list, relevantes: set, k: int) -> float:
@@ -71,6 +72,10 @@ def main():
         
     with open(ground_truth_path, 'r', encoding='utf-8') as f:
         ground_truth = json.load(f)
+    # Las predicciones se comparan por offer_id (estable); un ground truth anterior
+    # guarda indices globales y entonces se compara por indice global
+    by_offer_id = ground_truth_id_field(ground_truth) == 'offer_id'
+    cbf_key, baseline_key = ('offer_id', '_offer_id') if by_offer_id else ('id', '_global_index')
         
     # Inicializar modelos
     print("Inicializando modelos...")
@@ -82,24 +87,20 @@ def main():
     
     # 1. Evaluar CBF (Propuesto)
     print("\nEvaluando CBF (Propuesto)...")
-    cbf_preds = {}
-    for profile in profiles:
-        recs = cbf_engine.recomendar(profile['texto'], k=10)
-        cbf_preds[profile['id']] = [r['id'] for r in recs]
+    cbf_recs = cbf_engine.recomendar_batch([p['texto'] for p in profiles], k=10)
+    cbf_preds = {profile['id']: [r[cbf_key] for r in recs] for profile, recs in zip(profiles, cbf_recs)}
     results.append(evaluate_model("CBF (Propuesto)", cbf_preds, ground_truth))
     
     # 2. Evaluar TF-IDF
     print("Evaluando TF-IDF...")
-    tfidf_preds = {}
-    for profile in profiles:
-        recs = baselines.tfidf_recommendation(profile['texto'], k=10)
-        tfidf_preds[profile['id']] = [r['_global_index'] for r in recs]
+    tfidf_recs = baselines.tfidf_recommendation_batch([p['texto'] for p in profiles], k=10)
+    tfidf_preds = {profile['id']: [r[baseline_key] for r in recs] for profile, recs in zip(profiles, tfidf_recs)}
     results.append(evaluate_model("TF-IDF", tfidf_preds, ground_truth))
     
     # 3. Evaluar Popularidad
     print("Evaluando Popularidad...")
     pop_recs = baselines.popularity_recommendation(k=10)
-    pop_ids = [r['_global_index'] for r in pop_recs]
+    pop_ids = [r[baseline_key] for r in pop_recs]
     pop_preds = {p['id']: pop_ids for p in profiles} # Mismo para todos
     results.append(evaluate_model("Popularidad", pop_preds, ground_truth))
     
@@ -108,7 +109,7 @@ def main():
     random_preds = {}
     for profile in profiles:
         recs = baselines.random_recommendation(k=10)
-        random_preds[profile['id']] = [r['_global_index'] for r in recs]
+        random_preds[profile['id']] = [r[baseline_key] for r in recs]
     results.append(evaluate_model("Aleatorio", random_preds, ground_truth))
     
     # Imprimir Tabla
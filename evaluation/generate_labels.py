@@ -40,9 +40,11 @@ def main():
                 is_relevant = True
             
             if is_relevant:
-                relevant_ids.append(rec['id'])
+                # offer_id es estable entre cargas del indice; 'id' (indice global) no
+                relevant_ids.append(rec.get('offer_id', rec['id']))
         
         ground_truth[profile_id] = {
+            "id_field": "offer_id" if all('offer_id' in r for r in recommendations) else "id",
             "ofertas_relevantes": relevant_ids,
             "total_evaluadas": len(recommendations)
         }
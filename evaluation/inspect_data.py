@@ -1,8 +1,10 @@
 import sys
 import os
 
-# Agregar la raíz del proyecto al path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Agregar la raíz del proyecto y el directorio PLN al path
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+sys.path.append(os.path.join(root_dir, 'PLN'))
 
 from PLN.searcher import JobSearcher
 
@@ -10,7 +12,8 @@ def inspect_metadata():
     # Apuntar al directorio correcto del dataset
     dataset_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dataset', 'clean')
     
-    searcher = JobSearcher(processed_data_dir=dataset_dir)
+    # Solo se lee metadata: no hace falta cargar ni construir el indice FAISS
+    searcher = JobSearcher(processed_data_dir=dataset_dir, with_index=False)
     
     if searcher.job_metadata:
         print("\nClaves en la metadata de la primera oferta:")
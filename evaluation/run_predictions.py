@@ -37,23 +37,26 @@ def main():
 
     results_map = {}
 
-    for profile in profiles:
-        print(f"Procesando perfil: {profile['id']} ({profile['categoria_esperada']})")
-        try:
-            recommendations = engine.recomendar(profile['texto'], k=20, verbose=True)
-            
-            results_map[profile['id']] = {
-                "categoria_esperada": profile['categoria_esperada'],
-                "texto_perfil": profile['texto'],
-                "recomendaciones": recommendations
-            }
-        except Exception as e:
-            print(f"Error procesando perfil {profile['id']}: {e}")
+    # Todos los perfiles en un solo lote (un encode y una busqueda FAISS)
+    print(f"Procesando {len(profiles)} perfiles en lote...")
+    try:
+        all_recommendations = engine.recomendar_batch([p['texto'] for p in profiles], k=20, verbose=True)
+    except Exception as e:
+        print(f"Error procesando los perfiles: {e}")
+        return
+
+    for profile, recommendations in zip(profiles, all_recommendations):
+        print(f"Perfil procesado: {profile['id']} ({profile['categoria_esperada']})")
+        results_map[profile['id']] = {
+            "categoria_esperada": profile['categoria_esperada'],
+            "texto_perfil": profile['texto'],
+            "recomendaciones": recommendations
+        }
 
     # Guardar resultados
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(results_map, f, indent=2, ensure_ascii=False)
+        json.dump(results_map, f, indent=2, ensure_ascii=False, default=str)
     
     print(f"Resultados guardados en {output_file}")
 